@@ -1,26 +1,183 @@
+import time
+
 import streamlit as st
 from modules.news_fetcher import NewsFetcher
 from modules.deepseek import DeepSeek, DeepSeekModels
 from modules.analyzer import StockAnalyzer
-from dotenv import load_dotenv
+from modules.compaction import PromptCompactor, records
 import modules.key as keys
 import modules.logger as logger
 import modules.finnhub as finnhub
-import datetime
+import modules.gatherer as gatherer
+from modules.backtest import AnalysisLog
+from modules.cache import ResponseCache
+from modules.store import HistoryGatherer, HistoryStore
+from modules.jobs import JobRegistry
 
 logger.init("GUI")
 
-# API key status check
-engine = DeepSeek(
-    deepseek_api_key=keys.DeepSeekKey(),
-    deepseek_model=DeepSeekModels.DEEPSEEK_CHAT,
-)
 
-analyzer = StockAnalyzer(ai_engine=engine)
-fetcher = NewsFetcher(news_api_key=keys.NewsAPIKey())
-finnhub_client = finnhub.Finnhub(
-    key=keys.FinnhubAPIKey(),
-)
+@st.cache_resource
+def resources():
+    """
+    Long-lived clients, caches and the job registry, built once per server
+    process and shared by every session and rerun.
+    """
+    engine = DeepSeek(
+        deepseek_api_key=keys.DeepSeekKey(),
+        deepseek_model=DeepSeekModels.DEEPSEEK_CHAT,
+    )
+    response_cache = ResponseCache()
+    analyzer = StockAnalyzer(
+        ai_engine=engine,
+        cache=response_cache,
+        compactor=PromptCompactor(),
+        recorder=AnalysisLog(),
+    )
+    fetcher = NewsFetcher(news_api_key=keys.NewsAPIKey(), cache=response_cache)
+    finnhub_client = finnhub.Finnhub(
+        key=keys.FinnhubAPIKey(),
+        cache=response_cache,
+    )
+    source_gatherer = HistoryGatherer(fetcher, finnhub_client, HistoryStore())
+    return {
+        "engine": engine,
+        "jobs": JobRegistry(source_gatherer, analyzer),
+    }
+
+
+# Seconds between refreshes of a running analysis
+POLL_INTERVAL = 0.5
+
+SOURCE_LABELS = {
+    gatherer.NEWS_API: "NewsAPI news",
+    gatherer.FINVIZ: "FinViz news",
+    gatherer.INSIDER_SENTIMENT: "insider sentiment",
+    gatherer.ANALYST_TRENDS: "analyst sentiment",
+}
+
+# Signal display with colors
+SIGNAL_COLORS = {
+    "STRONG BUY": "🟢",
+    "BUY": "🟢",
+    "HOLD": "🟡",
+    "SELL": "🔴",
+    "STRONG SELL": "🔴",
+}
+
+ANALYSIS_DEFAULTS = {
+    "signal": "UNKNOWN",
+    "confidence": 0,
+    "reasons": [],
+    "risks": [],
+    "summary": "No summary available",
+}
+
+
+def render_analysis_field(slots, field, value):
+    """Render one analysis field into its placeholder"""
+    if field == "signal":
+        slots["signal"].success(
+            f"## {SIGNAL_COLORS.get(value, '⚪')} Trading Signal: **{value}**"
+        )
+    elif field == "confidence":
+        slots["confidence"].metric("Confidence Level", f"{value}/10", delta=None)
+    elif field in ("reasons", "risks"):
+        with slots[field].container():
+            for item in value or []:
+                st.write(f"• {item}")
+    elif field == "summary":
+        slots["summary"].write(value)
+
+
+def render_sources(gathered):
+    """Render fetch errors, timings and the fetched data of a GatherResult"""
+    for source, message in gathered.errors.items():
+        st.error(f"Error fetching {SOURCE_LABELS[source]}: {message}")
+
+    if gathered.sources[gatherer.INSIDER_SENTIMENT].success:
+        st.success("✅ Insider sentiment data fetched successfully")
+
+    if gathered.sources[gatherer.ANALYST_TRENDS].success:
+        st.success("✅ Analyst sentiment data fetched successfully")
+
+    st.caption(
+        f"Fetched in {gathered.elapsed:.2f}s ("
+        + ", ".join(
+            f"{SOURCE_LABELS[name]} {elapsed:.2f}s"
+            for name, elapsed in gathered.timings.items()
+        )
+        + ")"
+    )
+
+
+def render_source_data(gathered):
+    articles = gathered.articles
+    with st.expander("📰 View Source Articles"):
+        if articles:
+            for i, article in enumerate(articles, 1):
+                st.write(f"**{i}. {article['title']}**")
+                st.write(f"Source: {article['source']}")
+                if article["url"]:
+                    st.write(f"[Read more]({article['url']})")
+                st.write("---")
+        else:
+            st.write("No articles found for this symbol.")
+
+    with st.expander("📱 Social Sentiment Data"):
+        # One table per source rather than a JSON viewer per row
+        for label, payload in (
+            ("Insider sentiment (MSPR)", gathered.insider_sentiments),
+            ("Analyst recommendation trends", gathered.analyst_sentiments),
+        ):
+            rows = [dict(row) for row in records(payload)]
+            st.write(f"**{label}**")
+            if rows:
+                st.dataframe(rows, hide_index=True)
+            else:
+                st.write("No data.")
+
+
+def render_job(job):
+    """Render the current state of an analysis job"""
+    st.markdown(f"### {job.symbol} ({job.days} days)")
+    if not job.done:
+        fraction, label = job.progress()
+        st.progress(fraction, text=label)
+
+    if job.gathered is not None:
+        render_sources(job.gathered)
+
+    # Display results, signal first
+    slots = {"signal": st.empty(), "confidence": st.empty()}
+    col3, col4 = st.columns(2)
+
+    with col3:
+        st.subheader("✅ Key Reasons")
+        slots["reasons"] = st.empty()
+
+    with col4:
+        st.subheader("⚠️ Risk Factors")
+        slots["risks"] = st.empty()
+
+    st.subheader("📋 Summary")
+    slots["summary"] = st.empty()
+
+    if not job.done:
+        for field, value in job.snapshot().items():
+            render_analysis_field(slots, field, value)
+        return
+
+    if isinstance(job.analysis, dict):
+        # Render everything from the final result, it may correct fields of
+        # a malformed streamed response
+        for field, default in ANALYSIS_DEFAULTS.items():
+            render_analysis_field(slots, field, job.analysis.get(field, default))
+    else:
+        slots["signal"].error(f"Analysis failed: {job.analysis}")
+
+    if job.gathered is not None:
+        render_source_data(job.gathered)
 
 
 def main():
@@ -31,6 +188,9 @@ def main():
     st.title("📈 Stock Sentiment Analyzer")
     st.subheader("AI-Powered Trading Signals Using DeepSeek")
 
+    # Builds the keys listed in the sidebar on the first run of the server
+    shared = resources()
+
     # Sidebar for configuration
     st.sidebar.header("Configuration")
 
@@ -44,7 +204,7 @@ def main():
     # Test DeepSeek API
     if st.sidebar.button("🔍 Test DeepSeek API"):
         with st.spinner("Testing DeepSeek API..."):
-            success, message = engine.test_deepseek_api()
+            success, message = shared["engine"].test_deepseek_api()
             if success:
                 st.sidebar.success("✅ DeepSeek API is working!")
                 st.sidebar.text(message)
@@ -64,124 +224,28 @@ def main():
 
         days = st.slider("News Analysis Period (days)", 1, 30, 7)
 
+        fresh_analysis = st.checkbox(
+            "Force fresh AI analysis",
+            help="Ignore a cached analysis of the same news and sentiment data",
+        )
+
         analyze_button = st.button("🔍 Analyze Stock", type="primary")
 
+    running = False
     with col2:
         st.header("Analysis Results")
 
         if analyze_button and symbol:
-            articles = []
-            with st.spinner(f"Analyzing {symbol}..."):
-                st.info("📰 Fetching news articles from NewsAPI...")
-                success, newsapi_articles = fetcher.fetch_news_api(symbol, days, 10)
-                if not success:
-                    st.error(f"Error fetching NewsAPI news: {newsapi_articles}")
-                else:
-                    articles.extend(newsapi_articles)
-
-                st.info("📊 Fetching news articles from FinViz")
-                success, finviz_articles = fetcher.fetch_finviz_news(symbol, 10)
-                if not success:
-                    st.error(f"Error fetching FinViz news: {finviz_articles}")
-                else:
-                    articles.extend(finviz_articles)
-
-                st.info("📈 Fetching insider sentiment data from Finnhub...")
-                from_date = (
-                    datetime.datetime.now() - datetime.timedelta(days=days)
-                ).strftime("%Y-%m-%d")
-                to_date = datetime.datetime.now().strftime("%Y-%m-%d")
-                success, insider_sentiments = (
-                    finnhub_client.get_stock_insider_sentiment(
-                        symbol,
-                        from_date,
-                        to_date,
-                    )
-                )
-
-                if not success:
-                    st.error(f"Error fetching insider sentiment: {insider_sentiments}")
-                else:
-                    st.success("✅ Insider sentiment data fetched successfully")
-                    logger.info(
-                        f"Number of Insider Transactions for {symbol}: {len(insider_sentiments)}"
-                    )
-
-                st.info("📊 Fetching analyst sentiment data from Finnhub...")
-                success, analyst_sentiments = (
-                    finnhub_client.get_stock_recommendations_trends(symbol)
-                )
-                if not success:
-                    st.error(f"Error fetching analyst sentiment: {analyst_sentiments}")
-                else:
-                    st.success("✅ Analyst sentiment data fetched successfully")
-                    logger.info(
-                        f"Number of Analyst Recommendations for {symbol}: {len(analyst_sentiments)}"
-                    )
-
-                st.info("🤖 Getting AI analysis from DeepSeek...")
-                analysis = analyzer.analyze(
-                    symbol, articles, insider_sentiments, analyst_sentiments
-                )
-
-            # Display results
-            if isinstance(analysis, dict):
-                signal = analysis.get("signal", "UNKNOWN")
-                confidence = analysis.get("confidence", 0)
-
-                # Signal display with colors
-                signal_colors = {
-                    "STRONG BUY": "🟢",
-                    "BUY": "🟢",
-                    "HOLD": "🟡",
-                    "SELL": "🔴",
-                    "STRONG SELL": "🔴",
-                }
-
-                st.success(
-                    f"## {signal_colors.get(signal, '⚪')} Trading Signal: **{signal}**"
-                )
-                st.metric("Confidence Level", f"{confidence}/10", delta=None)
-
-                # Display detailed analysis
-                col3, col4 = st.columns(2)
-
-                with col3:
-                    st.subheader("✅ Key Reasons")
-                    for reason in analysis.get("reasons", []):
-                        st.write(f"• {reason}")
-
-                with col4:
-                    st.subheader("⚠️ Risk Factors")
-                    for risk in analysis.get("risks", []):
-                        st.write(f"• {risk}")
-
-                st.subheader("📋 Summary")
-                st.write(analysis.get("summary", "No summary available"))
+            job = shared["jobs"].start(symbol, days, fresh=fresh_analysis)
+            st.session_state["job"] = (job.symbol, job.days)
 
-            else:
-                st.error(f"Analysis failed: {analysis}")
-
-            # Display source data
-            with st.expander("📰 View Source Articles"):
-                if articles:
-                    for i, article in enumerate(articles, 1):
-                        st.write(f"**{i}. {article['title']}**")
-                        st.write(f"Source: {article['source']}")
-                        if article["url"]:
-                            st.write(f"[Read more]({article['url']})")
-                        st.write("---")
-                else:
-                    st.write("No articles found for this symbol.")
-
-            with st.expander("📱 Social Sentiment Data"):
-                for doc in insider_sentiments:
-                    # print the json document
-                    st.json(doc)
-
-                for doc in analyst_sentiments:
-                    # print the json document
-                    st.json(doc)
+        # The last requested analysis stays on screen across reruns, e.g.
+        # while the slider moves, until another one is requested
+        if "job" in st.session_state:
+            job = shared["jobs"].get(*st.session_state["job"])
+            if job is not None:
+                render_job(job)
+                running = not job.done
 
     # Footer
     st.markdown("---")
@@ -192,6 +256,11 @@ def main():
     """
     )
 
+    # Poll a running analysis once the whole page is rendered
+    if running:
+        time.sleep(POLL_INTERVAL)
+        st.rerun()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,71 @@
+"""Score the recorded analyses against historical prices
+
+Example:
+    python backtest.py prices.csv --horizons 1 5 20 --output report.json
+
+Every analysis made by the app, batch.py or server.py is recorded in
+cache/analyses.sqlite. The price file is a CSV of daily closes, either long
+(date, symbol, close) or wide (date, then one column per symbol).
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import modules.backtest as backtest
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest recorded analyses")
+    parser.add_argument("prices", help="CSV file of daily closes")
+    parser.add_argument(
+        "--analyses",
+        default="cache/analyses.sqlite",
+        help="Analysis log recorded by the app, batch.py and server.py",
+    )
+    parser.add_argument(
+        "--horizons",
+        type=int,
+        nargs="+",
+        default=[1, 5, 20],
+        help="Holding periods in trading days",
+    )
+    parser.add_argument("--since", help="Only score analyses from this date on")
+    parser.add_argument(
+        "--symbols", nargs="+", help="Only score these symbols (default: all)"
+    )
+    parser.add_argument(
+        "--hold-band",
+        type=float,
+        default=backtest.HOLD_BAND,
+        help="Absolute return under which a HOLD counts as a hit",
+    )
+    parser.add_argument("--output", help="Also write the results to a JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    analyses = backtest.AnalysisLog(args.analyses).frame(
+        symbols=[s.upper() for s in args.symbols] if args.symbols else None,
+        since=args.since,
+    )
+    if analyses.empty:
+        print(f"No analyses recorded in {args.analyses}", file=sys.stderr)
+        return 1
+    prices = backtest.load_prices(args.prices)
+    results = backtest.evaluate(
+        analyses, prices, horizons=args.horizons, hold_band=args.hold_band
+    )
+    print(backtest.summary(results))
+    print(f"\nScored in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(backtest.to_json(results), f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""Run the stock analysis over a watchlist from the command line
+
+Example:
+    python batch.py watchlist.txt --days 7 --output sweep.jsonl
+
+Results are appended to the output file as each symbol completes. Running the
+same command again after a crash resumes from that file.
+
+Watch mode keeps polling the watchlist and only calls the LLM again for
+symbols with material new evidence:
+    python batch.py watchlist.txt --watch 300 --threshold 3
+
+Triage scores the headlines, insider MSPR and analyst trends locally and
+only sends the 20 strongest or most ambiguous symbols to the LLM:
+    python batch.py watchlist.txt --top 20
+"""
+
+import argparse
+import datetime
+import json
+import sys
+
+from modules.news_fetcher import NewsFetcher
+from modules.deepseek import DeepSeekModels
+from modules.analyzer import StockAnalyzer
+from modules.compaction import PromptCompactor
+import modules.key as keys
+import modules.logger as logger
+import modules.finnhub as finnhub
+import modules.gatherer as gatherer
+import modules.router as router
+import modules.structured as structured
+import modules.batch as batch
+import modules.tracing as tracing
+import modules.transport as transport
+import modules.triage as triage
+import modules.watch as watch
+import modules.workers as workers
+from modules.backtest import AnalysisLog
+from modules.cache import ResponseCache
+from modules.store import HistoryGatherer, HistoryStore
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a watchlist of symbols")
+    parser.add_argument("watchlist", help="File with one or more symbols per line")
+    parser.add_argument("--days", type=int, default=7, help="News window in days")
+    parser.add_argument(
+        "--output",
+        default=f"batch-{datetime.datetime.now().strftime('%Y-%m-%d')}.jsonl",
+        help="JSON lines file used for results and as resume checkpoint",
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Analyze every symbol even if already in the output file",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=16, help="Symbols processed at the same time"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=60, help="Per-source fetch deadline in seconds"
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=None,
+        help="Keep-alive connections per host (default: number of workers)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always fetch from the upstream sources instead of the local cache",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Re-run the AI analysis even when a cached one matches the inputs",
+    )
+    parser.add_argument(
+        "--analysis-ttl",
+        type=float,
+        default=6 * 60 * 60,
+        help="Seconds a cached AI analysis stays valid",
+    )
+    parser.add_argument(
+        "--group-size",
+        type=int,
+        default=1,
+        help="Symbols analyzed together in one AI request",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        metavar="N",
+        help="Score the watchlist locally and only send the N strongest "
+        "symbols (and the low-confidence ones) to the AI",
+    )
+    parser.add_argument(
+        "--low-confidence",
+        type=float,
+        default=triage.DEFAULT_LOW_CONFIDENCE,
+        help="Local score agreement (0-1) under which --top still sends a symbol",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=6000,
+        help="Maximum tokens of news and sentiment evidence per prompt",
+    )
+    parser.add_argument(
+        "--history",
+        action="store_true",
+        help="Sync sources into the local history store and read from it",
+    )
+    parser.add_argument(
+        "--no-record",
+        action="store_true",
+        help="Do not record analyses in cache/analyses.sqlite for backtesting",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Serve sources from the local history store only (implies --history)",
+    )
+    parser.add_argument(
+        "--watch",
+        type=float,
+        metavar="SECONDS",
+        help="Keep polling every SECONDS and re-analyze only on material changes",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=watch.DEFAULT_THRESHOLD,
+        help="Materiality score that triggers a new analysis in watch mode",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        help="Seconds after which watch mode re-analyzes a symbol anyway",
+    )
+    parser.add_argument(
+        "--rounds", type=int, help="Stop watch mode after this many polls"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Write per-stage latency, size and token metrics as Prometheus text",
+    )
+    parser.add_argument(
+        "--trace-file", help="Write the pipeline spans as OpenTelemetry OTLP/JSON"
+    )
+    parser.add_argument(
+        "--log-json", action="store_true", help="Write the log file as JSON lines"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        nargs="?",
+        const=workers.available_cores(),
+        default=0,
+        help="Parse pages and build prompts in worker processes, "
+        "one per core without a number",
+    )
+    parser.add_argument(
+        "--model",
+        choices=[model.name for model in DeepSeekModels],
+        default=DeepSeekModels.DEEPSEEK_CHAT.name,
+    )
+    parser.add_argument(
+        "--engine",
+        action="append",
+        metavar="[URL=]MODEL",
+        help="LLM endpoint and model, repeat to route between several with "
+        "hedged requests (default: --model on the DeepSeek API)",
+    )
+    parser.add_argument(
+        "--hedge-after",
+        type=float,
+        metavar="SECONDS",
+        help="Fixed delay before a hedged request (default: the p95 latency)",
+    )
+    for provider, default in batch.DEFAULT_LIMITS.items():
+        parser.add_argument(
+            f"--{provider}",
+            type=int,
+            default=default,
+            help=f"Maximum concurrent {provider} calls (default {default})",
+        )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logger.init("BATCH", json_lines=args.log_json)
+
+    symbols = batch.read_watchlist(args.watchlist)
+    if not symbols:
+        print(f"No symbols found in {args.watchlist}", file=sys.stderr)
+        return 1
+
+    transport.configure(
+        pool_maxsize=args.pool_size or args.workers, timeout=args.timeout
+    )
+    workers.configure(processes=args.processes)
+    limits = batch.provider_limits(
+        **{provider: getattr(args, provider) for provider in batch.DEFAULT_LIMITS}
+    )
+    response_cache = None if args.no_cache else ResponseCache()
+    engine = router.from_specs(
+        args.engine or [args.model],
+        keys.DeepSeekKey(),
+        hedge_delay=args.hedge_after,
+        validate=structured.has_json,
+    )
+    fetcher = NewsFetcher(news_api_key=keys.NewsAPIKey(), cache=response_cache)
+    finnhub_client = finnhub.Finnhub(key=keys.FinnhubAPIKey(), cache=response_cache)
+    gatherer_options = dict(
+        timeout=args.timeout,
+        max_workers=args.workers * len(gatherer.SOURCES),
+        limits=limits,
+    )
+    if args.history or args.offline:
+        source_gatherer = HistoryGatherer(
+            fetcher,
+            finnhub_client,
+            HistoryStore(),
+            offline=args.offline,
+            **gatherer_options,
+        )
+    else:
+        source_gatherer = gatherer.Gatherer(fetcher, finnhub_client, **gatherer_options)
+    runner = batch.BatchRunner(
+        source_gatherer,
+        StockAnalyzer(
+            ai_engine=engine,
+            cache=response_cache,
+            cache_ttl=args.analysis_ttl,
+            compactor=PromptCompactor(token_budget=args.token_budget),
+            recorder=None if args.no_record else AnalysisLog(),
+        ),
+        limits=limits,
+        workers=args.workers,
+        checkpoint=args.output,
+        refresh=args.refresh,
+        group_size=args.group_size,
+        triage=(
+            triage.Triage(top=args.top, low_confidence=args.low_confidence)
+            if args.top is not None
+            else None
+        ),
+    )
+
+    if args.watch:
+        watcher = watch.Watcher(
+            runner,
+            watch.WatchStore(),
+            threshold=args.threshold,
+            max_age=args.max_age,
+        )
+        records = watcher.run(symbols, args.days, args.watch, rounds=args.rounds)
+    else:
+        records = runner.run(symbols, args.days, resume=not args.no_resume)
+
+    for record in records:
+        if args.watch:
+            runner.checkpoint.write(record)
+        analysis = record["analysis"]
+        if isinstance(analysis, dict):
+            line = {
+                "symbol": record["symbol"],
+                "signal": analysis.get("signal", "UNKNOWN"),
+                "confidence": analysis.get("confidence", 0),
+                "elapsed": round(record["elapsed"], 2),
+            }
+            if "watch" in record:
+                line["reanalyzed"] = record["watch"]["reanalyzed"]
+                line["age"] = round(record["watch"]["age"])
+            if "triage" in record:
+                line["triage_rank"] = record["triage"]["rank"]
+                line["sent"] = record["triage"]["selected"]
+            print(json.dumps(line), flush=True)
+        else:
+            print(json.dumps({"symbol": record["symbol"], "error": analysis}))
+
+    if response_cache is not None:
+        logger.info(f"Response cache stats: {response_cache.stats()}")
+    if isinstance(engine, router.Router):
+        logger.info(f"LLM routing stats: {engine.report()}")
+    if args.metrics_file:
+        tracing.write_prometheus(args.metrics_file)
+    if args.trace_file:
+        tracing.write_otel_json(args.trace_file)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Benchmark the backtest engine on synthetic analyses and prices
+
+Generates a random walk of daily closes and one analysis per symbol and
+trading day, with signals weakly correlated with the next returns, and times
+each stage of modules/backtest.py on them.
+
+Usage:
+    python bench/bench_backtest.py
+    python bench/bench_backtest.py --symbols 500 --days 252 --max-seconds 5
+
+With --max-seconds, the run exits with status 1 when scoring takes longer.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.backtest as backtest  # noqa: E402
+
+
+def synthetic(symbols, days, seed):
+    """Return (analyses, prices) DataFrames shaped like the real ones"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2024-01-02", periods=days + 30)
+    names = [f"S{i:04d}" for i in range(symbols)]
+    returns = rng.normal(0.0004, 0.02, size=(len(dates), symbols))
+    prices = pd.DataFrame(
+        100 * np.exp(np.cumsum(returns, axis=0)), index=dates, columns=names
+    )
+    prices.index.name = "date"
+
+    # A signal that sees a noisy version of the next 5 days
+    ahead = (prices.shift(-5) / prices - 1).iloc[:days].to_numpy().ravel()
+    view = ahead + rng.normal(0, 0.05, size=ahead.size)
+    levels = np.array(list(backtest.SIGNAL_VALUES))
+    # Bins counted up from the strongest sell, SIGNAL_VALUES is the reverse
+    signal = levels[4 - np.digitize(view, [-0.06, -0.02, 0.02, 0.06])]
+    counts = rng.integers(0, 12, size=(ahead.size, 5))
+    analyses = pd.DataFrame(
+        {
+            "symbol": np.tile(names, days),
+            "date": np.repeat(dates[:days].to_numpy(), symbols),
+            "analyzed_at": 0.0,
+            "signal": signal,
+            "confidence": np.clip(np.round(5 + np.abs(view) * 60), 1, 10).astype(
+                "int64"
+            ),
+            "mspr": rng.uniform(-100, 100, ahead.size),
+            "mspr_3m": rng.uniform(-100, 100, ahead.size),
+            "strong_buy": counts[:, 0],
+            "buy": counts[:, 1],
+            "hold": counts[:, 2],
+            "sell": counts[:, 3],
+            "strong_sell": counts[:, 4],
+        }
+    )
+    return analyses, prices
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backtest engine")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--days", type=int, default=252, help="Trading days")
+    parser.add_argument("--horizons", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--max-seconds", type=float, help="Fail when scoring takes longer"
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    analyses, prices = synthetic(args.symbols, args.days, args.seed)
+    generated = time.perf_counter() - start
+    print(
+        f"{len(analyses)} analyses, {prices.shape[1]} symbols x "
+        f"{prices.shape[0]} days generated in {generated:.2f}s"
+    )
+
+    start = time.perf_counter()
+    results = backtest.evaluate(analyses, prices, horizons=args.horizons)
+    elapsed = time.perf_counter() - start
+    print(backtest.summary(results))
+    print(f"\nScored in {elapsed:.2f}s ({len(analyses) / elapsed:,.0f} analyses/s)")
+    if args.max_seconds is not None and elapsed > args.max_seconds:
+        print(f"Slower than {args.max_seconds}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Benchmark headline extraction against saved quote pages
+
+Compares the previous full BeautifulSoup parse with every extractor backend
+available in modules/html_extract.py and reports the per-page parse time and
+the peak memory allocated while parsing. Peak memory is measured with
+tracemalloc, which only sees allocations made through Python's allocator, so
+it understates the C-level memory of lxml and selectolax trees.
+
+The BeautifulSoup baseline needs beautifulsoup4 from requirements-dev.txt.
+
+Usage:
+    python bench/bench_html_extract.py
+    python bench/bench_html_extract.py --finviz page.html --yahoo news.html
+
+The default fixtures are synthetic pages with the same structure as the live
+Finviz quote and Yahoo Finance news pages. Saved live pages can be passed
+instead.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.html_extract as html_extract  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def bs4_finviz(html, max_articles):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    items = soup.find_all("a", {"class": "tab-link-news"})
+    return [(item.get_text(strip=True), item.get("href", "")) for item in items][
+        :max_articles
+    ]
+
+
+def bs4_yahoo(html, max_articles):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    items = soup.find_all("h3", {"class": re.compile(".*headline.*", re.I)})
+    return [item.get_text(strip=True) for item in items[:max_articles]]
+
+
+def measure(extract, html, max_articles, runs):
+    """Return (median seconds, peak bytes, number of items) of an extractor"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        items = extract(html, max_articles)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    extract(html, max_articles)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak, len(items)
+
+
+def bench_page(name, path, baseline, extract, max_articles, runs):
+    with open(path, "rb") as f:
+        html = f.read()
+    print(f"\n{name}: {path} ({len(html) / 1024:.0f} KiB), max_articles={max_articles}")
+    print(f"{'parser':<22}{'median ms':>12}{'peak KiB':>12}{'items':>8}{'speedup':>10}")
+
+    candidates = []
+    try:
+        import bs4  # noqa: F401
+
+        candidates.append(("bs4 html.parser", baseline))
+    except ImportError:
+        print("bs4 not installed, no baseline")
+    for backend in html_extract.available_backends():
+        candidates.append(
+            (
+                backend,
+                lambda html, n, backend=backend: extract(html, n, backend=backend),
+            )
+        )
+
+    base_time = None
+    for label, function in candidates:
+        seconds, peak, count = measure(function, html, max_articles, runs)
+        base_time = base_time or seconds
+        print(
+            f"{label:<22}{seconds * 1000:>12.2f}{peak / 1024:>12.0f}"
+            f"{count:>8}{base_time / seconds:>9.1f}x"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--finviz", default=os.path.join(FIXTURES, "finviz_quote.html"))
+    parser.add_argument("--yahoo", default=os.path.join(FIXTURES, "yahoo_news.html"))
+    parser.add_argument("--max-articles", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    bench_page(
+        "Finviz",
+        args.finviz,
+        bs4_finviz,
+        html_extract.extract_finviz_news,
+        args.max_articles,
+        args.runs,
+    )
+    bench_page(
+        "Yahoo Finance",
+        args.yahoo,
+        bs4_yahoo,
+        html_extract.extract_yahoo_headlines,
+        args.max_articles,
+        args.runs,
+    )
+
+
+if __name__ == "__main__":
+    main()
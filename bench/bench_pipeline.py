@@ -0,0 +1,331 @@
+"""Benchmark the whole analysis pipeline offline
+
+Runs BatchRunner sweeps against bench/mock_server.py, which replays the
+recorded NewsAPI, Finviz and Finnhub responses and mocks the DeepSeek API
+with a configurable latency and token rate. No network access or API keys
+are needed.
+
+Every scenario runs in its own process, so its peak RSS and CPU time are not
+mixed with the other scenarios or the mock server. Per stage, the report
+shows the number of spans, p50/p95 latency and the CPU time of the threads
+running them, from modules/tracing.py. With --processes, parsing and prompt
+building run in worker processes (modules/workers.py): their CPU time counts
+in the scenario's total but not in the stages'.
+
+Usage:
+    python bench/bench_pipeline.py
+    python bench/bench_pipeline.py --scenarios single,sweep100 --output bench.json
+    python bench/bench_pipeline.py --baseline bench.json --tolerance 0.25
+    python bench/bench_pipeline.py --scenarios sweep1000 --processes 4
+
+With --baseline, the run exits with status 1 when a scenario's throughput
+drops, or a stage's p95 latency or the peak RSS grows, by more than the
+tolerance.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = {"single": 1, "sweep100": 100, "sweep1000": 1000}
+# Stages faster than this are too noisy to flag as regressions
+MIN_P95 = 0.005
+
+
+class _Key:
+    """Stand-in for the modules.key classes"""
+
+    value = "bench"
+
+    def exists(self):
+        return True
+
+
+def run_scenario(name, server_url, workers, days, group_size, processes=0):
+    """
+    Run one scenario in this process.
+
+    :return: Result dict of the scenario.
+    """
+    import modules.batch as batch
+    import modules.logger as logger
+    import modules.scheduler as scheduler
+    import modules.tracing as tracing
+    import modules.transport as transport
+    import modules.workers as process_pool
+    from mock_server import ReplayAdapter
+    from modules.analyzer import StockAnalyzer
+    from modules.compaction import PromptCompactor
+    from modules.deepseek import DeepSeek
+    from modules.finnhub import Finnhub
+    from modules.gatherer import SOURCES, Gatherer
+    from modules.news_fetcher import NewsFetcher
+
+    logger.init("BENCH")
+    count = SCENARIOS[name]
+    # Measure the pipeline, not the providers' rate limits
+    scheduler.configure(
+        ledger_path="",
+        rates={
+            provider: {"rate": 1e6, "burst": 1e6, "daily": None}
+            for provider in scheduler.DEFAULT_RATES
+        },
+    )
+    tracing.configure(buffer_size=count * 20)
+    transport.configure(pool_maxsize=workers)
+    process_pool.configure(processes=processes)
+
+    def replay(session):
+        adapter = ReplayAdapter(server_url, pool_maxsize=workers * len(SOURCES))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+    replay(transport.session())
+    finnhub_client = Finnhub(key=_Key())
+    replay(finnhub_client.finnhub_client._session)
+    limits = batch.provider_limits()
+    runner = batch.BatchRunner(
+        Gatherer(
+            NewsFetcher(news_api_key=_Key()),
+            finnhub_client,
+            timeout=60,
+            max_workers=workers * len(SOURCES),
+            limits=limits,
+        ),
+        StockAnalyzer(
+            ai_engine=DeepSeek(deepseek_api_key=_Key(), base_url=server_url),
+            compactor=PromptCompactor(),
+        ),
+        limits=limits,
+        workers=workers,
+        group_size=group_size,
+    )
+    symbols = [f"BM{i:04d}" for i in range(count)]
+
+    cpu_start = os.times()
+    start = time.perf_counter()
+    errors = 0
+    for record in runner.run(symbols, days, resume=False):
+        analysis = record["analysis"]
+        if record["errors"] or not isinstance(analysis, dict):
+            errors += 1
+        elif analysis.get("signal") in ("ERROR", "UNKNOWN"):
+            errors += 1
+    elapsed = time.perf_counter() - start
+    # Joining the worker processes adds their CPU time to the children's
+    process_pool.shutdown()
+    cpu_end = os.times()
+
+    stages = {}
+    for stage, stats in sorted(tracing.stats().items()):
+        quantiles = tracing.percentiles(stage, (0.5, 0.95))
+        stages[stage] = {
+            "count": stats["count"],
+            "errors": stats["errors"],
+            "p50": quantiles.get(0.5, 0.0),
+            "p95": quantiles.get(0.95, 0.0),
+            "cpu_seconds": stats["cpu_seconds"],
+            "bytes": stats["bytes"],
+        }
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    worker_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "scenario": name,
+        "symbols": count,
+        "workers": workers,
+        "processes": processes,
+        "elapsed": elapsed,
+        "throughput": count / elapsed,
+        "errors": errors,
+        "cpu_seconds": sum(cpu_end[:4]) - sum(cpu_start[:4]),
+        "peak_rss_mb": rss / scale,
+        "peak_worker_rss_mb": worker_rss / scale,
+        "stages": stages,
+    }
+
+
+def start_server(args):
+    """Start the mock server in a child process and return (process, url)"""
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(BENCH, "mock_server.py"),
+            "--port",
+            "0",
+            "--latency",
+            str(args.latency),
+            "--llm-latency",
+            str(args.llm_latency),
+            "--tokens-per-second",
+            str(args.tokens_per_second),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    return process, process.stdout.readline().strip()
+
+
+def spawn_scenario(name, server_url, args):
+    """Run a scenario in a fresh interpreter and return its result"""
+    completed = subprocess.run(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--run",
+            name,
+            "--server",
+            server_url,
+            "--workers",
+            str(args.workers),
+            "--days",
+            str(args.days),
+            "--group-size",
+            str(args.group_size),
+            "--processes",
+            str(args.processes),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def report(result):
+    print(
+        f"\n{result['scenario']}: {result['symbols']} symbols, "
+        f"{result['workers']} workers, {result['processes']} processes, "
+        f"{result['elapsed']:.2f}s, {result['throughput']:.2f} symbols/s, "
+        f"{result['errors']} errors, CPU {result['cpu_seconds']:.2f}s, "
+        f"peak RSS {result['peak_rss_mb']:.0f} MiB"
+    )
+    if result["processes"]:
+        print(f"Peak worker RSS {result['peak_worker_rss_mb']:.0f} MiB")
+    print(
+        f"{'stage':<38}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'CPU s':>9}{'KiB':>10}"
+    )
+    for stage, stats in result["stages"].items():
+        print(
+            f"{stage:<38}{stats['count']:>7}{stats['p50'] * 1000:>10.1f}"
+            f"{stats['p95'] * 1000:>10.1f}{stats['cpu_seconds']:>9.2f}"
+            f"{stats['bytes'] / 1024:>10.0f}"
+        )
+
+
+def regressions(results, baseline, tolerance):
+    """Return a message per metric worse than the baseline by the tolerance"""
+    found = []
+    previous = {result["scenario"]: result for result in baseline}
+    for result in results:
+        before = previous.get(result["scenario"])
+        if before is None:
+            continue
+        name = result["scenario"]
+        if result["throughput"] < before["throughput"] * (1 - tolerance):
+            found.append(
+                f"{name}: throughput {result['throughput']:.2f} < "
+                f"{before['throughput']:.2f} symbols/s"
+            )
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance):
+            found.append(
+                f"{name}: peak RSS {result['peak_rss_mb']:.0f} > "
+                f"{before['peak_rss_mb']:.0f} MiB"
+            )
+        for stage, stats in result["stages"].items():
+            old = before["stages"].get(stage)
+            if old is None or max(stats["p95"], old["p95"]) < MIN_P95:
+                continue
+            if stats["p95"] > old["p95"] * (1 + tolerance):
+                found.append(
+                    f"{name}: {stage} p95 {stats['p95'] * 1000:.1f} > "
+                    f"{old['p95'] * 1000:.1f} ms"
+                )
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help=f"Comma separated scenarios out of {', '.join(SCENARIOS)}",
+    )
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--group-size", type=int, default=1)
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=0,
+        help="Worker processes for parsing and prompt building",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds per provider response"
+    )
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.3, help="Seconds to the first token"
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Results JSON of a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    # Internal: run one scenario against a running server and print its result
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--server", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run:
+        sys.path.insert(0, BENCH)
+        result = run_scenario(
+            args.run,
+            args.server,
+            args.workers,
+            args.days,
+            args.group_size,
+            args.processes,
+        )
+        print(json.dumps(result))
+        return 0
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    server, server_url = start_server(args)
+    try:
+        results = []
+        for name in names:
+            results.append(spawn_scenario(name, server_url, args))
+            report(results[-1])
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        if found:
+            print("\nRegressions against " + args.baseline)
+            for message in found:
+                print(f"  {message}")
+            return 1
+        print(f"\nNo regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Measure the memory of the gathered evidence held by a batch
+
+Builds the evidence of many symbols from the recorded fixtures, decoding
+every payload from JSON separately as the response cache does, and measures
+with tracemalloc what holding all of it costs as plain dicts and as the
+compact records of modules/records.py that GatherResult keeps. Also times
+the conversion and a pass reading every field, the prompt building access
+pattern.
+
+Usage:
+    python bench/bench_records.py
+    python bench/bench_records.py --symbols 500 --articles 30
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH))
+
+import modules.news_fetcher as news_fetcher  # noqa: E402
+from modules.gatherer import (  # noqa: E402
+    ANALYST_TRENDS,
+    FINVIZ,
+    INSIDER_SENTIMENT,
+    NEWS_API,
+    GatherResult,
+    SourceResult,
+)
+
+FIXTURES = os.path.join(BENCH, "fixtures")
+FIXTURE_SYMBOL = "AAPL"
+
+
+def fixture_payloads(articles):
+    """JSON text of each source's payload, in the fetchers' format"""
+    with open(os.path.join(FIXTURES, "newsapi_everything.json")) as f:
+        newsapi = [
+            {
+                "title": article["title"],
+                "content": article["description"],
+                "url": article.get("url", ""),
+                "source": "NewsAPI",
+                "published": article.get("publishedAt", ""),
+            }
+            for article in json.load(f)["articles"]
+            if article.get("title") and article.get("description")
+        ]
+    with open(os.path.join(FIXTURES, "finviz_quote.html"), "rb") as f:
+        finviz = news_fetcher._parse_finviz(f.read(), articles)
+    with open(os.path.join(FIXTURES, "finnhub_insider_sentiment.json")) as f:
+        insider = json.load(f)
+    with open(os.path.join(FIXTURES, "finnhub_recommendation_trends.json")) as f:
+        trends = json.load(f)
+    # Repeat the recorded articles up to the requested count
+    newsapi = [newsapi[i % len(newsapi)] for i in range(articles)]
+    return {
+        NEWS_API: json.dumps(newsapi),
+        FINVIZ: json.dumps(finviz[:articles]),
+        INSIDER_SENTIMENT: json.dumps(insider),
+        ANALYST_TRENDS: json.dumps(trends),
+    }
+
+
+def gather_all(payloads, symbols, build):
+    """Decode every symbol's payloads separately, like cache hits"""
+    results = []
+    for i in range(symbols):
+        symbol = f"BM{i:04d}"
+        sources = {
+            name: SourceResult(
+                name, True, json.loads(text.replace(FIXTURE_SYMBOL, symbol)), 0.0
+            )
+            for name, text in payloads.items()
+        }
+        results.append(build(symbol, sources))
+    return results
+
+
+class PlainResult:
+    """GatherResult holding the decoded dicts as they are"""
+
+    def __init__(self, symbol, days, sources, elapsed):
+        self.symbol = symbol
+        self.days = days
+        self.sources = sources
+        self.elapsed = elapsed
+
+
+def measure(payloads, symbols, result_type):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = gather_all(
+        payloads, symbols, lambda symbol, sources: result_type(symbol, 30, sources, 0)
+    )
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for result in results:
+        for source in result.sources.values():
+            payload = source.payload
+            rows = payload.get("data", []) if isinstance(payload, dict) else payload
+            for row in rows:
+                for key in row:
+                    row[key]
+    read = time.perf_counter() - start
+    return current, peak, elapsed, read
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure gathered evidence memory")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--articles", type=int, default=30, help="Per news source")
+    args = parser.parse_args(argv)
+
+    payloads = fixture_payloads(args.articles)
+    report = {}
+    for name, result_type in (("dicts", PlainResult), ("records", GatherResult)):
+        current, peak, elapsed, read = measure(payloads, args.symbols, result_type)
+        report[name] = current
+        print(
+            f"{name:<8} {current / args.symbols / 1024:7.1f} KiB per symbol "
+            f"(peak {peak / 2**20:.1f} MiB), built in {elapsed:.2f}s, "
+            f"read in {read:.2f}s"
+        )
+    print(f"saved {1 - report['records'] / report['dicts']:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
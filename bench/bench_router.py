@@ -0,0 +1,115 @@
+"""Benchmark the tail latency of hedged LLM requests
+
+Starts two local stand-ins of the DeepSeek API (bench/mock_server.py) whose
+completions are slow now and then, and sends the same prompts through a
+single DeepSeek engine and through a Router over both endpoints. Reports the
+p50, p95 and p99 latency of each, how many requests the router hedged, and
+how many hedged requests the mock servers saw cancelled.
+
+Usage:
+    python bench/bench_router.py
+    python bench/bench_router.py --requests 400 --tail 0.05 --tail-latency 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH))
+sys.path.insert(0, BENCH)
+
+import modules.logger as logger  # noqa: E402
+import modules.scheduler as scheduler  # noqa: E402
+from mock_server import MockServer  # noqa: E402
+from modules.deepseek import DeepSeek  # noqa: E402
+from modules.router import Router  # noqa: E402
+
+
+class _Key:
+    """Stand-in for the modules.key classes"""
+
+    value = "bench"
+
+    def exists(self):
+        return True
+
+
+def latencies(engine, requests, concurrency):
+    """Seconds of each engine.send() of an analysis prompt"""
+
+    def one(i):
+        start = time.perf_counter()
+        engine.send(f"Give me advice about BM{i:04d} stock", max_tokens=500)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(one, range(requests)))
+
+
+def describe(name, seconds):
+    quantiles = statistics.quantiles(seconds, n=100)
+    return (
+        f"{name:<8} p50 {quantiles[49]:.2f}s  p95 {quantiles[94]:.2f}s  "
+        f"p99 {quantiles[98]:.2f}s  max {max(seconds):.2f}s"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hedged LLM requests")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="First token")
+    parser.add_argument("--tail", type=float, default=0.05, help="Slow fraction")
+    parser.add_argument("--tail-latency", type=float, default=3.0)
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0)
+    args = parser.parse_args(argv)
+
+    logger.init("BENCH")
+    scheduler.configure(
+        ledger_path="",
+        rates={
+            provider: {"rate": 1e6, "burst": 1e6, "daily": None}
+            for provider in scheduler.DEFAULT_RATES
+        },
+    )
+    options = dict(
+        llm_latency=args.latency,
+        llm_tail=args.tail,
+        llm_tail_latency=args.tail_latency,
+        tokens_per_second=args.tokens_per_second,
+    )
+    with MockServer(seed=1, **options) as first, MockServer(
+        seed=2, **options
+    ) as second:
+        single = DeepSeek(deepseek_api_key=_Key(), base_url=first.url)
+        print(describe("single", latencies(single, args.requests, args.concurrency)))
+
+        router = Router(
+            [
+                DeepSeek(deepseek_api_key=_Key(), base_url=first.url),
+                DeepSeek(deepseek_api_key=_Key(), base_url=second.url),
+            ],
+            initial_delay=args.latency * 2,
+        )
+        print(describe("router", latencies(router, args.requests, args.concurrency)))
+        # Let the cancelled streams notice their closed connection
+        time.sleep(0.5)
+        for name, stats in router.report().items():
+            print(
+                f"  {name}: {stats['wins']} wins, {stats['hedges']} hedges, "
+                f"{stats['cancelled']} cancelled, {stats['failures']} failures"
+            )
+        print(
+            "  cancelled streams seen by the servers: "
+            f"{first.counts.get('chat_cancelled', 0)}"
+            f" + {second.counts.get('chat_cancelled', 0)}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Profile the import time of the entry points
+
+Runs every entry point in fresh interpreters and reports the median
+wall-clock time of importing it, on top of a bare interpreter start, and the
+modules with the largest self import time from `python -X importtime`.
+
+Usage:
+    python bench/bench_startup.py
+    python bench/bench_startup.py --entry batch --entry modules.gatherer --top 20
+    python bench/bench_startup.py --max-ms 100
+
+With --max-ms, the run exits with status 1 when an entry point takes longer
+than that to start, interpreter start included.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRIES = ("batch", "server", "modules.gatherer", "modules.analyzer")
+
+
+def wall_time(code, runs):
+    """Median seconds of running `python -c code` in the repository root"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def import_profile(entry):
+    """
+    Parse the -X importtime report of importing an entry point.
+
+    :return: List of (self microseconds, cumulative microseconds, module).
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entry}"],
+        cwd=ROOT,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line[len("import time:") :].split("|")
+        rows.append((int(own), int(cumulative), module.strip()))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--entry",
+        action="append",
+        help=f"Module to import, repeatable (default {', '.join(ENTRIES)})",
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules shown")
+    parser.add_argument("--max-ms", type=float, help="Fail above this start time")
+    args = parser.parse_args(argv)
+
+    baseline = wall_time("pass", args.runs)
+    print(f"Interpreter start: {baseline * 1000:.1f} ms (median of {args.runs})")
+
+    slow = []
+    for entry in args.entry or ENTRIES:
+        total = wall_time(f"import {entry}", args.runs)
+        rows = import_profile(entry)
+        loaded = len(rows)
+        print(
+            f"\n{entry}: {total * 1000:.1f} ms, "
+            f"+{(total - baseline) * 1000:.1f} ms over the interpreter, "
+            f"{loaded} modules imported"
+        )
+        print(f"{'self ms':>9}{'cumulative ms':>15}  module")
+        for own, cumulative, module in sorted(rows, reverse=True)[: args.top]:
+            print(f"{own / 1000:>9.1f}{cumulative / 1000:>15.1f}  {module}")
+        if args.max_ms is not None and total * 1000 > args.max_ms:
+            slow.append(f"{entry}: {total * 1000:.1f} ms > {args.max_ms:.0f} ms")
+
+    if slow:
+        print("\nSlow entry points")
+        for message in slow:
+            print(f"  {message}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
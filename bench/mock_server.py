@@ -0,0 +1,340 @@
+"""Local stand-in for the NewsAPI, Finviz, Yahoo, Finnhub and DeepSeek APIs
+
+Replays the recorded responses in bench/fixtures for any symbol, and answers
+OpenAI-compatible chat completions with a well-formed synthetic analysis
+after a configurable latency and token rate, so the whole pipeline can run
+without network access or API keys.
+
+Usage:
+    python bench/mock_server.py --port 8099 --llm-latency 0.5 --tokens-per-second 50
+
+Point the AI engine at it with DeepSeek(key, base_url="http://127.0.0.1:8099").
+The data providers have fixed hosts, bench_pipeline.py sends their requests
+here with ReplayAdapter.
+
+The fixtures were recorded for FIXTURE_SYMBOL, which is replaced by the
+requested symbol in every response.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+from requests.adapters import HTTPAdapter
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_SYMBOL = "AAPL"
+SIGNALS = ("STRONG BUY", "BUY", "HOLD", "SELL", "STRONG SELL")
+# Average characters per token of the synthetic completions
+CHARS_PER_TOKEN = 4
+
+# Fixture file and content type of each replayed endpoint
+ROUTES = {
+    "newsapi": ("newsapi_everything.json", "application/json"),
+    "finviz": ("finviz_quote.html", "text/html; charset=utf-8"),
+    "yahoo": ("yahoo_news.html", "text/html; charset=utf-8"),
+    "insider_sentiment": ("finnhub_insider_sentiment.json", "application/json"),
+    "recommendation": ("finnhub_recommendation_trends.json", "application/json"),
+    "insider_transactions": (None, "application/json"),
+}
+
+
+def _route(path, query):
+    """Return (route name, symbol) of a provider request, or (None, None)"""
+    path = re.sub("/+", "/", path)
+    if path == "/v2/everything":
+        return "newsapi", query.get("q", [""])[0].split(" ")[0]
+    if path == "/quote.ashx":
+        return "finviz", query.get("t", [""])[0]
+    match = re.fullmatch(r"/quote/([^/]+)/news", path)
+    if match:
+        return "yahoo", match.group(1)
+    match = re.fullmatch(
+        r"/api/v1/stock/(insider-sentiment|recommendation|insider-transactions)", path
+    )
+    if match:
+        return match.group(1).replace("-", "_"), query.get("symbol", [""])[0]
+    return None, None
+
+
+def analysis(symbol):
+    """Deterministic, well-formed analysis of a symbol"""
+    index = zlib.crc32(symbol.encode("utf-8"))
+    signal = SIGNALS[index % len(SIGNALS)]
+    return {
+        "signal": signal,
+        "confidence": 3 + index % 7,
+        "reasons": [
+            f"Recent news flow on {symbol} is consistent with a {signal} view",
+            "Insider activity over the last months is mixed",
+            "Analyst recommendations are stable quarter over quarter",
+        ],
+        "risks": ["Market-wide volatility", "Guidance revisions at next earnings"],
+        "summary": f"Synthetic {signal} analysis of {symbol} from the mock server.",
+    }
+
+
+def completion(prompt):
+    """Synthetic response text to an analysis prompt"""
+    symbols = re.findall(r"===== (\S+) =====", prompt)
+    if symbols:
+        return json.dumps([dict(analysis(s), symbol=s) for s in symbols], indent=2)
+    match = re.search(r"about (\S+) stock", prompt)
+    return json.dumps(analysis(match.group(1) if match else "UNKNOWN"), indent=2)
+
+
+class MockServer:
+    """
+    Threaded HTTP server replaying the fixtures and mocking the LLM.
+
+    :param latency: Seconds added to every provider response.
+    :param llm_latency: Seconds before the first token of a completion.
+    :param tokens_per_second: Generation rate of completions.
+    :param llm_tail: Fraction of completions delayed by llm_tail_latency
+        more, to reproduce a provider's slow tail.
+    :param llm_tail_latency: Extra seconds of the slow completions.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0.05,
+        llm_latency=0.3,
+        tokens_per_second=200.0,
+        fixtures=FIXTURES,
+        llm_tail=0.0,
+        llm_tail_latency=0.0,
+        seed=0,
+    ):
+        self.latency = latency
+        self.llm_latency = llm_latency
+        self.tokens_per_second = tokens_per_second
+        self.llm_tail = llm_tail
+        self.llm_tail_latency = llm_tail_latency
+        self._random = random.Random(seed)
+        self.fixtures = {}
+        for name, (filename, content_type) in ROUTES.items():
+            if filename is None:
+                body = json.dumps({"data": [], "symbol": FIXTURE_SYMBOL}).encode()
+            else:
+                with open(os.path.join(fixtures, filename), "rb") as f:
+                    body = f.read()
+            self.fixtures[name] = (body, content_type)
+        self.counts = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def first_token_latency(self):
+        with self._lock:
+            slow = self._random.random() < self.llm_tail
+        return self.llm_latency + (self.llm_tail_latency if slow else 0.0)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, name="mock-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # A client dropped its connection, e.g. a cancelled hedge
+            pass
+
+    def _send(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        name, symbol = _route(url.path, parse_qs(url.query))
+        if name is None:
+            return self._send(404, b'{"error": "unknown endpoint"}')
+        self.mock.count(name)
+        time.sleep(self.mock.latency)
+        body, content_type = self.mock.fixtures[name]
+        if symbol:
+            body = body.replace(FIXTURE_SYMBOL.encode(), symbol.encode("utf-8"))
+        self._send(200, body, content_type)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send(404, b'{"error": "unknown endpoint"}')
+        self.mock.count("chat")
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+        text = completion(prompt)
+        usage = {
+            "prompt_tokens": len(prompt) // CHARS_PER_TOKEN,
+            "completion_tokens": len(text) // CHARS_PER_TOKEN,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {
+            "id": f"mock-{time.time_ns()}",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+        }
+
+        time.sleep(self.mock.first_token_latency())
+        if not request.get("stream"):
+            time.sleep(usage["completion_tokens"] / self.mock.tokens_per_second)
+            body = dict(
+                base,
+                object="chat.completion",
+                choices=[
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }
+                ],
+                usage=usage,
+            )
+            return self._send(200, json.dumps(body).encode())
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        # Send about 4 tokens per chunk at the configured rate
+        step = 4 * CHARS_PER_TOKEN
+        for start in range(0, len(text), step):
+            chunk = dict(
+                base,
+                object="chat.completion.chunk",
+                choices=[
+                    {
+                        "index": 0,
+                        "delta": {"content": text[start : start + step]},
+                        "finish_reason": None,
+                    }
+                ],
+            )
+            try:
+                self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            except (BrokenPipeError, ConnectionResetError):
+                # The client closed the stream, e.g. a cancelled hedge
+                self.mock.count("chat_cancelled")
+                self.close_connection = True
+                return
+            time.sleep(4 / self.mock.tokens_per_second)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunk = dict(base, object="chat.completion.chunk", choices=[], usage=usage)
+            self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+        self._chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    requests adapter sending every request to the mock server.
+
+    Mount it on a session to replay the fixtures instead of calling the
+    real hosts, e.g. session.mount("https://", ReplayAdapter(server.url)).
+    """
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base = urlsplit(base_url)
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        request.url = urlunsplit(
+            (self.base.scheme, self.base.netloc, url.path, url.query, "")
+        )
+        return super().send(request, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds per provider response"
+    )
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.3, help="Seconds to the first token"
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument(
+        "--llm-tail", type=float, default=0.0, help="Fraction of slow completions"
+    )
+    parser.add_argument(
+        "--llm-tail-latency",
+        type=float,
+        default=0.0,
+        help="Extra seconds to the first token of the slow completions",
+    )
+    args = parser.parse_args(argv)
+
+    server = MockServer(
+        args.host,
+        args.port,
+        latency=args.latency,
+        llm_latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        llm_tail=args.llm_tail,
+        llm_tail_latency=args.llm_tail_latency,
+    )
+    # The first line tells a parent process where to connect
+    print(server.url, flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
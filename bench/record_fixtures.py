@@ -0,0 +1,95 @@
+"""Record live provider responses as benchmark fixtures
+
+Fetches the NewsAPI, Finviz, Yahoo Finance and Finnhub responses of one
+symbol and saves them in bench/fixtures, where mock_server.py replays them.
+Needs network access and the NEWS_API_KEY and FINNHUB_API_KEY of the .env
+file.
+
+Usage:
+    python bench/record_fixtures.py
+    python bench/record_fixtures.py --days 14
+
+The symbol is FIXTURE_SYMBOL of mock_server.py, since the mock server
+replaces it by the requested symbol when replaying.
+"""
+
+import argparse
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.key as keys  # noqa: E402
+import modules.logger as logger  # noqa: E402
+import modules.transport as transport  # noqa: E402
+from mock_server import FIXTURE_SYMBOL, FIXTURES, ROUTES  # noqa: E402
+from modules.news_fetcher import (  # noqa: E402
+    BROWSER_HEADERS,
+    NEWS_API_URL,
+    _finviz_url,
+    _news_api_params,
+    _yahoo_url,
+)
+
+FINNHUB_URL = "https://finnhub.io/api/v1"
+
+
+def requests_to_record(days):
+    """Return (route name, url, params, headers) of every recorded endpoint"""
+    symbol = FIXTURE_SYMBOL
+    now = datetime.datetime.now()
+    from_date = (now - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
+    to_date = now.strftime("%Y-%m-%d")
+    finnhub_key = keys.FinnhubAPIKey().value
+    return [
+        (
+            "newsapi",
+            NEWS_API_URL,
+            _news_api_params(symbol, from_date, None, keys.NewsAPIKey().value),
+            None,
+        ),
+        ("finviz", _finviz_url(symbol), None, BROWSER_HEADERS),
+        ("yahoo", _yahoo_url(symbol), None, BROWSER_HEADERS),
+        (
+            "insider_sentiment",
+            f"{FINNHUB_URL}/stock/insider-sentiment",
+            {
+                "symbol": symbol,
+                "from": "2000-01-01",
+                "to": to_date,
+                "token": finnhub_key,
+            },
+            None,
+        ),
+        (
+            "recommendation",
+            f"{FINNHUB_URL}/stock/recommendation",
+            {"symbol": symbol, "token": finnhub_key},
+            None,
+        ),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=7, help="News window in days")
+    args = parser.parse_args(argv)
+    logger.init("RECORD")
+
+    failed = 0
+    for name, url, params, headers in requests_to_record(args.days):
+        response = transport.get(url, params=params, headers=headers)
+        if response.status_code != 200:
+            print(f"{name}: HTTP {response.status_code}, kept the old fixture")
+            failed += 1
+            continue
+        path = os.path.join(FIXTURES, ROUTES[name][0])
+        with open(path, "wb") as f:
+            f.write(response.content)
+        print(f"{name}: {len(response.content) / 1024:.0f} KiB -> {path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
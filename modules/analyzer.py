@@ -1,11 +1,120 @@
 import json
 import datetime
+from collections.abc import Mapping
+
+import modules.logger as logger
+import modules.structured as structured
+import modules.tracing as tracing
+import modules.workers as workers
+from modules.json_stream import JSONFieldStream
+from modules.records import plain
+
+# Bump when the prompt or response format changes to invalidate cached analyses
+PROMPT_VERSION = 1
+
+# Follow-up requests for missing fields only need room for those fields
+REPAIR_MAX_TOKENS = 1000
+# Characters of the malformed response quoted back in a follow-up request
+REPAIR_CONTEXT_CHARS = 4000
+
+INSIDER_SENTIMENT_EXPLANATION = (
+    "Finnhub’s insider trading API gathers data whenever a stakeholder purchases "
+    "or sells their stocks from their disclosure in Form 3,4,5 with the SEC. "
+    "During COVID19, executives may hold their assets until Fall 2021, when some "
+    "positive signal appeared. This habit can be interpreted as an insightful "
+    "signal for a trader. Instead of relying on simple price information, joining "
+    "insiders during their trading actions can significantly improve retail "
+    "investors’ investments return. Thus, the monthly share purchase ratio (MSPR) "
+    "is introduced to signal insider trading events quantitatively."
+)
 
 
 class StockAnalyzer:
-    def __init__(self, ai_engine):
-        """Initialize with DeepSeek API key"""
+    def __init__(
+        self,
+        ai_engine,
+        cache=None,
+        cache_ttl=6 * 60 * 60,
+        temperature=0.3,
+        max_tokens=10000,
+        compactor=None,
+        repair_attempts=1,
+        recorder=None,
+    ):
+        """
+        Initialize with the AI engine used for the analysis.
+
+        :param ai_engine: Engine exposing send(prompt, temperature, max_tokens).
+        :param cache: Optional ResponseCache used to memoize analyses.
+        :param cache_ttl: Seconds a memoized analysis stays valid.
+        :param temperature: Sampling temperature of the AI engine.
+        :param max_tokens: Maximum number of tokens of the AI response.
+        :param compactor: Optional PromptCompactor deduplicating and trimming
+            the evidence to a token budget before it is sent.
+        :param repair_attempts: Follow-up requests asking only for the fields
+            missing or invalid in a response, before they get placeholders.
+        :param recorder: Optional AnalysisLog recording every new analysis
+            with its insider and analyst evidence, for backtesting.
+        """
         self.ai_engine = ai_engine
+        self.compactor = compactor
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.repair_attempts = repair_attempts
+        self.recorder = recorder
+
+    def __getstate__(self):
+        # Worker processes only build prompts and parse responses, they need
+        # neither the engine's clients nor the cache's connection
+        return dict(self.__dict__, ai_engine=None, cache=None, recorder=None)
+
+    def cache_key(self, symbol, articles, insider_sentiments, analyst_sentiments):
+        """
+        Hash the canonicalized analysis inputs.
+
+        Articles and sentiment records are sorted so that the same evidence
+        fetched in a different order maps to the same key. The current date,
+        embedded in the prompt, is deliberately not part of the key.
+        """
+        import hashlib
+
+        def canonical(records):
+            # Insider sentiment comes as {"data": [...], "symbol": ...}
+            if isinstance(records, dict):
+                records = records.get("data", [])
+            return sorted(
+                json.dumps(
+                    dict(record) if isinstance(record, Mapping) else record,
+                    sort_keys=True,
+                    default=str,
+                )
+                for record in records or []
+            )
+
+        model = getattr(self.ai_engine, "deepseek_model", None)
+        inputs = {
+            "version": PROMPT_VERSION,
+            "symbol": symbol,
+            "articles": sorted(
+                [
+                    article.get("source", ""),
+                    article.get("title", ""),
+                    article.get("content", ""),
+                ]
+                for article in articles
+            ),
+            "insider_sentiments": canonical(insider_sentiments),
+            "analyst_sentiments": canonical(analyst_sentiments),
+            "model": getattr(model, "value", model),
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "compaction": self.compactor.config() if self.compactor else None,
+        }
+        return hashlib.sha256(
+            json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
 
     def prompt(self, symbol, news_articles, insider_sentiments, analyst_sentiments):
         today_string = datetime.datetime.today().strftime("%Y-%m-%d")
@@ -17,7 +126,7 @@ class StockAnalyzer:
         - analyst sentiment trends 
 
         insider sentiment trend is calculated as following:
-        Finnhub’s insider trading API gathers data whenever a stakeholder purchases or sells their stocks from their disclosure in Form 3,4,5 with the SEC. During COVID19, executives may hold their assets until Fall 2021, when some positive signal appeared. This habit can be interpreted as an insightful signal for a trader. Instead of relying on simple price information, joining insiders during their trading actions can significantly improve retail investors’ investments return. Thus, the monthly share purchase ratio (MSPR) is introduced to signal insider trading events quantitatively.
+        {INSIDER_SENTIMENT_EXPLANATION}
 
         Today is {today_string}
         
@@ -48,13 +157,118 @@ class StockAnalyzer:
         """
 
     def analyze(
-        self, symbol, articles: list, insider_sentiments: list, analyst_sentiment: list
+        self,
+        symbol,
+        articles: list,
+        insider_sentiments: list,
+        analyst_sentiment: list,
+        bypass_cache=False,
+    ):
+        """
+        Use AI engine to analyze the collected data and provide trading signal.
+
+        When a cache is configured, an analysis of identical inputs is returned
+        from it without calling the AI engine. Pass bypass_cache=True to force
+        a fresh analysis; its result still replaces the cached one.
+
+        The response is requested in JSON mode when the engine supports it,
+        repaired if malformed and validated against the analysis schema.
+        Fields still missing or invalid are asked for again in a short
+        follow-up request rather than by repeating the analysis.
+        """
+
+        if not self.ai_engine:
+            return "Error: AI engine not initialized"
+
+        if self.cache is None:
+            return self._analyze(
+                symbol, articles, insider_sentiments, analyst_sentiment
+            )
+
+        key = self.cache_key(symbol, articles, insider_sentiments, analyst_sentiment)
+
+        def fetch():
+            analysis = self._analyze(
+                symbol, articles, insider_sentiments, analyst_sentiment
+            )
+            return self.is_cacheable(analysis), analysis
+
+        if bypass_cache:
+            cacheable, analysis = fetch()
+            if cacheable:
+                self.cache.put("analysis", key, analysis)
+            return analysis
+
+        _, analysis = self.cache.get_or_fetch(
+            "analysis", key, fetch, ttl=self.cache_ttl, stale_ttl=0
+        )
+        return analysis
+
+    async def analyze_async(
+        self,
+        symbol,
+        articles: list,
+        insider_sentiments: list,
+        analyst_sentiment: list,
+        bypass_cache=False,
+        timeout=None,
     ):
-        """Use AI engine to analyze the collected data and provide trading signal"""
+        """
+        Coroutine version of analyze() with the same caching.
+
+        The engine may be async, like AsyncDeepSeek, or blocking, in which
+        case it runs in a worker thread so the event loop is never blocked.
+        Cancelling the awaiting task cancels an async engine's request.
+
+        :param timeout: Optional seconds after which the analysis is an ERROR
+            result.
+        """
 
         if not self.ai_engine:
             return "Error: AI engine not initialized"
 
+        if self.cache is None:
+            return await self._analyze_async(
+                symbol, articles, insider_sentiments, analyst_sentiment, timeout
+            )
+
+        key = self.cache_key(symbol, articles, insider_sentiments, analyst_sentiment)
+
+        async def fetch():
+            analysis = await self._analyze_async(
+                symbol, articles, insider_sentiments, analyst_sentiment, timeout
+            )
+            return self.is_cacheable(analysis), analysis
+
+        if bypass_cache:
+            cacheable, analysis = await fetch()
+            if cacheable:
+                self.cache.put("analysis", key, analysis)
+            return analysis
+
+        _, analysis = await self.cache.get_or_fetch_async(
+            "analysis", key, fetch, ttl=self.cache_ttl, stale_ttl=0
+        )
+        return analysis
+
+    def evidence(self, symbol, articles, insider_sentiments, analyst_sentiment):
+        """
+        Render the evidence of a symbol for the prompt.
+
+        :return: Tuple (news text, insider sentiment text, analyst text).
+        """
+        if self.compactor is not None:
+            compacted = self.compactor.compact(
+                articles, insider_sentiments, analyst_sentiment
+            )
+            logger.info(f"Compacted evidence for {symbol}: {compacted['stats']}")
+            return (
+                f"Stock Symbol: {symbol}\n\nRecent News Articles:\n"
+                + compacted["articles"],
+                compacted["insider"],
+                compacted["analyst"],
+            )
+
         # Prepare the content for analysis
         content = f"Stock Symbol: {symbol}\n\n"
         content += "Recent News Articles:\n"
@@ -64,46 +278,510 @@ class StockAnalyzer:
                 content += f"   {article['content'][:200]}...\n"
             content += f"   Source: {article['source']}\n\n"
 
-        prompt = self.prompt(
-            symbol,
+        return (
             content,
-            insider_sentiments,
-            analyst_sentiment,
+            plain(insider_sentiments),
+            plain(analyst_sentiment),
         )
 
-        try:
-            response = self.ai_engine.send(prompt, max_tokens=10000, temperature=0.3)
-            # Try to parse JSON response
-            try:
-                # Extract JSON from the response
-                json_start = response.find("{")
-                json_end = response.rfind("}") + 1
-                if json_start != -1 and json_end != -1:
-                    json_str = response[json_start:json_end]
-                    return json.loads(json_str)
-                else:
-                    # Fallback if JSON parsing fails
-                    return {
-                        "signal": "HOLD",
-                        "confidence": 5,
-                        "reasons": ["Analysis completed but format error occurred"],
-                        "risks": ["Unable to parse detailed analysis"],
-                        "summary": response[:500],
-                    }
-            except json.JSONDecodeError:
-                return {
-                    "signal": "UNKNOWN",
-                    "confidence": 0,
-                    "reasons": ["Analysis completed but JSON parsing failed"],
-                    "risks": ["Format error in AI response"],
-                    "summary": response[:500],
-                }
+    def build_prompt(self, symbol, articles, insider_sentiments, analyst_sentiment):
+        """Build the full analysis prompt for a symbol"""
+        with tracing.span("prompt.build", symbol=symbol) as span:
+            prompt = workers.run(
+                type(self)._render_prompt,
+                self,
+                symbol,
+                articles,
+                insider_sentiments,
+                analyst_sentiment,
+            )
+            span.set(bytes=len(prompt))
+        return prompt
 
-        except Exception as e:
+    async def _build_prompt_async(
+        self, symbol, articles, insider_sentiments, analyst_sentiment
+    ):
+        with tracing.span("prompt.build", symbol=symbol) as span:
+            prompt = await workers.run_async(
+                type(self)._render_prompt,
+                self,
+                symbol,
+                articles,
+                insider_sentiments,
+                analyst_sentiment,
+            )
+            span.set(bytes=len(prompt))
+        return prompt
+
+    def _render_prompt(self, symbol, articles, insider_sentiments, analyst_sentiment):
+        return self.prompt(
+            symbol,
+            *self.evidence(symbol, articles, insider_sentiments, analyst_sentiment),
+        )
+
+    def batch_prompt(self, items):
+        """
+        Build one prompt analyzing several symbols.
+
+        The instructions are sent once for the whole batch, followed by the
+        evidence of each symbol.
+
+        :param items: List of (symbol, articles, insider, analyst) tuples.
+        """
+        today_string = datetime.datetime.today().strftime("%Y-%m-%d")
+        symbols = ", ".join(item[0] for item in items)
+        sections = []
+        for symbol, articles, insider_sentiments, analyst_sentiment in items:
+            news, insider, analyst = self.evidence(
+                symbol, articles, insider_sentiments, analyst_sentiment
+            )
+            sections.append(
+                f"""
+        ===== {symbol} =====
+        NEWS ARTICLES:
+        {news}
+
+        INSIDER SENTIMENTS:
+        {insider}
+
+        ANALYST SENTIMENTS:
+        {analyst}
+        """
+            )
+
+        return f"""
+        As a financial analyst, analyze the following information about each of these stocks: {symbols}. Provide a separate trading recommendation for each one.
+        For every stock you will receive 
+        - recent news articles about the stock
+        - insider sentiment trends
+        - analyst sentiment trends 
+
+        insider sentiment trend is calculated as following:
+        {INSIDER_SENTIMENT_EXPLANATION}
+
+        Today is {today_string}
+        
+        Based on this information, provide for each stock:
+        1. A trading signal: STRONG BUY, BUY, HOLD, SELL, or STRONG SELL
+        2. A confidence level (1-10)
+        3. Key reasons for your recommendation (2-3 bullet points)
+        4. Risk factors to consider
+        
+        Please be objective and consider both positive and negative factors.
+        Analyze each stock only on its own information.
+        Format your response as a JSON array with one object per stock, with the following structure:
+        [
+            {{
+                "symbol": "TICKER",
+                "signal": "STRONG BUY/BUY/HOLD/SELL/STRONG SELL",
+                "confidence": 1-10,
+                "reasons": ["reason1", "reason2", "reason3"],
+                "risks": ["risk1", "risk2"],
+                "summary": "Brief explanation of the recommendation"
+            }}
+        ]
+        """ + "".join(
+            sections
+        )
+
+    @staticmethod
+    def parse_response(response):
+        """
+        Extract the analysis dict from the raw AI response.
+
+        Fields still missing or invalid after repairing the JSON get
+        placeholder values, and the signal UNKNOWN if it is one of them.
+        """
+        return StockAnalyzer.fill_missing(
+            response, *StockAnalyzer.validate_response(response)
+        )
+
+    @staticmethod
+    def validate_response(response):
+        """
+        Parse the JSON object of a response and validate it against the
+        analysis schema.
+
+        :return: Tuple (valid fields, names of missing or invalid fields).
+        """
+        with tracing.span("parse.response", bytes=len(response)):
+            return workers.run(structured.parse_analysis, response, size=len(response))
+
+    @staticmethod
+    async def _validate_response_async(response):
+        with tracing.span("parse.response", bytes=len(response)):
+            return await workers.run_async(
+                structured.parse_analysis, response, size=len(response)
+            )
+
+    @staticmethod
+    def fill_missing(response, analysis, missing):
+        """Complete a validated analysis with placeholders for missing fields"""
+        if len(missing) == len(structured.ANALYSIS.fields):
             return {
-                "signal": "ERROR",
+                "signal": "UNKNOWN",
                 "confidence": 0,
-                "reasons": [f"Error during analysis: {str(e)}"],
-                "risks": ["API error or connection issue"],
-                "summary": str(e),
+                "reasons": ["Analysis completed but JSON parsing failed"],
+                "risks": ["Format error in AI response"],
+                "summary": response[:500],
             }
+        placeholders = {
+            "signal": "UNKNOWN",
+            "confidence": 0,
+            "reasons": ["Analysis completed but format error occurred"],
+            "risks": ["Unable to parse detailed analysis"],
+            "summary": response[:500],
+        }
+        completed = dict(analysis, **{name: placeholders[name] for name in missing})
+        # Schema fields first, in the order of the prompt
+        ordered = {name: completed.pop(name) for name in structured.ANALYSIS.fields}
+        ordered.update(completed)
+        return ordered
+
+    def repair_prompt(self, symbol, response, missing):
+        """Prompt asking only for the missing fields of an analysis"""
+        return f"""
+        Your analysis of {symbol} below lacks valid values for: {", ".join(missing)}.
+
+        {response[:REPAIR_CONTEXT_CHARS]}
+
+        Consistently with that analysis, reply with a JSON object holding only these fields:
+        {structured.ANALYSIS.describe(missing)}
+        """
+
+    def _send_options(self):
+        # JSON output mode, where the engine supports it
+        if getattr(self.ai_engine, "supports_json_mode", False):
+            return {"json_mode": True}
+        return {}
+
+    @staticmethod
+    def _merge_repair(answer, analysis, missing):
+        fixed, _ = structured.ANALYSIS.validate(structured.loads(answer or ""))
+        for name in missing:
+            if name in fixed:
+                analysis[name] = fixed[name]
+        return [name for name in missing if name not in fixed]
+
+    def _complete(self, symbol, response, analysis, missing):
+        """
+        Ask again for the fields missing from an analysis, instead of
+        repeating the whole analysis, then fill what is still missing.
+        """
+        for _ in range(self.repair_attempts):
+            if not missing or not response.strip():
+                break
+            logger.warning(f"Asking again for {', '.join(missing)} of {symbol}")
+            with tracing.span("analyze.repair", symbol=symbol) as span:
+                try:
+                    answer = self.ai_engine.send(
+                        self.repair_prompt(symbol, response, missing),
+                        max_tokens=REPAIR_MAX_TOKENS,
+                        temperature=self.temperature,
+                        **self._send_options(),
+                    )
+                except Exception as e:
+                    span.error = type(e).__name__
+                    break
+                missing = self._merge_repair(answer, analysis, missing)
+        return self.fill_missing(response, analysis, missing)
+
+    async def _complete_async(self, symbol, response, analysis, missing, timeout):
+        for _ in range(self.repair_attempts):
+            if not missing or not response.strip():
+                break
+            logger.warning(f"Asking again for {', '.join(missing)} of {symbol}")
+            with tracing.span("analyze.repair", symbol=symbol) as span:
+                try:
+                    answer = await self._send_async(
+                        self.repair_prompt(symbol, response, missing),
+                        REPAIR_MAX_TOKENS,
+                        timeout,
+                    )
+                except Exception as e:
+                    span.error = type(e).__name__
+                    break
+                missing = self._merge_repair(answer, analysis, missing)
+        return self.fill_missing(response, analysis, missing)
+
+    async def _send_async(self, prompt, max_tokens, timeout):
+        import asyncio
+        import inspect
+
+        if inspect.iscoroutinefunction(self.ai_engine.send):
+            request = self.ai_engine.send(
+                prompt,
+                max_tokens=max_tokens,
+                temperature=self.temperature,
+                **self._send_options(),
+            )
+        else:
+            request = asyncio.to_thread(
+                self.ai_engine.send,
+                prompt,
+                max_tokens=max_tokens,
+                temperature=self.temperature,
+                **self._send_options(),
+            )
+        return await asyncio.wait_for(request, timeout)
+
+    @staticmethod
+    def error_result(e):
+        return {
+            "signal": "ERROR",
+            "confidence": 0,
+            "reasons": [f"Error during analysis: {str(e)}"],
+            "risks": ["API error or connection issue"],
+            "summary": str(e),
+        }
+
+    @staticmethod
+    def is_cacheable(analysis):
+        """Only well-formed analyses are worth reusing"""
+        return isinstance(analysis, dict) and analysis.get("signal") not in (
+            "ERROR",
+            "UNKNOWN",
+        )
+
+    def _record(self, symbol, analysis, insider_sentiments, analyst_sentiment):
+        if self.recorder is None or not self.is_cacheable(analysis):
+            return
+        try:
+            self.recorder.record(
+                symbol, analysis, insider_sentiments, analyst_sentiment
+            )
+        except Exception as e:
+            # A full disk must not cost the user the analysis
+            logger.error(f"Error recording analysis of {symbol}: {str(e)}")
+
+    def _analyze(self, symbol, articles, insider_sentiments, analyst_sentiment):
+        logger.info(f"Requesting AI analysis for {symbol}")
+        with tracing.span("analyze", symbol=symbol) as span:
+            prompt = self.build_prompt(
+                symbol, articles, insider_sentiments, analyst_sentiment
+            )
+
+            try:
+                response = self.ai_engine.send(
+                    prompt,
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    **self._send_options(),
+                )
+                analysis = self._complete(
+                    symbol, response, *self.validate_response(response)
+                )
+            except Exception as e:
+                span.error = type(e).__name__
+                return self.error_result(e)
+        self._record(symbol, analysis, insider_sentiments, analyst_sentiment)
+        return analysis
+
+    async def _analyze_async(
+        self, symbol, articles, insider_sentiments, analyst_sentiment, timeout=None
+    ):
+        import asyncio
+
+        logger.info(f"Requesting AI analysis for {symbol}")
+        with tracing.span("analyze", symbol=symbol) as span:
+            prompt = await self._build_prompt_async(
+                symbol, articles, insider_sentiments, analyst_sentiment
+            )
+
+            try:
+                response = await self._send_async(prompt, self.max_tokens, timeout)
+                analysis = await self._complete_async(
+                    symbol,
+                    response,
+                    *await self._validate_response_async(response),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                span.error = "TimeoutError"
+                return self.error_result("AI analysis timed out")
+            except Exception as e:
+                span.error = type(e).__name__
+                return self.error_result(e)
+        self._record(symbol, analysis, insider_sentiments, analyst_sentiment)
+        return analysis
+
+    @staticmethod
+    def parse_batch_response(response, symbols):
+        """
+        Extract per-symbol analyses from the JSON array of a batch response.
+
+        :return: Dict of symbol to (valid fields, names of missing or invalid
+            fields) for every entry with at least one valid field, or None
+            when the response holds no usable JSON array.
+        """
+        with tracing.span("parse.response", bytes=len(response)):
+            return workers.run(
+                StockAnalyzer._parse_batch_response,
+                response,
+                symbols,
+                size=len(response),
+            )
+
+    @staticmethod
+    def _parse_batch_response(response, symbols):
+        entries = structured.loads(response, "[")
+        if not isinstance(entries, list):
+            return None
+
+        wanted = set(symbols)
+        analyses = {}
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            symbol = str(entry.pop("symbol", "")).upper()
+            if symbol not in wanted or symbol in analyses:
+                continue
+            analysis, missing = structured.ANALYSIS.validate(entry)
+            if len(missing) < len(structured.ANALYSIS.fields):
+                analyses[symbol] = analysis, missing
+        return analyses or None
+
+    def _analyze_group(self, items):
+        if len(items) == 1:
+            return {items[0][0]: self._analyze(*items[0])}
+
+        symbols = [item[0] for item in items]
+        logger.info(f"Requesting batched AI analysis for {', '.join(symbols)}")
+        try:
+            prompt = workers.run(type(self).batch_prompt, self, items)
+            response = self.ai_engine.send(
+                prompt,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+            )
+        except Exception as e:
+            return {symbol: self.error_result(e) for symbol in symbols}
+
+        parsed = self.parse_batch_response(response, symbols)
+        if parsed is None:
+            # Split the batch, smaller responses are less likely to break
+            logger.warning(
+                f"Malformed batched response for {', '.join(symbols)}, splitting"
+            )
+            middle = len(items) // 2
+            analyses = self._analyze_group(items[:middle])
+            analyses.update(self._analyze_group(items[middle:]))
+            return analyses
+
+        analyses = {}
+        for symbol, (analysis, missing) in parsed.items():
+            analyses[symbol] = self._complete(
+                symbol, json.dumps(analysis), analysis, missing
+            )
+        for item in items:
+            if item[0] in analyses:
+                self._record(item[0], analyses[item[0]], *item[2:])
+            else:
+                logger.warning(f"Batched response missed {item[0]}, retrying alone")
+                analyses[item[0]] = self._analyze(*item)
+        return analyses
+
+    def analyze_batch(self, items, bypass_cache=False):
+        """
+        Analyze several symbols with a single AI request.
+
+        The shared instructions are sent once for the whole batch. If the
+        response is malformed the batch is split in halves and retried, and
+        symbols missing from an otherwise valid response are retried alone.
+        Cached analyses are served without being sent.
+
+        :param items: List of (symbol, articles, insider, analyst) tuples.
+        :param bypass_cache: Ignore cached analyses.
+        :return: Dict of symbol to analysis, in the order of `items`.
+        """
+        if not self.ai_engine:
+            return {item[0]: "Error: AI engine not initialized" for item in items}
+
+        analyses = {}
+        keys = {}
+        pending = []
+        for item in items:
+            symbol = item[0]
+            if self.cache is not None:
+                keys[symbol] = self.cache_key(*item)
+                if not bypass_cache:
+                    cached = self.cache.lookup(
+                        "analysis", keys[symbol], ttl=self.cache_ttl
+                    )
+                    if cached is not None:
+                        analyses[symbol] = cached
+                        continue
+            pending.append(item)
+
+        if pending:
+            fresh = self._analyze_group(pending)
+            for symbol, analysis in fresh.items():
+                if symbol in keys and self.is_cacheable(analysis):
+                    self.cache.put("analysis", keys[symbol], analysis)
+            analyses.update(fresh)
+
+        return {item[0]: analyses[item[0]] for item in items}
+
+    def analyze_stream(
+        self,
+        symbol,
+        articles: list,
+        insider_sentiments: list,
+        analyst_sentiment: list,
+        bypass_cache=False,
+    ):
+        """
+        Stream the analysis, yielding (field, value) pairs as fields complete.
+
+        With a streaming AI engine, "signal" and "confidence" are yielded as
+        soon as the model has written them, before the rest of the response.
+        The last pair is always ("analysis", full_analysis_dict), which may
+        correct earlier values if the response turned out to be malformed.
+        """
+        if not self.ai_engine:
+            yield "analysis", "Error: AI engine not initialized"
+            return
+
+        key = None
+        if self.cache is not None:
+            key = self.cache_key(
+                symbol, articles, insider_sentiments, analyst_sentiment
+            )
+            if not bypass_cache:
+                cached = self.cache.lookup("analysis", key, ttl=self.cache_ttl)
+                if cached is not None:
+                    yield from cached.items()
+                    yield "analysis", cached
+                    return
+
+        if not hasattr(self.ai_engine, "stream"):
+            analysis = self._analyze(
+                symbol, articles, insider_sentiments, analyst_sentiment
+            )
+        else:
+            logger.info(f"Streaming AI analysis for {symbol}")
+            prompt = self.build_prompt(
+                symbol, articles, insider_sentiments, analyst_sentiment
+            )
+            parser = JSONFieldStream()
+            chunks = []
+            try:
+                for chunk in self.ai_engine.stream(
+                    prompt,
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    **self._send_options(),
+                ):
+                    chunks.append(chunk)
+                    yield from parser.feed(chunk)
+                response = "".join(chunks)
+                analysis = self._complete(
+                    symbol, response, *self.validate_response(response)
+                )
+            except Exception as e:
+                analysis = self.error_result(e)
+            self._record(symbol, analysis, insider_sentiments, analyst_sentiment)
+
+        if key is not None and self.is_cacheable(analysis):
+            self.cache.put("analysis", key, analysis)
+        yield "analysis", analysis
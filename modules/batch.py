@@ -0,0 +1,346 @@
+"""Analyze a whole watchlist with bounded parallelism per provider"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import modules.logger as logger
+import modules.scheduler as scheduler
+import modules.tracing as tracing
+
+DEFAULT_LIMITS = {
+    "newsapi": 4,
+    "finviz": 4,
+    "finnhub": 2,
+    "deepseek": 8,
+}
+
+
+def provider_limits(**limits):
+    """
+    Build the per-provider semaphores shared by the Gatherer and BatchRunner.
+
+    :param limits: Maximum concurrent calls keyed by provider name, merged
+        over DEFAULT_LIMITS.
+    :return: Dict of provider name to BoundedSemaphore.
+    """
+    merged = dict(DEFAULT_LIMITS)
+    merged.update({name: value for name, value in limits.items() if value})
+    return {name: threading.BoundedSemaphore(value) for name, value in merged.items()}
+
+
+def read_watchlist(path):
+    """
+    Read symbols from a watchlist file.
+
+    Symbols may be separated by newlines, commas or whitespace. Lines starting
+    with '#' are ignored and duplicates are dropped, keeping the first one.
+    """
+    symbols = []
+    seen = set()
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            for symbol in line.replace(",", " ").split():
+                symbol = symbol.strip().upper()
+                if symbol and symbol not in seen:
+                    seen.add(symbol)
+                    symbols.append(symbol)
+    return symbols
+
+
+class Checkpoint:
+    """
+    Append-only JSON lines file of completed symbols.
+
+    Each finished symbol is written and flushed as soon as it completes, so a
+    sweep that crashes can be resumed by skipping what is already recorded.
+    Symbols whose analysis ended in ERROR are retried on resume.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def completed(self):
+        """Return the set of symbols that finished without an analysis error"""
+        done = set()
+        if not self.path or not os.path.exists(self.path):
+            return done
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash, redo that symbol
+                    continue
+                analysis = record.get("analysis")
+                if isinstance(analysis, dict) and analysis.get("signal") != "ERROR":
+                    done.add(record["symbol"])
+        return done
+
+    def write(self, record):
+        if not self.path:
+            return
+        line = json.dumps(record, default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class BatchRunner:
+    """
+    Run gather and LLM analysis over many symbols at once.
+
+    Symbols are processed by a pool of workers. Every upstream call goes
+    through the semaphore of its provider, so e.g. Finnhub and DeepSeek can be
+    given different concurrency limits regardless of the number of workers.
+    Calls are scheduled at batch priority, so a sweep yields to interactive
+    requests made in the same process.
+    """
+
+    def __init__(
+        self,
+        gatherer,
+        analyzer,
+        limits=None,
+        workers=8,
+        checkpoint=None,
+        refresh=False,
+        group_size=1,
+        priority=scheduler.BATCH,
+        triage=None,
+    ):
+        """
+        :param gatherer: Gatherer used to fetch the sources of each symbol.
+        :param analyzer: StockAnalyzer used for the LLM analysis.
+        :param limits: Semaphores keyed by provider name, see provider_limits.
+        :param workers: Number of symbols processed at the same time.
+        :param checkpoint: Optional path of the JSON lines checkpoint file.
+        :param refresh: Bypass the analyzer cache and always call the LLM.
+        :param group_size: Number of symbols packed into one AI request.
+        :param priority: Scheduler priority of the upstream calls, below
+            interactive requests by default.
+        :param triage: Optional Triage; the whole watchlist is then gathered
+            and scored locally first, and only the symbols it selects are
+            sent to the LLM.
+        """
+        self.gatherer = gatherer
+        self.analyzer = analyzer
+        self.limits = limits if limits is not None else provider_limits()
+        self.workers = workers
+        self.checkpoint = Checkpoint(checkpoint)
+        self.refresh = refresh
+        self.group_size = group_size
+        self.priority = priority
+        self.triage = triage
+
+    def analyze_symbol(self, symbol, days, refresh=None):
+        """
+        Gather and analyze one symbol, returning a JSON-serializable record.
+
+        :param refresh: Override the runner's refresh setting for this symbol.
+        """
+        start = time.perf_counter()
+        with tracing.span("pipeline", symbol=symbol, days=days):
+            gathered = self.gatherer.gather(symbol, days)
+
+            llm_start = time.perf_counter()
+            with self.limits.get("deepseek") or contextlib.nullcontext():
+                analysis = self.analyzer.analyze(
+                    symbol,
+                    gathered.articles,
+                    gathered.insider_sentiments,
+                    gathered.analyst_sentiments,
+                    bypass_cache=self.refresh if refresh is None else refresh,
+                )
+        return self._record(gathered, analysis, time.perf_counter() - llm_start, start)
+
+    def _gather(self, symbol, days):
+        start = time.perf_counter()
+        return self.gatherer.gather(symbol, days), start
+
+    def analyze_group(self, group):
+        """
+        Analyze already gathered symbols with one batched AI request.
+
+        :param group: List of (GatherResult, start time) tuples.
+        :return: List of records, one per symbol.
+        """
+        llm_start = time.perf_counter()
+        with tracing.span("analyze.group", symbols=len(group)), (
+            self.limits.get("deepseek") or contextlib.nullcontext()
+        ):
+            analyses = self.analyzer.analyze_batch(
+                [
+                    (
+                        gathered.symbol,
+                        gathered.articles,
+                        gathered.insider_sentiments,
+                        gathered.analyst_sentiments,
+                    )
+                    for gathered, _ in group
+                ],
+                bypass_cache=self.refresh,
+            )
+        llm_elapsed = time.perf_counter() - llm_start
+        return [
+            self._record(gathered, analyses[gathered.symbol], llm_elapsed, start)
+            for gathered, start in group
+        ]
+
+    def _triage(self, gathered_group):
+        """
+        Score gathered symbols and split them by the triage's selection.
+
+        :param gathered_group: List of (GatherResult, start time) tuples.
+        :return: Tuple (selected (GatherResult, start) tuples, records of the
+            others with their local analysis, triage entry by symbol).
+        """
+        with tracing.span("triage", symbols=len(gathered_group)):
+            scored = self.triage.score([gathered for gathered, _ in gathered_group])
+        entries = {entry["symbol"]: entry for entry in scored}
+        selected = []
+        records = []
+        for gathered, start in gathered_group:
+            entry = entries[gathered.symbol]
+            if entry["selected"]:
+                selected.append((gathered, start))
+                continue
+            analysis = self.triage.local_analysis(entry, len(scored))
+            records.append(self._record(gathered, analysis, 0.0, start))
+        logger.info(
+            f"Triage sends {len(selected)} of {len(gathered_group)} symbols to the AI"
+        )
+        return selected, records, entries
+
+    @staticmethod
+    def _record(gathered, analysis, llm_elapsed, start):
+        timings = dict(gathered.timings)
+        timings["deepseek"] = llm_elapsed
+        return {
+            "symbol": gathered.symbol,
+            "days": gathered.days,
+            "analysis": analysis,
+            "errors": gathered.errors,
+            "timings": timings,
+            "elapsed": time.perf_counter() - start,
+        }
+
+    @staticmethod
+    def _error_record(symbol, days, e):
+        return {
+            "symbol": symbol,
+            "days": days,
+            "analysis": {
+                "signal": "ERROR",
+                "confidence": 0,
+                "reasons": [f"Error during batch analysis: {str(e)}"],
+                "risks": [],
+                "summary": str(e),
+            },
+            "errors": {},
+            "timings": {},
+            "elapsed": 0.0,
+        }
+
+    def run(self, symbols, days, resume=True):
+        """
+        Analyze every symbol, yielding each record as soon as it completes.
+
+        With group_size > 1, gathered symbols are queued and analyzed
+        group_size at a time with one batched AI request per group.
+
+        With a triage, every symbol is gathered before any is analyzed; the
+        ones it does not select are yielded with their local analysis, and
+        every record gets a "triage" entry with its scores and rank.
+
+        :param symbols: Iterable of stock symbols.
+        :param days: News window in days.
+        :param resume: Skip symbols already completed in the checkpoint.
+        :return: Generator of records in completion order.
+        """
+        symbols = list(symbols)
+        if resume:
+            done = self.checkpoint.completed()
+            if done:
+                logger.info(f"Resuming batch, skipping {len(done)} completed symbols")
+            symbols = [symbol for symbol in symbols if symbol not in done]
+
+        logger.info(f"Starting batch of {len(symbols)} symbols")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="batch"
+        ) as executor:
+
+            def submit(function, *args):
+                return executor.submit(scheduler.run_at, self.priority, function, *args)
+
+            # Future -> (kind, symbols it covers)
+            futures = {}
+            for symbol in symbols:
+                if self.group_size > 1 or self.triage is not None:
+                    future = submit(self._gather, symbol, days)
+                    futures[future] = ("gather", [symbol])
+                else:
+                    future = submit(self.analyze_symbol, symbol, days)
+                    futures[future] = ("symbol", [symbol])
+
+            group = []
+            triaged = {}
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    kind, covered = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(
+                            f"Batch analysis of {', '.join(covered)} failed: {str(e)}"
+                        )
+                        result = [
+                            self._error_record(symbol, days, e) for symbol in covered
+                        ]
+                        kind = "group"
+
+                    records = [result] if kind == "symbol" else result
+                    if kind == "gather":
+                        group.append(result)
+                        records = []
+                    gathering = any(k == "gather" for k, _ in futures.values())
+                    if group and self.triage is None:
+                        if len(group) >= self.group_size or not gathering:
+                            future = submit(self.analyze_group, group)
+                            futures[future] = (
+                                "group",
+                                [gathered.symbol for gathered, _ in group],
+                            )
+                            group = []
+                    elif group and not gathering:
+                        # The whole watchlist is gathered, rank it
+                        selected, local, triaged = self._triage(group)
+                        for i in range(0, len(selected), self.group_size):
+                            chunk = selected[i : i + self.group_size]
+                            future = submit(self.analyze_group, chunk)
+                            futures[future] = (
+                                "group",
+                                [gathered.symbol for gathered, _ in chunk],
+                            )
+                        records.extend(local)
+                        group = []
+
+                    for record in records:
+                        if record["symbol"] in triaged:
+                            record["triage"] = triaged[record["symbol"]]
+                        self.checkpoint.write(record)
+                        yield record
+
+        logger.info(
+            f"Finished batch of {len(symbols)} symbols in "
+            f"{time.perf_counter() - start:.2f}s"
+        )
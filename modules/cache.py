@@ -0,0 +1,338 @@
+"""Persistent response cache for the upstream data sources"""
+
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import modules.logger as logger
+
+# Seconds a response stays fresh, per endpoint
+DEFAULT_TTLS = {
+    "newsapi": 15 * 60,
+    "finviz": 15 * 60,
+    "yahoo": 15 * 60,
+    # Monthly MSPR data and monthly analyst trends change rarely
+    "insider_sentiment": 12 * 60 * 60,
+    "insider_transactions": 6 * 60 * 60,
+    "recommendation_trends": 24 * 60 * 60,
+}
+
+# Pending access times written in one transaction at most
+MAX_PENDING_ACCESSES = 256
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of successful `(success, payload)` responses.
+
+    An entry is fresh for the TTL of its endpoint. After that it may still be
+    served for another `stale_ttl` seconds while a background refresh fetches
+    the new value (stale-while-revalidate). Older entries are fetched
+    synchronously. The least recently used entries are evicted once the cache
+    grows past `max_entries` or `max_bytes`.
+
+    Lookups do not write: the entry count and size are kept in memory, and
+    access times, only updated once they are `access_resolution` seconds
+    old, are written in batches with the next store.
+    """
+
+    def __init__(
+        self,
+        path="cache/responses.sqlite",
+        ttls=None,
+        default_ttl=15 * 60,
+        stale_ttls=None,
+        max_entries=20000,
+        max_bytes=256 * 1024 * 1024,
+        access_resolution=60,
+    ):
+        """
+        :param path: SQLite database file, or ":memory:".
+        :param ttls: Fresh lifetime in seconds per endpoint, merged over
+            DEFAULT_TTLS.
+        :param default_ttl: Fresh lifetime of endpoints without a TTL.
+        :param stale_ttls: Extra seconds per endpoint during which a stale
+            entry is served while it is refreshed. Defaults to the endpoint TTL.
+        :param max_entries: Maximum number of entries before LRU eviction.
+        :param max_bytes: Maximum total payload size before LRU eviction.
+        :param access_resolution: Seconds within which repeated hits of an
+            entry do not update its access time.
+        """
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.default_ttl = default_ttl
+        self.stale_ttls = stale_ttls or {}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.access_resolution = access_resolution
+
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+            self._conn.commit()
+            self._entries, self._bytes = self._totals()
+        self._accessed = {}
+
+        self._stats = {}
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        self._refresher = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="cache-refresh"
+        )
+
+    def ttl(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def stale_ttl(self, endpoint):
+        return self.stale_ttls.get(endpoint, self.ttl(endpoint))
+
+    @staticmethod
+    def make_key(endpoint, args):
+        return endpoint + ":" + json.dumps(args, sort_keys=True, default=str)
+
+    def _totals(self):
+        # Caller must hold self._lock
+        return self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    def _flush_accesses(self):
+        # Caller must hold self._lock and commit
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(at, key) for key, at in self._accessed.items()],
+            )
+            self._accessed = {}
+
+    def _bump(self, endpoint, counter, n=1):
+        # Caller must hold self._lock
+        stats = self._stats.setdefault(
+            endpoint, {"hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0}
+        )
+        stats[counter] += n
+
+    def _count(self, endpoint, counter):
+        with self._lock:
+            self._bump(endpoint, counter)
+
+    def stats(self):
+        """Return hit/miss counters per endpoint"""
+        with self._lock:
+            return {endpoint: dict(stats) for endpoint, stats in self._stats.items()}
+
+    def get(self, endpoint, args):
+        """
+        Look up a cached payload.
+
+        :return: Tuple (payload, age in seconds), or (None, None) on a miss.
+        """
+        key = self.make_key(endpoint, args)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, stored_at, accessed_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None, None
+            if now - row[2] >= self.access_resolution:
+                self._accessed[key] = now
+                if len(self._accessed) >= MAX_PENDING_ACCESSES:
+                    self._flush_accesses()
+                    self._conn.commit()
+        return json.loads(row[0]), now - row[1]
+
+    def lookup(self, endpoint, args, ttl=None):
+        """
+        Return a fresh cached payload, or None, counting the hit or miss.
+
+        Unlike get_or_fetch, a stale entry is reported as a miss and nothing
+        is refreshed.
+        """
+        payload, age = self.get(endpoint, args)
+        if age is not None and age < (self.ttl(endpoint) if ttl is None else ttl):
+            self._count(endpoint, "hits")
+            return payload
+        self._count(endpoint, "misses")
+        return None
+
+    def put(self, endpoint, args, payload):
+        key = self.make_key(endpoint, args)
+        value = json.dumps(payload, default=str)
+        now = time.time()
+        with self._lock:
+            self._accessed.pop(key, None)
+            self._flush_accesses()
+            old = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, endpoint, payload, size, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, value, len(value), now, now),
+            )
+            self._conn.commit()
+            if old is None:
+                self._entries += 1
+            self._bytes += len(value) - (old[0] if old else 0)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+                return
+            # Other processes may share the file, count again before evicting
+            count, size = self._totals()
+            if count <= self.max_entries and size <= self.max_bytes:
+                self._entries, self._bytes = count, size
+                return
+            evicted = {}
+            rows = self._conn.execute(
+                "SELECT key, endpoint, size FROM responses ORDER BY accessed_at"
+            )
+            victims = []
+            for key, endpoint, entry_size in rows:
+                if count <= self.max_entries and size <= self.max_bytes:
+                    break
+                victims.append((key,))
+                evicted[endpoint] = evicted.get(endpoint, 0) + 1
+                count -= 1
+                size -= entry_size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            self._conn.commit()
+            self._entries, self._bytes = count, size
+            for endpoint, n in evicted.items():
+                self._bump(endpoint, "evictions", n)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._accessed = {}
+            self._entries, self._bytes = 0, 0
+
+    def _refresh(self, endpoint, args, fetch):
+        key = self.make_key(endpoint, args)
+        try:
+            success, payload = fetch()
+            if success:
+                self.put(endpoint, args, payload)
+        except Exception as e:
+            logger.warning(f"Background refresh of {key} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _check(self, endpoint, args, ttl, stale_ttl):
+        """
+        Look up an entry and count the outcome.
+
+        :return: Tuple (payload, state) with state "fresh", "stale" (claimed
+            for a refresh by this caller when "refresh") or "miss".
+        """
+        payload, age = self.get(endpoint, args)
+        if age is not None:
+            ttl = self.ttl(endpoint) if ttl is None else ttl
+            if stale_ttl is None:
+                stale_ttl = self.stale_ttl(endpoint)
+            if age < ttl:
+                self._count(endpoint, "hits")
+                return payload, "fresh"
+            if age < ttl + stale_ttl:
+                self._count(endpoint, "stale_hits")
+                key = self.make_key(endpoint, args)
+                with self._lock:
+                    start_refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                return payload, "refresh" if start_refresh else "stale"
+
+        self._count(endpoint, "misses")
+        return None, "miss"
+
+    def get_or_fetch(self, endpoint, args, fetch, ttl=None, stale_ttl=None):
+        """
+        Return a cached response or call `fetch` and cache its result.
+
+        Only successful responses are stored, so errors are retried on the
+        next call.
+
+        :param endpoint: Endpoint name, selects the TTL.
+        :param args: JSON-serializable arguments identifying the request.
+        :param fetch: Callable returning `(success, payload)`.
+        :param ttl: Optional fresh lifetime overriding the endpoint TTL.
+        :param stale_ttl: Optional stale window overriding the endpoint one.
+        :return: Tuple (success, payload).
+        """
+        payload, state = self._check(endpoint, args, ttl, stale_ttl)
+        if state == "refresh":
+            self._refresher.submit(self._refresh, endpoint, args, fetch)
+        if state != "miss":
+            return True, payload
+
+        success, payload = fetch()
+        if success:
+            self.put(endpoint, args, payload)
+        return success, payload
+
+    async def _refresh_async(self, endpoint, args, fetch):
+        import asyncio
+
+        key = self.make_key(endpoint, args)
+        try:
+            success, payload = await fetch()
+            if success:
+                self.put(endpoint, args, payload)
+        except Exception as e:
+            logger.warning(f"Background refresh of {key} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+                self._refresh_tasks.discard(asyncio.current_task())
+
+    async def get_or_fetch_async(self, endpoint, args, fetch, ttl=None, stale_ttl=None):
+        """
+        Coroutine version of get_or_fetch() for async fetchers.
+
+        :param fetch: Coroutine function returning `(success, payload)`.
+            Stale entries are refreshed in a task on the running loop.
+        :return: Tuple (success, payload).
+        """
+        import asyncio
+
+        payload, state = self._check(endpoint, args, ttl, stale_ttl)
+        if state == "refresh":
+            # Keep a reference, the loop only holds weak ones to tasks
+            task = asyncio.ensure_future(self._refresh_async(endpoint, args, fetch))
+            with self._lock:
+                self._refresh_tasks.add(task)
+        if state != "miss":
+            return True, payload
+
+        success, payload = await fetch()
+        if success:
+            self.put(endpoint, args, payload)
+        return success, payload
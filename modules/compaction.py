@@ -0,0 +1,301 @@
+"""Compact the evidence sent to the AI engine under a token budget"""
+
+import re
+from collections.abc import Mapping
+
+_WORD = re.compile(r"[a-z0-9$%.]+")
+# Trailing " - Reuters" / " | Bloomberg" attributions added by aggregators
+_ATTRIBUTION = re.compile(r"\s+[-|–—]\s+[^-|–—]{1,40}$")
+
+# Relative value of an article by source; NewsAPI items carry a description
+SOURCE_WEIGHTS = {
+    "NewsAPI": 1.0,
+    "Finviz": 0.8,
+    "Yahoo Finance": 0.7,
+}
+
+_encoding = None
+
+
+def count_tokens(text):
+    """
+    Count the tokens of a text.
+
+    Uses tiktoken's cl100k_base encoding when installed, which is close to the
+    DeepSeek tokenizer for English text. Otherwise falls back to an estimate of
+    four characters per token.
+    """
+    global _encoding
+
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def shingles(text, size=2):
+    """Word shingles of a headline, ignoring case, punctuation and attribution"""
+    text = _ATTRIBUTION.sub("", text.strip()).lower()
+    words = _WORD.findall(text)
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def dedupe_articles(articles, threshold=0.6):
+    """
+    Drop duplicate and near-duplicate articles across sources.
+
+    Two articles are duplicates when the Jaccard similarity of their headline
+    shingles reaches `threshold`. Of each group the article with the highest
+    source weight is kept, at the position of the first one seen.
+
+    :param articles: List of article dicts.
+    :param threshold: Similarity from 0 to 1 above which headlines match.
+    :return: New list of unique articles.
+    """
+    kept = []
+    kept_shingles = []
+    for article in articles:
+        current = shingles(article["title"])
+        for i, other in enumerate(kept_shingles):
+            union = len(current | other)
+            if union and len(current & other) / union >= threshold:
+                weight = SOURCE_WEIGHTS.get(article["source"], 0.5)
+                if weight > SOURCE_WEIGHTS.get(kept[i]["source"], 0.5):
+                    kept[i] = article
+                break
+        else:
+            kept.append(article)
+            kept_shingles.append(current)
+    return kept
+
+
+def records(payload):
+    """Return the list of records of a Finnhub payload"""
+    if isinstance(payload, dict):
+        payload = payload.get("data", [])
+    return [record for record in payload or [] if isinstance(record, Mapping)]
+
+
+def encode_table(rows, columns=None, sort_key=None):
+    """
+    Encode a list of dicts as a compact pipe-separated table.
+
+    Columns with the same value in every row (e.g. the symbol) are moved to a
+    single header line instead of being repeated on each row.
+
+    :param rows: List of dicts.
+    :param columns: Optional column order, defaults to first-seen order.
+    :param sort_key: Optional key to sort rows by.
+    :return: Table text, or "none" when there are no rows.
+    """
+    if not rows:
+        return "none"
+    if sort_key is not None:
+        rows = sorted(rows, key=sort_key)
+    if columns is None:
+        columns = []
+        for row in rows:
+            columns.extend(key for key in row if key not in columns)
+
+    def cell(value):
+        if isinstance(value, float):
+            return f"{value:.4g}"
+        return "" if value is None else str(value)
+
+    constants = {}
+    if len(rows) > 1:
+        for column in columns:
+            values = {cell(row.get(column)) for row in rows}
+            if len(values) == 1:
+                constants[column] = values.pop()
+    varying = [column for column in columns if column not in constants]
+
+    lines = []
+    if constants:
+        lines.append(
+            "all rows: "
+            + ", ".join(f"{key}={value}" for key, value in constants.items())
+        )
+    lines.append("|".join(varying))
+    lines.extend("|".join(cell(row.get(column)) for column in varying) for row in rows)
+    return "\n".join(lines)
+
+
+class PromptCompactor:
+    """
+    Deduplicate, encode and trim the evidence of an analysis to a token budget.
+
+    The budget covers the articles and both sentiment tables. When the
+    evidence does not fit, the lowest-value items go first: article snippets,
+    then whole articles, then the oldest sentiment rows.
+    """
+
+    def __init__(self, token_budget=6000, dedupe_threshold=0.6, content_chars=200):
+        """
+        :param token_budget: Maximum tokens of the compacted evidence.
+        :param dedupe_threshold: Headline similarity for near-duplicates.
+        :param content_chars: Maximum characters of each article snippet.
+        """
+        self.token_budget = token_budget
+        self.dedupe_threshold = dedupe_threshold
+        self.content_chars = content_chars
+
+    def config(self):
+        """Settings that change the compacted output, for cache keys"""
+        return {
+            "token_budget": self.token_budget,
+            "dedupe_threshold": self.dedupe_threshold,
+            "content_chars": self.content_chars,
+        }
+
+    @staticmethod
+    def article_value(article, position, total):
+        """Score an article; NewsAPI results come sorted by relevancy"""
+        weight = SOURCE_WEIGHTS.get(article["source"], 0.5)
+        rank = 1.0 - position / max(total, 1)
+        has_content = article.get("content") and article["content"] != article["title"]
+        return weight + rank + (0.5 if has_content else 0.0)
+
+    def _article_line(self, index, article, with_content):
+        line = f"{index}. [{article['source']}] {article['title']}"
+        if (
+            with_content
+            and article.get("content")
+            and article["content"] != article["title"]
+        ):
+            line += f"\n   {article['content'][: self.content_chars]}"
+        return line
+
+    def encode_articles(self, articles, with_content):
+        if not articles:
+            return "none"
+        return "\n".join(
+            self._article_line(i, article, article_id in with_content)
+            for i, (article_id, article) in enumerate(articles, 1)
+        )
+
+    @staticmethod
+    def _period(row):
+        return str(
+            row.get("period") or f"{row.get('year', 0)}-{row.get('month', 0):0>2}"
+        )
+
+    def compact(self, articles, insider_sentiments, analyst_sentiments):
+        """
+        Compact the evidence of one symbol.
+
+        :return: Dict with the "articles", "insider" and "analyst" texts and
+            a "stats" dict with item counts and the token total.
+        """
+        unique = dedupe_articles(articles, self.dedupe_threshold)
+        ranked = sorted(
+            range(len(unique)),
+            key=lambda i: self.article_value(unique[i], i, len(unique)),
+        )
+        # Items are dropped from the front of these lists, lowest value first
+        snippet_drops = list(ranked)
+        article_drops = list(ranked)
+
+        kept = set(range(len(unique)))
+        with_content = set(range(len(unique)))
+        tables = {
+            "insider": sorted(records(insider_sentiments), key=self._period),
+            "analyst": sorted(records(analyst_sentiments), key=self._period),
+        }
+
+        def encode():
+            texts = {
+                "articles": self.encode_articles(
+                    [(i, unique[i]) for i in sorted(kept)], with_content
+                ),
+                "insider": encode_table(tables["insider"]),
+                "analyst": encode_table(tables["analyst"]),
+            }
+            return texts, sum(count_tokens(text) for text in texts.values())
+
+        texts, tokens = encode()
+        costs = None
+        while tokens > self.token_budget:
+            # Count the tokens of each item once, drop items until their
+            # counts cover the excess, then re-encode. The sum of the counts
+            # is a little off (renumbered articles, columns becoming constant,
+            # tokens merging across lines), which the next pass corrects.
+            if costs is None:
+                costs = self._costs(unique, tables)
+            excess = tokens - self.token_budget
+            dropped = False
+            while excess > 0:
+                saved = self._drop(
+                    snippet_drops, article_drops, kept, with_content, tables, costs
+                )
+                if saved is None:
+                    break
+                dropped = True
+                excess -= saved
+            if not dropped:
+                break
+            texts, tokens = encode()
+
+        texts["stats"] = {
+            "articles": len(articles),
+            "unique_articles": len(unique),
+            "kept_articles": len(kept),
+            "insider_rows": len(tables["insider"]),
+            "analyst_rows": len(tables["analyst"]),
+            "tokens": tokens,
+        }
+        return texts
+
+    def _costs(self, unique, tables):
+        """
+        Tokens of each item, with its newline: the line of each article
+        without its snippet, each snippet, and each row of both tables.
+        """
+        lines = [
+            count_tokens(self._article_line(i, article, False)) + 1
+            for i, article in enumerate(unique, 1)
+        ]
+        snippets = [
+            count_tokens(self._article_line(i, article, True)) + 1 - lines[i - 1]
+            for i, article in enumerate(unique, 1)
+        ]
+        costs = {"lines": lines, "snippets": snippets}
+        for name, rows in tables.items():
+            table = encode_table(rows).split("\n") if rows else []
+            # Oldest row first, like the rows
+            costs[name] = [count_tokens(line) + 1 for line in table[-len(rows) :]]
+        return costs
+
+    @staticmethod
+    def _drop(snippet_drops, article_drops, kept, with_content, tables, costs):
+        """
+        Drop the lowest-value item: a snippet, then a whole article, then
+        the oldest month of the longer table.
+
+        :return: Estimated tokens saved, or None when nothing is left.
+        """
+        if snippet_drops:
+            i = snippet_drops.pop(0)
+            with_content.discard(i)
+            return costs["snippets"][i]
+        if len(article_drops) > 1:
+            i = article_drops.pop(0)
+            kept.discard(i)
+            return costs["lines"][i]
+        if len(tables["insider"]) > 1 or len(tables["analyst"]) > 1:
+            name = (
+                "insider"
+                if len(tables["insider"]) >= len(tables["analyst"])
+                else "analyst"
+            )
+            tables[name] = tables[name][1:]
+            return costs[name].pop(0)
+        return None
@@ -1,30 +1,61 @@
-from openai import OpenAI
-import os
+import time
 from enum import Enum
 
+import modules.scheduler as scheduler
+import modules.tracing as tracing
+import modules.transport as transport
+
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+
 
 class DeepSeekModels(Enum):
     DEEPSEEK_CHAT = "deepseek-chat"
     DEEPSEEK_REASONER = "deepseek-reasoner"
 
 
+# Models accepting response_format={"type": "json_object"}
+JSON_MODE_MODELS = {DeepSeekModels.DEEPSEEK_CHAT}
+
+
+def _format_options(model, json_mode):
+    """Extra create() arguments asking for a JSON object when supported"""
+    if json_mode and model in JSON_MODE_MODELS:
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+
 class DeepSeek:
-    def __init__(self, deepseek_api_key, deepseek_model=DeepSeekModels.DEEPSEEK_CHAT):
-        """Initialize with DeepSeek API key"""
+    def __init__(
+        self,
+        deepseek_api_key,
+        deepseek_model=DeepSeekModels.DEEPSEEK_CHAT,
+        base_url=DEEPSEEK_BASE_URL,
+    ):
+        """
+        Initialize with DeepSeek API key
+
+        :param base_url: OpenAI-compatible endpoint, e.g. a local mock server.
+        """
         self.deepseek_api_key = deepseek_api_key
         self.deepseek_model = deepseek_model
+        self.base_url = base_url
+
+    @property
+    def supports_json_mode(self):
+        """True when send(json_mode=True) constrains the output to JSON"""
+        return self.deepseek_model in JSON_MODE_MODELS
+
+    def client(self):
+        """Shared, pooled OpenAI-compatible client for the DeepSeek API"""
+        return transport.openai_client(self.deepseek_api_key.value, self.base_url)
 
     def test_deepseek_api(self):
         """Test if DeepSeek API key is valid"""
         if not self.deepseek_api_key.exists():
-            return "Error: DeepSeek API key not found in .env file"
+            return False, "Error: DeepSeek API key not found in .env file"
 
         try:
-            client = OpenAI(
-                api_key=self.deepseek_api_key.value,
-                base_url="https://api.deepseek.com",
-            )
-            response = client.chat.completions.create(
+            response = self.client().chat.completions.create(
                 model="deepseek-chat",
                 messages=[{"role": "user", "content": "Test DeepSeek API"}],
                 temperature=0.3,
@@ -34,15 +65,223 @@ class DeepSeek:
         except Exception as e:
             return False, f"Error testing DeepSeek API: {str(e)}"
 
-    def send(self, prompt, temperature=0.3, max_tokens=5000):
-        client = OpenAI(
-            api_key=self.deepseek_api_key.value, base_url="https://api.deepseek.com"
-        )
-        # Use r1
-        response = client.chat.completions.create(
-            model=self.deepseek_model.value,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
-        return response.choices[0].message.content
+    def send(self, prompt, temperature=0.3, max_tokens=5000, json_mode=False):
+        """
+        Send a prompt and return the response text.
+
+        :param json_mode: Ask for a JSON object, where the model supports it.
+            The prompt must mention JSON and describe the expected object.
+        """
+        with tracing.span("llm.deepseek", model=self.deepseek_model.value) as span:
+            response = scheduler.call(
+                "deepseek",
+                lambda: self.client().chat.completions.create(
+                    model=self.deepseek_model.value,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **_format_options(self.deepseek_model, json_mode),
+                ),
+            )
+            span.set_usage(response.usage)
+            content = response.choices[0].message.content
+            span.set(bytes=len(content or ""))
+        return content
+
+    def stream(self, prompt, temperature=0.3, max_tokens=5000, json_mode=False):
+        """
+        Send a prompt and yield the response text as it is generated.
+
+        Reasoning tokens of DEEPSEEK_REASONER are not yielded, only the
+        final answer. Closing the generator closes the underlying response.
+        json_mode is the same as for send().
+        """
+        span = tracing.start_span("llm.deepseek", model=self.deepseek_model.value)
+        response = None
+        try:
+            response = scheduler.call(
+                "deepseek",
+                lambda: self.client().chat.completions.create(
+                    model=self.deepseek_model.value,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **_format_options(self.deepseek_model, json_mode),
+                    stream=True,
+                    # The last chunk then carries the token usage
+                    extra_body={"stream_options": {"include_usage": True}},
+                ),
+            )
+            size = 0
+            for chunk in response:
+                span.set_usage(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    size += len(content)
+                    span.set(bytes=size)
+                    yield content
+        except Exception as e:
+            span.end(e)
+            raise
+        finally:
+            if response is not None:
+                response.close()
+            span.end()
+
+
+class AsyncDeepSeek:
+    """
+    asyncio counterpart of DeepSeek on the AsyncOpenAI client.
+
+    send() and stream() accept an optional timeout in seconds and raise
+    asyncio.TimeoutError when it expires, like DeepSeek raises on errors.
+    Cancelling a task awaiting them closes the underlying HTTP response. Use
+    as an async context manager or call aclose() to release the connections.
+    """
+
+    def __init__(
+        self,
+        deepseek_api_key,
+        deepseek_model=DeepSeekModels.DEEPSEEK_CHAT,
+        timeout=None,
+        base_url=DEEPSEEK_BASE_URL,
+    ):
+        """
+        :param deepseek_api_key: DeepSeek API key.
+        :param deepseek_model: DeepSeekModels member.
+        :param timeout: Default timeout in seconds of a whole request.
+        :param base_url: OpenAI-compatible endpoint, e.g. a local mock server.
+        """
+        self.deepseek_api_key = deepseek_api_key
+        self.deepseek_model = deepseek_model
+        self.timeout = timeout
+        self.base_url = base_url
+        self._client = None
+
+    @property
+    def supports_json_mode(self):
+        """True when send(json_mode=True) constrains the output to JSON"""
+        return self.deepseek_model in JSON_MODE_MODELS
+
+    def client(self):
+        """The AsyncOpenAI client of this engine, created on first use"""
+        if self._client is None:
+            self._client = transport.async_openai_client(
+                self.deepseek_api_key.value, self.base_url
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def test_deepseek_api(self):
+        """Test if DeepSeek API key is valid"""
+        import asyncio
+
+        if not self.deepseek_api_key.exists():
+            return False, "Error: DeepSeek API key not found in .env file"
+
+        try:
+            response = await asyncio.wait_for(
+                self.client().chat.completions.create(
+                    model="deepseek-chat",
+                    messages=[{"role": "user", "content": "Test DeepSeek API"}],
+                    temperature=0.3,
+                    max_tokens=50,
+                ),
+                self.timeout,
+            )
+            return True, response.choices[0].message.content
+        except Exception as e:
+            return False, f"Error testing DeepSeek API: {str(e)}"
+
+    async def send(
+        self, prompt, temperature=0.3, max_tokens=5000, timeout=None, json_mode=False
+    ):
+        import asyncio
+
+        with tracing.span("llm.deepseek", model=self.deepseek_model.value) as span:
+            response = await asyncio.wait_for(
+                scheduler.call_async(
+                    "deepseek",
+                    lambda: self.client().chat.completions.create(
+                        model=self.deepseek_model.value,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **_format_options(self.deepseek_model, json_mode),
+                    ),
+                ),
+                self.timeout if timeout is None else timeout,
+            )
+            span.set_usage(response.usage)
+            content = response.choices[0].message.content
+            span.set(bytes=len(content or ""))
+        return content
+
+    async def stream(
+        self, prompt, temperature=0.3, max_tokens=5000, timeout=None, json_mode=False
+    ):
+        """
+        Send a prompt and yield the response text as it is generated.
+
+        The timeout covers the whole response. Closing the generator closes
+        the underlying response.
+        """
+        import asyncio
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        span = tracing.start_span("llm.deepseek", model=self.deepseek_model.value)
+        response = None
+        try:
+            response = await asyncio.wait_for(
+                scheduler.call_async(
+                    "deepseek",
+                    lambda: self.client().chat.completions.create(
+                        model=self.deepseek_model.value,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **_format_options(self.deepseek_model, json_mode),
+                        stream=True,
+                        extra_body={"stream_options": {"include_usage": True}},
+                    ),
+                ),
+                timeout,
+            )
+            chunks = response.__aiter__()
+            size = 0
+            while True:
+                remaining = None
+                if deadline is not None:
+                    remaining = max(0.0, deadline - time.monotonic())
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                span.set_usage(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    size += len(content)
+                    span.set(bytes=size)
+                    yield content
+        except Exception as e:
+            span.end(e)
+            raise
+        finally:
+            if response is not None:
+                await response.close()
+            span.end()
@@ -1,4 +1,9 @@
-import finnhub as finnhub
+import json
+import threading
+
+import modules.scheduler as scheduler
+import modules.tracing as tracing
+import modules.transport as transport
 
 
 class Finnhub:
@@ -6,11 +11,49 @@ class Finnhub:
     A class to interact with the Finnhub API for financial data analysis.
     """
 
-    def __init__(self, key):
+    def __init__(self, key, cache=None):
         """
         Initialize the Finnhub client with the provided API key.
+
+        :param key: Finnhub API key.
+        :param cache: Optional ResponseCache for the Finnhub responses.
         """
-        self.finnhub_client = finnhub.Client(api_key=key.value)
+        self.key = key
+        self.cache = cache
+        self._finnhub_client = None
+        self._lock = threading.Lock()
+
+    @property
+    def finnhub_client(self):
+        """The finnhub SDK client, imported and built on first use"""
+        if self._finnhub_client is None:
+            with self._lock:
+                if self._finnhub_client is None:
+                    import finnhub
+
+                    client = finnhub.Client(api_key=self.key.value)
+                    # The SDK keeps its own session holding the API token,
+                    # reuse it with the shared pool size and retry policy
+                    transport.mount(client._session)
+                    self._finnhub_client = client
+        return self._finnhub_client
+
+    def _cached(self, endpoint, args, fetch):
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch(endpoint, args, fetch)
+
+    def _request(self, endpoint, symbol, request):
+        """Make a scheduled SDK call in a span recording the rows and size"""
+        with tracing.span(f"fetch.finnhub.{endpoint}", symbol=symbol) as span:
+            data = scheduler.call("finnhub", request)
+            rows = data.get("data", []) if isinstance(data, dict) else data
+            # The SDK returns decoded JSON, measure it serialized again
+            span.set(
+                rows=len(rows or []),
+                bytes=len(json.dumps(data, separators=(",", ":")).encode("utf-8")),
+            )
+        return data
 
     def get_stock_insider_transactions(self, symbol, from_date, to_date):
         """
@@ -21,9 +64,20 @@ class Finnhub:
         :param to_date: End date for the transactions (YYYY-MM-DD).
         :return: List of insider transactions.
         """
+        return self._cached(
+            "insider_transactions",
+            [symbol, from_date, to_date],
+            lambda: self._get_stock_insider_transactions(symbol, from_date, to_date),
+        )
+
+    def _get_stock_insider_transactions(self, symbol, from_date, to_date):
         try:
-            transactions = self.finnhub_client.stock_insider_transactions(
-                symbol, from_date, to_date
+            transactions = self._request(
+                "insider_transactions",
+                symbol,
+                lambda: self.finnhub_client.stock_insider_transactions(
+                    symbol, from_date, to_date
+                ),
             )
             return True, transactions
         except Exception as e:
@@ -38,9 +92,20 @@ class Finnhub:
         :param to_date: End date for the sentiment (YYYY-MM-DD).
         :return: Insider sentiment data.
         """
+        return self._cached(
+            "insider_sentiment",
+            [symbol, from_date, to_date],
+            lambda: self._get_stock_insider_sentiment(symbol, from_date, to_date),
+        )
+
+    def _get_stock_insider_sentiment(self, symbol, from_date, to_date):
         try:
-            sentiment = self.finnhub_client.stock_insider_sentiment(
-                symbol, from_date, to_date
+            sentiment = self._request(
+                "insider_sentiment",
+                symbol,
+                lambda: self.finnhub_client.stock_insider_sentiment(
+                    symbol, from_date, to_date
+                ),
             )
             return True, sentiment
         except Exception as e:
@@ -53,8 +118,142 @@ class Finnhub:
         :param symbol: Stock symbol to fetch recommendations trends for.
         :return: Recommendations trends data.
         """
+        return self._cached(
+            "recommendation_trends",
+            [symbol],
+            lambda: self._get_stock_recommendations_trends(symbol),
+        )
+
+    def _get_stock_recommendations_trends(self, symbol):
         try:
-            trends = self.finnhub_client.recommendation_trends(symbol)
+            trends = self._request(
+                "recommendation_trends",
+                symbol,
+                lambda: self.finnhub_client.recommendation_trends(symbol),
+            )
             return True, trends
         except Exception as e:
             return False, f"Error fetching recommendations trends: {str(e)}"
+
+
+class AsyncFinnhub:
+    """
+    asyncio counterpart of Finnhub with the same (success, payload) results.
+
+    The finnhub SDK is blocking, so the REST endpoints it wraps are called
+    directly on an httpx.AsyncClient. Every method accepts an optional timeout
+    in seconds; a call that times out returns (False, message) and a
+    cancelled call raises CancelledError. Use as an async context manager or
+    call aclose() to release the connections.
+    """
+
+    API_URL = "https://finnhub.io/api/v1"
+
+    def __init__(self, key, cache=None, timeout=None):
+        """
+        :param key: Finnhub API key.
+        :param cache: Optional ResponseCache for the Finnhub responses.
+        :param timeout: Default per-call timeout in seconds, none by default.
+        """
+        self.key = key
+        self.cache = cache
+        self.timeout = timeout
+        self._client = None
+
+    def client(self):
+        """The httpx.AsyncClient of this wrapper, created on first use"""
+        if self._client is None:
+            self._client = transport.async_http_client()
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _get(self, endpoint, path, error, timeout, **params):
+        """GET a Finnhub endpoint, returning (success, decoded JSON)"""
+        import asyncio
+
+        timeout = self.timeout if timeout is None else timeout
+        params["token"] = self.key.value
+        try:
+            with tracing.span(
+                f"fetch.finnhub.{endpoint}", symbol=params.get("symbol")
+            ) as span:
+                response = await asyncio.wait_for(
+                    scheduler.call_async(
+                        "finnhub",
+                        lambda: self.client().get(
+                            f"{self.API_URL}{path}", params=params
+                        ),
+                    ),
+                    timeout,
+                )
+                span.set(status=response.status_code, bytes=len(response.content))
+            if response.status_code != 200:
+                return False, f"{error}: {response.status_code}"
+            return True, response.json()
+        except asyncio.TimeoutError:
+            return False, f"{error}: timed out after {timeout}s"
+        except Exception as e:
+            return False, f"{error}: {str(e)}"
+
+    async def _cached(self, endpoint, args, fetch):
+        if self.cache is None:
+            return await fetch()
+        return await self.cache.get_or_fetch_async(endpoint, args, fetch)
+
+    async def get_stock_insider_transactions(
+        self, symbol, from_date, to_date, timeout=None
+    ):
+        """See Finnhub.get_stock_insider_transactions"""
+        return await self._cached(
+            "insider_transactions",
+            [symbol, from_date, to_date],
+            lambda: self._get(
+                "insider_transactions",
+                "/stock/insider-transactions",
+                "Error fetching insider transactions",
+                timeout,
+                symbol=symbol,
+                **{"from": from_date, "to": to_date},
+            ),
+        )
+
+    async def get_stock_insider_sentiment(
+        self, symbol, from_date, to_date, timeout=None
+    ):
+        """See Finnhub.get_stock_insider_sentiment"""
+        return await self._cached(
+            "insider_sentiment",
+            [symbol, from_date, to_date],
+            lambda: self._get(
+                "insider_sentiment",
+                "/stock/insider-sentiment",
+                "Error fetching insider sentiment",
+                timeout,
+                symbol=symbol,
+                **{"from": from_date, "to": to_date},
+            ),
+        )
+
+    async def get_stock_recommendations_trends(self, symbol, timeout=None):
+        """See Finnhub.get_stock_recommendations_trends"""
+        return await self._cached(
+            "recommendation_trends",
+            [symbol],
+            lambda: self._get(
+                "recommendation_trends",
+                "/stock/recommendation",
+                "Error fetching recommendations trends",
+                timeout,
+                symbol=symbol,
+            ),
+        )
@@ -0,0 +1,223 @@
+"""Fetch every data source for a symbol concurrently"""
+
+import contextlib
+import contextvars
+import datetime
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import modules.logger as logger
+import modules.records as records
+import modules.tracing as tracing
+
+NEWS_API = "newsapi"
+FINVIZ = "finviz"
+INSIDER_SENTIMENT = "insider_sentiment"
+ANALYST_TRENDS = "analyst_trends"
+
+SOURCES = (NEWS_API, FINVIZ, INSIDER_SENTIMENT, ANALYST_TRENDS)
+
+# Upstream provider behind each source, used to look up concurrency limits
+PROVIDERS = {
+    NEWS_API: "newsapi",
+    FINVIZ: "finviz",
+    INSIDER_SENTIMENT: "finnhub",
+    ANALYST_TRENDS: "finnhub",
+}
+
+# Compact record form of each source's payload, see modules/records.py
+COMPACT = {
+    NEWS_API: records.articles,
+    FINVIZ: records.articles,
+    INSIDER_SENTIMENT: records.insider_sentiments,
+    ANALYST_TRENDS: records.recommendation_trends,
+}
+
+
+class SourceResult:
+    """Outcome of a single source fetch"""
+
+    def __init__(self, name, success, payload, elapsed):
+        self.name = name
+        self.success = success
+        self.payload = payload
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (
+            f"SourceResult({self.name!r}, success={self.success}, "
+            f"elapsed={self.elapsed:.3f}s)"
+        )
+
+
+def compact(result):
+    """SourceResult with its payload turned into compact records"""
+    convert = COMPACT.get(result.name)
+    if convert is None or not result.success or result.payload is None:
+        return result
+    return SourceResult(result.name, True, convert(result.payload), result.elapsed)
+
+
+class GatherResult:
+    """
+    All source results for one symbol, including partial failures.
+
+    Payloads are held as compact records, which batches keep for many
+    symbols at once.
+    """
+
+    def __init__(self, symbol, days, sources, elapsed):
+        self.symbol = sys.intern(symbol)
+        self.days = days
+        self.sources = {name: compact(result) for name, result in sources.items()}
+        self.elapsed = elapsed
+
+    def _payload(self, name):
+        result = self.sources.get(name)
+        if result is None or not result.success or result.payload is None:
+            return []
+        return result.payload
+
+    @property
+    def articles(self):
+        """News articles from every source that succeeded"""
+        return self._payload(NEWS_API) + self._payload(FINVIZ)
+
+    @property
+    def insider_sentiments(self):
+        return self._payload(INSIDER_SENTIMENT)
+
+    @property
+    def analyst_sentiments(self):
+        return self._payload(ANALYST_TRENDS)
+
+    @property
+    def errors(self):
+        """Error message of each failed source, keyed by source name"""
+        return {
+            name: result.payload
+            for name, result in self.sources.items()
+            if not result.success
+        }
+
+    @property
+    def timings(self):
+        """Elapsed seconds of each source, keyed by source name"""
+        return {name: result.elapsed for name, result in self.sources.items()}
+
+
+class Gatherer:
+    """
+    Run the NewsAPI, Finviz and Finnhub fetches for a symbol at the same time.
+
+    Each source gets its own deadline. A source that misses it is reported as
+    failed and the others are kept, so the wall-clock time of a gather is
+    bounded by the slowest source (or its deadline) instead of the sum.
+    """
+
+    def __init__(
+        self,
+        fetcher,
+        finnhub_client,
+        timeout=15,
+        timeouts=None,
+        max_articles=10,
+        max_workers=None,
+        limits=None,
+    ):
+        """
+        :param fetcher: NewsFetcher instance.
+        :param finnhub_client: Finnhub wrapper instance.
+        :param timeout: Default per-source deadline in seconds.
+        :param timeouts: Optional per-source deadlines overriding `timeout`.
+        :param max_articles: Maximum number of articles per news source.
+        :param max_workers: Size of the shared thread pool.
+        :param limits: Optional semaphores keyed by provider name (see
+            PROVIDERS) bounding concurrent calls to each provider.
+        """
+        self.fetcher = fetcher
+        self.finnhub_client = finnhub_client
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.max_articles = max_articles
+        self.limits = limits or {}
+        # Fetches that miss their deadline keep running in the background,
+        # so the pool is shared and never waited on by gather().
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or len(SOURCES) * 4,
+            thread_name_prefix="gatherer",
+        )
+
+    def _tasks(self, symbol, days):
+        now = datetime.datetime.now()
+        from_date = (now - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
+        to_date = now.strftime("%Y-%m-%d")
+        return {
+            NEWS_API: lambda: self.fetcher.fetch_news_api(
+                symbol, days, self.max_articles
+            ),
+            FINVIZ: lambda: self.fetcher.fetch_finviz_news(symbol, self.max_articles),
+            INSIDER_SENTIMENT: lambda: self.finnhub_client.get_stock_insider_sentiment(
+                symbol, from_date, to_date
+            ),
+            ANALYST_TRENDS: lambda: self.finnhub_client.get_stock_recommendations_trends(
+                symbol
+            ),
+        }
+
+    def _run(self, name, task):
+        limit = self.limits.get(PROVIDERS[name]) or contextlib.nullcontext()
+        start = time.perf_counter()
+        try:
+            with limit:
+                success, payload = task()
+        except Exception as e:
+            success, payload = False, f"Error fetching {name}: {str(e)}"
+        return SourceResult(name, success, payload, time.perf_counter() - start)
+
+    def gather(self, symbol, days, sources=SOURCES, progress=None):
+        """
+        Fetch the given sources for a symbol concurrently.
+
+        :param symbol: Stock symbol.
+        :param days: News window in days.
+        :param sources: Names of the sources to fetch.
+        :param progress: Optional callable receiving each SourceResult as it
+            is collected.
+        :return: GatherResult with one SourceResult per source.
+        """
+        with tracing.span("gather", symbol=symbol, sources=len(sources)):
+            tasks = self._tasks(symbol, days)
+            start = time.perf_counter()
+            futures = {
+                # Tasks run with the caller's context, e.g. its scheduler priority
+                name: self.executor.submit(
+                    contextvars.copy_context().run, self._run, name, tasks[name]
+                )
+                for name in sources
+            }
+
+            results = {}
+            for name, future in futures.items():
+                deadline = self.timeouts.get(name, self.timeout)
+                remaining = max(0.0, start + deadline - time.perf_counter())
+                try:
+                    results[name] = future.result(timeout=remaining)
+                except TimeoutError:
+                    future.cancel()
+                    results[name] = SourceResult(
+                        name, False, f"Timed out after {deadline}s", deadline
+                    )
+                if progress is not None:
+                    progress(results[name])
+
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"Gathered {symbol} in {elapsed:.2f}s: "
+                + ", ".join(
+                    f"{name}={'ok' if r.success else 'failed'} ({r.elapsed:.2f}s)"
+                    for name, r in results.items()
+                )
+            )
+        return GatherResult(symbol, days, results, elapsed)
@@ -0,0 +1,207 @@
+"""Fast headline extraction from Finviz and Yahoo Finance quote pages
+
+Building a full BeautifulSoup tree of a quote page to read a handful of
+anchors is the CPU hot spot of scraping. The extractors below use the fastest
+parser installed: selectolax, then lxml, then a streaming scan over the
+standard library HTMLParser that stops as soon as `max_articles` items have
+been found.
+"""
+
+import re
+from html.parser import HTMLParser
+
+_YAHOO_HEADLINE = re.compile(".*headline.*", re.I)
+
+
+BACKENDS = ("selectolax", "lxml", "stream")
+
+
+def _selectolax_parser():
+    try:
+        # selectolax >= 1.0 only ships the lexbor engine
+        from selectolax.lexbor import LexborHTMLParser
+
+        return LexborHTMLParser
+    except ImportError:
+        from selectolax.parser import HTMLParser as ModestHTMLParser
+
+        return ModestHTMLParser
+
+
+def available_backends():
+    """Return the installed backends, fastest first"""
+    backends = []
+    try:
+        _selectolax_parser()
+        backends.append("selectolax")
+    except ImportError:
+        pass
+    try:
+        import lxml.html  # noqa: F401
+
+        backends.append("lxml")
+    except ImportError:
+        pass
+    backends.append("stream")
+    return backends
+
+
+# Fastest installed backend, detected on first use to keep imports cheap
+BACKEND = None
+
+
+def default_backend():
+    global BACKEND
+
+    if BACKEND is None:
+        BACKEND = available_backends()[0]
+    return BACKEND
+
+
+def _text(html):
+    if isinstance(html, (bytes, bytearray, memoryview)):
+        return bytes(html).decode("utf-8", errors="replace")
+    return html
+
+
+def _lxml_root(html):
+    """Parse a page with lxml, or return None when it has no document"""
+    import lxml.etree
+    import lxml.html
+
+    try:
+        try:
+            return lxml.html.fromstring(html)
+        except ValueError:
+            # A str with an XML encoding declaration must be parsed as bytes
+            return lxml.html.fromstring(html.encode("utf-8"))
+    except lxml.etree.ParserError:
+        return None
+
+
+def _clean(text):
+    return " ".join(text.split())
+
+
+class _Done(Exception):
+    pass
+
+
+class _StreamExtractor(HTMLParser):
+    """Collect the text of matching elements, stopping after a limit"""
+
+    def __init__(self, tag, matches_class, limit):
+        super().__init__(convert_charrefs=True)
+        self.tag = tag
+        self.matches_class = matches_class
+        self.limit = limit
+        self.items = []
+        self._depth = 0
+        self._href = ""
+        self._parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._depth:
+            if tag == self.tag:
+                self._depth += 1
+            return
+        if tag != self.tag:
+            return
+        attrs = dict(attrs)
+        if self.matches_class(attrs.get("class") or ""):
+            self._depth = 1
+            self._href = attrs.get("href") or ""
+            self._parts = []
+
+    def handle_endtag(self, tag):
+        if self._depth and tag == self.tag:
+            self._depth -= 1
+            if not self._depth:
+                self.items.append((_clean("".join(self._parts)), self._href))
+                if len(self.items) >= self.limit:
+                    raise _Done()
+
+    def handle_data(self, data):
+        if self._depth:
+            self._parts.append(data)
+
+
+def _stream(html, tag, matches_class, limit):
+    parser = _StreamExtractor(tag, matches_class, limit)
+    try:
+        parser.feed(_text(html))
+        parser.close()
+    except _Done:
+        pass
+    return parser.items
+
+
+def extract_finviz_news(html, max_articles=10, backend=None):
+    """
+    Extract the news anchors of a Finviz quote page.
+
+    :param html: Page content as bytes or str.
+    :param max_articles: Maximum number of anchors to return.
+    :param backend: Force "selectolax", "lxml" or "stream".
+    :return: List of (title, href) tuples in page order.
+    """
+    backend = backend or default_backend()
+    if backend == "selectolax":
+        nodes = _selectolax_parser()(html).css("a.tab-link-news")[:max_articles]
+        return [
+            (_clean(node.text(deep=True)), node.attributes.get("href") or "")
+            for node in nodes
+        ]
+    if backend == "lxml":
+        root = _lxml_root(html)
+        if root is None:
+            return []
+        nodes = root.xpath(
+            "//a[contains(concat(' ', normalize-space(@class), ' '), "
+            "' tab-link-news ')]"
+        )[:max_articles]
+        return [(_clean(node.text_content()), node.get("href", "")) for node in nodes]
+    return _stream(
+        html, "a", lambda classes: "tab-link-news" in classes.split(), max_articles
+    )
+
+
+def extract_yahoo_headlines(html, max_articles=10, backend=None):
+    """
+    Extract the headline texts of a Yahoo Finance news page.
+
+    Matches h3 elements with a class containing "headline", like the
+    previous BeautifulSoup implementation.
+
+    :param html: Page content as bytes or str.
+    :param max_articles: Maximum number of headlines to return.
+    :param backend: Force "selectolax", "lxml" or "stream".
+    :return: List of headline strings in page order.
+    """
+    backend = backend or default_backend()
+    if backend == "selectolax":
+        nodes = [
+            node
+            for node in _selectolax_parser()(html).css("h3[class]")
+            if _YAHOO_HEADLINE.match(node.attributes.get("class") or "")
+        ][:max_articles]
+        return [_clean(node.text(deep=True)) for node in nodes]
+    if backend == "lxml":
+        root = _lxml_root(html)
+        if root is None:
+            return []
+        nodes = [
+            node
+            for node in root.iter("h3")
+            if _YAHOO_HEADLINE.match(node.get("class") or "")
+        ][:max_articles]
+        return [_clean(node.text_content()) for node in nodes]
+    return [
+        title
+        for title, _ in _stream(
+            html,
+            "h3",
+            lambda classes: bool(_YAHOO_HEADLINE.match(classes)),
+            max_articles,
+        )
+    ]
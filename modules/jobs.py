@@ -0,0 +1,176 @@
+"""Background analysis jobs shared between GUI sessions
+
+A JobRegistry runs each (symbol, days) analysis once in a worker thread and
+keeps the finished job for a while. Every session asking for the same symbol
+and window gets the same job, and a page that reruns while the job is running
+only reads its current state instead of starting over.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import modules.logger as logger
+import modules.tracing as tracing
+from modules.gatherer import SOURCES
+
+QUEUED = "queued"
+GATHERING = "gathering"
+ANALYZING = "analyzing"
+DONE = "done"
+
+
+class AnalysisJob:
+    """State of one analysis, updated by its worker thread"""
+
+    def __init__(self, symbol, days, fresh, sources=SOURCES):
+        self.symbol = symbol
+        self.days = days
+        self.fresh = fresh
+        self.sources = tuple(sources)
+        self.stage = QUEUED
+        self.gathered = None
+        self.collected = []
+        self.fields = {}
+        self.analysis = None
+        self.created = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.stage == DONE
+
+    def progress(self):
+        """
+        Fraction of the work done and a label of the current stage.
+
+        Fetching counts for the first half, the AI analysis for the second.
+        """
+        with self._lock:
+            if self.stage == QUEUED:
+                return 0.0, "Waiting for a worker..."
+            if self.stage == GATHERING:
+                count = len(self.collected)
+                return (
+                    0.5 * count / len(self.sources),
+                    f"📡 Fetching sources ({count}/{len(self.sources)})...",
+                )
+            if self.stage == ANALYZING:
+                return (
+                    0.5 + 0.4 * bool(self.fields),
+                    "🤖 Getting AI analysis from DeepSeek...",
+                )
+            return 1.0, "Done"
+
+    def snapshot(self):
+        """Copy of the analysis fields received so far"""
+        with self._lock:
+            return dict(self.fields)
+
+    def _update(self, **changes):
+        with self._lock:
+            for name, value in changes.items():
+                setattr(self, name, value)
+
+
+class JobRegistry:
+    """
+    Run analyses in the background and share them by (symbol, days).
+
+    A finished job with a usable analysis is reused for `ttl` seconds, a
+    failed one is retried on the next request. A "fresh" request starts a new
+    job with bypass_cache unless one for the same symbol and window is already
+    running.
+    """
+
+    def __init__(self, gatherer, analyzer, workers=4, ttl=15 * 60, max_jobs=256):
+        """
+        :param gatherer: Gatherer fetching the sources of a symbol.
+        :param analyzer: StockAnalyzer with analyze_stream().
+        :param workers: Number of analyses running at the same time.
+        :param ttl: Seconds a finished, successful job is reused.
+        :param max_jobs: Finished jobs kept, oldest are dropped first.
+        """
+        self.gatherer = gatherer
+        self.analyzer = analyzer
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="gui-job"
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol, days):
+        """Return the latest job of a symbol and window, or None"""
+        with self._lock:
+            return self._jobs.get((symbol, days))
+
+    def start(self, symbol, days, fresh=False):
+        """
+        Return the job of a symbol and window, starting one if needed.
+
+        :param fresh: Re-run the AI analysis instead of reusing a result.
+        """
+        symbol = symbol.strip().upper()
+        with self._lock:
+            job = self._jobs.get((symbol, days))
+            if job is not None and not job.done:
+                return job
+            if (
+                job is not None
+                and not fresh
+                and time.time() - job.finished < self.ttl
+                and self.analyzer.is_cacheable(job.analysis)
+            ):
+                return job
+
+            job = AnalysisJob(symbol, days, fresh, SOURCES)
+            self._jobs[(symbol, days)] = job
+            if len(self._jobs) > self.max_jobs:
+                oldest = min(
+                    (key for key, other in self._jobs.items() if other.done),
+                    key=lambda key: self._jobs[key].finished,
+                    default=None,
+                )
+                if oldest is not None:
+                    del self._jobs[oldest]
+        self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        with tracing.span("pipeline", symbol=job.symbol, days=job.days):
+            self._analyze(job)
+
+    def _analyze(self, job):
+        try:
+            job._update(stage=GATHERING)
+            gathered = self.gatherer.gather(
+                job.symbol,
+                job.days,
+                progress=lambda result: job._update(
+                    collected=job.collected + [result.name]
+                ),
+            )
+            job._update(gathered=gathered, stage=ANALYZING)
+
+            analysis = None
+            for field, value in self.analyzer.analyze_stream(
+                job.symbol,
+                gathered.articles,
+                gathered.insider_sentiments,
+                gathered.analyst_sentiments,
+                bypass_cache=job.fresh,
+            ):
+                if field == "analysis":
+                    analysis = value
+                else:
+                    with job._lock:
+                        job.fields[field] = value
+            job._update(analysis=analysis)
+        except Exception as e:
+            logger.error(f"Analysis job of {job.symbol} failed: {str(e)}")
+            job._update(analysis=f"Error during analysis: {str(e)}")
+        finally:
+            job._update(stage=DONE, finished=time.time())
@@ -0,0 +1,90 @@
+"""Incremental parsing of a JSON object arriving in chunks"""
+
+import json
+
+
+class JSONFieldStream:
+    """
+    Emit the top-level fields of a JSON object as soon as each one closes.
+
+    Text before the opening brace (e.g. a ```json fence or a preamble) is
+    skipped. Each character is scanned once, so feeding a response token by
+    token costs linear time overall.
+    """
+
+    def __init__(self):
+        # Pieces of the member being read, joined only once it closes
+        self._member = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._done = False
+        self.emitted = {}
+
+    @property
+    def done(self):
+        """True once the top-level object has been closed"""
+        return self._done
+
+    def _close_member(self, tail):
+        self._member.append(tail)
+        member = "".join(self._member).strip()
+        self._member = []
+        if not member:
+            return []
+        try:
+            fields = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            return []
+        self.emitted.update(fields)
+        return list(fields.items())
+
+    def feed(self, chunk):
+        """
+        Add a chunk of text.
+
+        Only the new chunk is scanned, and the text of a member is kept until
+        the member closes, so memory stays bounded by the largest field.
+
+        :param chunk: Next piece of the response.
+        :return: List of (field, value) pairs completed by this chunk.
+        """
+        if self._done or not chunk:
+            return []
+
+        completed = []
+        # Start in this chunk of the member being read, None before the object
+        start = 0 if self._depth else None
+        for i, char in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    start = i + 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.extend(self._close_member(chunk[start:i]))
+                    self._done = True
+                    return completed
+            elif char == "," and self._depth == 1:
+                completed.extend(self._close_member(chunk[start:i]))
+                start = i + 1
+
+        if start is not None:
+            self._member.append(chunk[start:])
+        return completed
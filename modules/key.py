@@ -1,12 +1,29 @@
-from dotenv import load_dotenv
 import os
-import modules.logger as logger
+import threading
 
-# Load environment variables
-load_dotenv()
+import modules.logger as logger
 
 keys = {}
 
+# Global variables
+_env_loaded = False
+_env_lock = threading.Lock()
+_lock = threading.Lock()
+
+
+def load_env():
+    """Load the .env file into the environment, once"""
+    global _env_loaded
+
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _env_loaded = True
+
 
 def add_key(key):
     global keys
@@ -22,33 +39,56 @@ def iterate_keys():
 
 
 class Key:
+    """
+    An API key read from the environment or the .env file.
+
+    Constructing a key is free: the .env file is loaded and the value read
+    and logged the first time `value` is used, so entry points only pay for
+    the keys they actually need.
+    """
+
     def __init__(self, name, description):
-        global keys
-        if name in keys:
-            key = keys[name]
-            self.name = key.name
-            self.value = key.value
-            self.description = key.description
-            logger.info(f"Key '{name}' already exists, using existing value")
-            return
         """Initialize with the name of the key"""
+        global keys
         self.name = name
-        self.value = os.getenv(name)
         self.description = description
-        if self.value is None:
-            logger.warning(f"Key '{name}' not found in environment variables")
-            self.value = ""
-        else:
-            logger.info(f"Key '{name}' loaded with value: {self.value_to_string()}")
+        if name in keys:
+            # Share the value, and its one-time loading, with the first key
+            self._shared = keys[name]
+            return
+        self._shared = self
+        self._value = None
         add_key(self)
 
+    @property
+    def value(self):
+        shared = self._shared
+        if shared._value is None:
+            with _lock:
+                if shared._value is None:
+                    shared._value = shared._load()
+        return shared._value
+
+    def _load(self):
+        load_env()
+        value = os.getenv(self.name)
+        if value is None:
+            logger.warning(f"Key '{self.name}' not found in environment variables")
+            return ""
+        logger.info(f"Key '{self.name}' loaded with value: {_masked(value)}")
+        return value
+
     def exists(self):
         """Check if the key exists"""
         return self.value is not None and self.value != ""
 
     def value_to_string(self):
         """Return a string representation of the key value"""
-        return self.value[:4] + "..." + self.value[-4:] if self.value else "Not set"
+        return _masked(self.value)
+
+
+def _masked(value):
+    return value[:4] + "..." + value[-4:] if value else "Not set"
 
 
 class DeepSeekKey(Key):
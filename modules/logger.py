@@ -1,111 +1,250 @@
-import logging
-import os
-from datetime import datetime
-from pathlib import Path
-
-# Global variables
-_module_name = None
-_logger = None
-_current_log_file = None
-
-
-def init(module_name):
-    """Initialize the logger with a module name"""
-    global _module_name, _logger, _current_log_file
-
-    _module_name = module_name
-
-    # Create logs directory if it doesn't exist
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-
-    # Create daily log file name
-    today = datetime.now().strftime("%Y-%m-%d")
-    log_file = log_dir / f"{today}.log"
-
-    _current_log_file = log_file
-
-    # Create custom logger
-    _logger = logging.getLogger(module_name)
-    _logger.setLevel(logging.DEBUG)
-
-    # Clear any existing handlers
-    _logger.handlers.clear()
+"""Buffered, non-blocking logging to daily files and the console
 
-    # Create formatter
-    formatter = logging.Formatter(
-        "%(asctime)s [%(name)s] %(message)s", datefmt="%H:%M:%S"
-    )
+Logging calls only put the message on a queue. A background writer thread
+formats the queued records and writes them in batches, flushing once per
+batch, to logs/YYYY-MM-DD.log (or .jsonl with JSON lines) and to stderr. The
+log file is switched when a record's timestamp passes the next midnight, a
+single comparison per record.
 
-    # File handler
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setFormatter(formatter)
-    _logger.addHandler(file_handler)
+Records still queued at interpreter exit are written by an atexit hook.
+"""
 
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    _logger.addHandler(console_handler)
-
-    # Prevent duplicate logs
-    _logger.propagate = False
-
-
-def _check_date_change():
-    """Check if date has changed and create new log file if needed"""
-    global _current_log_file, _logger
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
 
-    if not _logger or not _module_name:
-        return
+DEBUG = "DEBUG"
+INFO = "INFO"
+WARNING = "WARNING"
+ERROR = "ERROR"
+CRITICAL = "CRITICAL"
 
-    today = datetime.now().strftime("%Y-%m-%d")
-    expected_log_file = Path("logs") / f"{today}.log"
+# Records written per batch before a flush
+BATCH_SIZE = 512
 
-    if _current_log_file != expected_log_file:
-        # Date has changed, reinitialize logger
-        init(_module_name)
+# Global variables
+_module_name = None
+_options = {}
+_queue = queue.SimpleQueue()
+_writer = None
+_lock = threading.Lock()
+_stop = object()
+
+
+class _Writer(threading.Thread):
+    """Background thread draining the queue into the log file and console"""
+
+    def __init__(self, log_dir, json_lines, console):
+        super().__init__(name="log-writer", daemon=True)
+        self.log_dir = Path(log_dir)
+        self.json_lines = json_lines
+        self.console = console
+        self.file = None
+        self.rollover_at = 0.0
+        self._second = None
+        self._clock = ""
+
+    def _open(self, created):
+        if self.file is not None:
+            self.file.close()
+        self.log_dir.mkdir(exist_ok=True)
+        day = datetime.fromtimestamp(created).date()
+        suffix = "jsonl" if self.json_lines else "log"
+        self.file = open(
+            self.log_dir / f"{day.strftime('%Y-%m-%d')}.{suffix}",
+            "a",
+            encoding="utf-8",
+        )
+        self.rollover_at = datetime.combine(
+            day + timedelta(days=1), datetime.min.time()
+        ).timestamp()
+
+    def _text(self, created, name, message):
+        # Records of the same second share the formatted clock
+        second = int(created)
+        if second != self._second:
+            self._second = second
+            self._clock = time.strftime("%H:%M:%S", time.localtime(second))
+        return f"{self._clock} [{name}] {message}\n"
+
+    def _write(self, records):
+        text = []
+        lines = []
+        for created, level, name, message in records:
+            if created >= self.rollover_at:
+                if lines:
+                    self.file.write("".join(lines))
+                    lines = []
+                self._open(created)
+            formatted = self._text(created, name, message)
+            text.append(formatted)
+            if self.json_lines:
+                lines.append(
+                    json.dumps(
+                        {
+                            "time": datetime.fromtimestamp(created).isoformat(),
+                            "level": level,
+                            "name": name,
+                            "message": str(message),
+                        }
+                    )
+                    + "\n"
+                )
+            else:
+                lines.append(formatted)
+        self.file.write("".join(lines))
+        self.file.flush()
+        if self.console:
+            sys.stderr.write("".join(text))
+            sys.stderr.flush()
+
+    def run(self):
+        while True:
+            records = [_queue.get()]
+            while len(records) < BATCH_SIZE:
+                try:
+                    records.append(_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            done = [r for r in records if isinstance(r, threading.Event)]
+            stop = any(r is _stop for r in records)
+            records = [r for r in records if isinstance(r, tuple)]
+            if records:
+                try:
+                    self._write(records)
+                except Exception as e:
+                    sys.stderr.write(f"Logging failed: {str(e)}\n")
+            for event in done:
+                event.set()
+            if stop:
+                if self.file is not None:
+                    self.file.close()
+                return
+
+
+def _start():
+    global _writer
+
+    _writer = _Writer(**_options)
+    _writer.start()
+
+
+def init(module_name, json_lines=False, console=True, log_dir="logs"):
+    """
+    Initialize the logger with a module name.
+
+    Safe to call again, e.g. on every Streamlit rerun: the writer thread is
+    only restarted when an output option changes.
+
+    :param json_lines: Write the log file as JSON lines instead of text.
+    :param console: Also write the records to stderr.
+    :param log_dir: Directory of the daily log files.
+    """
+    global _module_name, _options
+
+    options = {"log_dir": Path(log_dir), "json_lines": json_lines, "console": console}
+    with _lock:
+        _module_name = module_name
+        if _writer is not None:
+            if options == _options:
+                return
+            _queue.put(_stop)
+            _writer.join()
+        _options = options
+        _start()
+
+
+def settings():
+    """
+    Arguments of the last init(), for starting the logger of another
+    process the same way, or None before the first init().
+    """
+    if _module_name is None:
+        return None
+    return {
+        "module_name": _module_name,
+        "json_lines": _options["json_lines"],
+        "console": _options["console"],
+        "log_dir": str(_options["log_dir"]),
+    }
+
+
+def flush(timeout=None):
+    """
+    Wait until the records logged so far are written.
+
+    :return: False if the timeout expired first.
+    """
+    if _writer is None:
+        return True
+    done = threading.Event()
+    _queue.put(done)
+    return done.wait(timeout)
+
+
+def shutdown(timeout=5.0):
+    """Write the queued records and stop the writer thread"""
+    global _writer
+
+    with _lock:
+        if _writer is not None:
+            _queue.put(_stop)
+            _writer.join(timeout)
+        _writer = None
+
+
+def _after_fork():
+    # The writer thread does not survive a fork, the child starts its own
+    # on its first record
+    global _lock, _queue, _writer
+
+    _lock = threading.Lock()
+    _queue = queue.SimpleQueue()
+    _writer = None
+
+
+atexit.register(shutdown)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _log(level, message):
+    if _writer is None:
+        if _module_name is None:
+            raise RuntimeError("Logger not initialized. Call logger.init() first.")
+        with _lock:
+            if _writer is None:
+                _start()
+    _queue.put((time.time(), level, _module_name, message))
 
 
 def info(message):
     """Log an info message"""
-    if not _logger:
-        raise RuntimeError("Logger not initialized. Call logger.init() first.")
-
-    _check_date_change()
-    _logger.info(message)
+    _log(INFO, message)
 
 
 def error(message):
     """Log an error message"""
-    if not _logger:
-        raise RuntimeError("Logger not initialized. Call logger.init() first.")
-
-    _check_date_change()
-    _logger.error(message)
+    _log(ERROR, message)
 
 
 def warning(message):
     """Log a warning message"""
-    if not _logger:
-        raise RuntimeError("Logger not initialized. Call logger.init() first.")
-
-    _check_date_change()
-    _logger.warning(message)
+    _log(WARNING, message)
 
 
 def debug(message):
     """Log a debug message"""
-    if not _logger:
-        raise RuntimeError("Logger not initialized. Call logger.init() first.")
-
-    _check_date_change()
-    _logger.debug(message)
+    _log(DEBUG, message)
 
 
 def critical(message):
     """Log a critical message"""
-    if not _logger:
-        raise RuntimeError("Logger not initialized. Call logger.init() first.")
-
-    _check_date_change()
-    _logger.critical(message)
+    _log(CRITICAL, message)
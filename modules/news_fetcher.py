@@ -1,78 +1,230 @@
 """Fetch news articles about the stock symbol"""
 
-import requests
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
-import re
+
+import modules.scheduler as scheduler
+import modules.tracing as tracing
+import modules.transport as transport
+import modules.workers as workers
+
+NEWS_API_URL = "https://newsapi.org/v2/everything"
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+
+def _from_date(days, from_date):
+    if from_date is None:
+        return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    return from_date
+
+
+def _news_api_params(symbol, from_date, to_date, api_key, sort_by="relevancy"):
+    params = {
+        "q": f"{symbol} stock OR {symbol} earnings OR {symbol} company",
+        "from": from_date,
+        "sortBy": sort_by,
+        "language": "en",
+        "pageSize": 10,
+        "apiKey": api_key,
+    }
+    if to_date:
+        params["to"] = to_date
+    return params
+
+
+def _request(provider, symbol, request):
+    """Make a scheduled request in a span recording its status and size"""
+    with tracing.span(f"fetch.{provider}", symbol=symbol) as span:
+        response = scheduler.call(provider, request)
+        span.set(status=response.status_code, bytes=len(response.content))
+    return response
+
+
+async def _request_async(provider, symbol, request):
+    with tracing.span(f"fetch.{provider}", symbol=symbol) as span:
+        response = await scheduler.call_async(provider, request)
+        span.set(status=response.status_code, bytes=len(response.content))
+    return response
+
+
+def _news_api_articles(response, max_articles):
+    with tracing.span("parse.newsapi", bytes=len(response.content)):
+        data = response.json()
+    articles = []
+    for article in data.get("articles", []):
+        if article.get("title") and article.get("description"):
+            articles.append(
+                {
+                    "title": article["title"],
+                    "content": article["description"],
+                    "url": article.get("url", ""),
+                    "source": "NewsAPI",
+                    "published": article.get("publishedAt", ""),
+                }
+            )
+        if len(articles) >= max_articles:
+            break
+    return articles
+
+
+def _yahoo_url(symbol):
+    return f"https://finance.yahoo.com/quote/{symbol}/news?p={symbol}"
+
+
+def _yahoo_articles(content, url, max_articles):
+    with tracing.span("parse.yahoo", bytes=len(content)):
+        return workers.run(_parse_yahoo, content, url, max_articles, size=len(content))
+
+
+async def _yahoo_articles_async(content, url, max_articles):
+    with tracing.span("parse.yahoo", bytes=len(content)):
+        return await workers.run_async(
+            _parse_yahoo, content, url, max_articles, size=len(content)
+        )
+
+
+def _parse_yahoo(content, url, max_articles):
+    # Imported on first parse, it loads html.parser or lxml
+    from modules.html_extract import extract_yahoo_headlines
+
+    titles = extract_yahoo_headlines(content, max_articles)
+    articles = []
+    for title in titles:
+        if title and len(title) > 10:
+            articles.append(
+                {
+                    "title": title,
+                    "content": title,
+                    "url": url,
+                    "source": "Yahoo Finance",
+                }
+            )
+    return articles
+
+
+def _finviz_url(symbol):
+    return f"https://finviz.com/quote.ashx?t={symbol}"
+
+
+def _finviz_articles(content, max_articles):
+    with tracing.span("parse.finviz", bytes=len(content)):
+        return workers.run(_parse_finviz, content, max_articles, size=len(content))
+
+
+async def _finviz_articles_async(content, max_articles):
+    with tracing.span("parse.finviz", bytes=len(content)):
+        return await workers.run_async(
+            _parse_finviz, content, max_articles, size=len(content)
+        )
+
+
+def _parse_finviz(content, max_articles):
+    from modules.html_extract import extract_finviz_news
+
+    anchors = extract_finviz_news(content, max_articles)
+    articles = []
+    for title, href in anchors:
+        if title and len(title) > 10:
+            articles.append(
+                {
+                    "title": title,
+                    "content": title,
+                    "url": href,
+                    "source": "Finviz",
+                }
+            )
+    return articles
 
 
 class NewsFetcher:
-    def __init__(self, news_api_key=None):
+    def __init__(self, news_api_key=None, cache=None):
+        """
+        :param news_api_key: NewsAPI key.
+        :param cache: Optional ResponseCache shared by all fetch methods.
+        """
         self.news_api_key = news_api_key
+        self.cache = cache
+
+    def _cached(self, endpoint, args, fetch):
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch(endpoint, args, fetch)
+
+    def fetch_news_api(
+        self,
+        symbol,
+        days,
+        max_articles=10,
+        from_date=None,
+        to_date=None,
+        sort_by="relevancy",
+    ):
+        """
+        Fetch NewsAPI articles about a symbol.
 
-    def fetch_news_api(self, symbol, days, max_articles=10):
-        articles = []
+        :param days: Window in days, ignored when from_date is given.
+        :param from_date: Optional ISO date or datetime of the oldest article.
+        :param to_date: Optional ISO date or datetime of the newest article.
+        :param sort_by: NewsAPI order, "relevancy" or "publishedAt" for the
+            newest articles first.
+        """
+        from_date = _from_date(days, from_date)
+        return self._cached(
+            "newsapi",
+            [symbol, from_date, to_date, max_articles, sort_by],
+            lambda: self._fetch_news_api(
+                symbol, from_date, to_date, max_articles, sort_by
+            ),
+        )
+
+    def fetch_yahoo_finance_news(self, symbol, max_articles=10):
+        return self._cached(
+            "yahoo",
+            [symbol, max_articles],
+            lambda: self._fetch_yahoo_finance_news(symbol, max_articles),
+        )
+
+    def fetch_finviz_news(self, symbol, max_articles=10):
+        return self._cached(
+            "finviz",
+            [symbol, max_articles],
+            lambda: self._fetch_finviz_news(symbol, max_articles),
+        )
+
+    def _fetch_news_api(
+        self, symbol, from_date, to_date=None, max_articles=10, sort_by="relevancy"
+    ):
         try:
             # Method 1: Using NewsAPI (if API key is provided)
             if self.news_api_key.exists():
-                url = f"https://newsapi.org/v2/everything"
-                params = {
-                    "q": f"{symbol} stock OR {symbol} earnings OR {symbol} company",
-                    "from": (datetime.now() - timedelta(days=days)).strftime(
-                        "%Y-%m-%d"
-                    ),
-                    "sortBy": "relevancy",
-                    "language": "en",
-                    "pageSize": 10,
-                    "apiKey": self.news_api_key.value,
-                }
-
-                response = requests.get(url, params=params, timeout=10)
+                params = _news_api_params(
+                    symbol, from_date, to_date, self.news_api_key.value, sort_by
+                )
+                response = _request(
+                    "newsapi",
+                    symbol,
+                    lambda: transport.get(NEWS_API_URL, params=params),
+                )
                 if response.status_code == 200:
-                    data = response.json()
-                    for article in data.get("articles", []):
-                        if article.get("title") and article.get("description"):
-                            articles.append(
-                                {
-                                    "title": article["title"],
-                                    "content": article["description"],
-                                    "url": article.get("url", ""),
-                                    "source": "NewsAPI",
-                                }
-                            )
-                        if len(articles) >= max_articles:
-                            break
-                    return True, articles
+                    return True, _news_api_articles(response, max_articles)
+                return (
+                    False,
+                    f"Error fetching news from NewsAPI: {response.status_code}",
+                )
+            return False, "Error fetching news from NewsAPI: API key not found"
         except Exception as e:
             return False, f"Error fetching news from NewsAPI: {str(e)}"
 
-    def fetch_yahoo_finance_news(self, symbol, max_articles=10):
-        articles = []
-
+    def _fetch_yahoo_finance_news(self, symbol, max_articles=10):
         # Extract news headlines and snippets
-        url = f"https://finance.yahoo.com/quote/{symbol}/news?p={symbol}"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+        url = _yahoo_url(symbol)
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = _request(
+                "yahoo", symbol, lambda: transport.get(url, headers=BROWSER_HEADERS)
+            )
             if response.status_code == 200:
-                soup = BeautifulSoup(response.content, "html.parser")
-                news_items = soup.find_all(
-                    "h3", {"class": re.compile(".*headline.*", re.I)}
-                )
-                for item in news_items[:max_articles]:
-                    title = item.get_text(strip=True)
-                    if title and len(title) > 10:
-                        articles.append(
-                            {
-                                "title": title,
-                                "content": title,
-                                "url": url,
-                                "source": "Yahoo Finance",
-                            }
-                        )
-                return True, articles
+                return True, _yahoo_articles(response.content, url, max_articles)
             else:
                 return (
                     False,
@@ -81,31 +233,169 @@ class NewsFetcher:
         except Exception as e:
             return False, f"Error fetching news from Yahoo Finance: {str(e)}"
 
-    def fetch_finviz_news(self, symbol, max_articles=10):
-        articles = []
-        url = f"https://finviz.com/quote.ashx?t={symbol}"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+    def _fetch_finviz_news(self, symbol, max_articles=10):
+        url = _finviz_url(symbol)
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = _request(
+                "finviz", symbol, lambda: transport.get(url, headers=BROWSER_HEADERS)
+            )
             if response.status_code != 200:
                 return False, f"Error fetching news from Finviz: {response.status_code}"
 
-            soup = BeautifulSoup(response.content, "html.parser")
-
-            news_items = soup.find_all("a", {"class": "tab-link-news"})
-            for item in news_items[:max_articles]:
-                title = item.get_text(strip=True)
-                if title and len(title) > 10:
-                    articles.append(
-                        {
-                            "title": title,
-                            "content": title,
-                            "url": item.get("href", ""),
-                            "source": "Finviz",
-                        }
-                    )
-            return True, articles
+            return True, _finviz_articles(response.content, max_articles)
+        except Exception as e:
+            return False, f"Could not scrape from {url}: {str(e)}"
+
+
+class AsyncNewsFetcher:
+    """
+    asyncio counterpart of NewsFetcher with the same (success, payload)
+    results, for keeping many requests in flight from one thread.
+
+    Every fetch method accepts an optional timeout in seconds covering the
+    whole call, including the wait for a rate limit token. A fetch that times
+    out returns (False, message); a cancelled fetch raises CancelledError and
+    leaves no request running. Use as an async context manager or call
+    aclose() to release the connections.
+    """
+
+    def __init__(self, news_api_key=None, cache=None, timeout=None):
+        """
+        :param news_api_key: NewsAPI key.
+        :param cache: Optional ResponseCache shared by all fetch methods.
+        :param timeout: Default per-call timeout in seconds, none by default.
+        """
+        self.news_api_key = news_api_key
+        self.cache = cache
+        self.timeout = timeout
+        self._client = None
+
+    def client(self):
+        """The httpx.AsyncClient of this fetcher, created on first use"""
+        if self._client is None:
+            self._client = transport.async_http_client()
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _cached(self, endpoint, args, fetch, timeout, error):
+        import asyncio
+
+        timeout = self.timeout if timeout is None else timeout
+
+        async def bounded():
+            try:
+                return await asyncio.wait_for(fetch(), timeout)
+            except asyncio.TimeoutError:
+                return False, f"{error}: timed out after {timeout}s"
+
+        if self.cache is None:
+            return await bounded()
+        return await self.cache.get_or_fetch_async(endpoint, args, bounded)
+
+    async def fetch_news_api(
+        self,
+        symbol,
+        days,
+        max_articles=10,
+        from_date=None,
+        to_date=None,
+        timeout=None,
+        sort_by="relevancy",
+    ):
+        """
+        Fetch NewsAPI articles about a symbol, see NewsFetcher.fetch_news_api.
+
+        :param timeout: Optional timeout in seconds of this call.
+        """
+        from_date = _from_date(days, from_date)
+        return await self._cached(
+            "newsapi",
+            [symbol, from_date, to_date, max_articles, sort_by],
+            lambda: self._fetch_news_api(
+                symbol, from_date, to_date, max_articles, sort_by
+            ),
+            timeout,
+            "Error fetching news from NewsAPI",
+        )
+
+    async def fetch_yahoo_finance_news(self, symbol, max_articles=10, timeout=None):
+        return await self._cached(
+            "yahoo",
+            [symbol, max_articles],
+            lambda: self._fetch_yahoo_finance_news(symbol, max_articles),
+            timeout,
+            "Error fetching news from Yahoo Finance",
+        )
+
+    async def fetch_finviz_news(self, symbol, max_articles=10, timeout=None):
+        return await self._cached(
+            "finviz",
+            [symbol, max_articles],
+            lambda: self._fetch_finviz_news(symbol, max_articles),
+            timeout,
+            f"Could not scrape from {_finviz_url(symbol)}",
+        )
+
+    async def _fetch_news_api(
+        self, symbol, from_date, to_date=None, max_articles=10, sort_by="relevancy"
+    ):
+        try:
+            if self.news_api_key.exists():
+                params = _news_api_params(
+                    symbol, from_date, to_date, self.news_api_key.value, sort_by
+                )
+                response = await _request_async(
+                    "newsapi",
+                    symbol,
+                    lambda: self.client().get(NEWS_API_URL, params=params),
+                )
+                if response.status_code == 200:
+                    return True, _news_api_articles(response, max_articles)
+                return (
+                    False,
+                    f"Error fetching news from NewsAPI: {response.status_code}",
+                )
+            return False, "Error fetching news from NewsAPI: API key not found"
+        except Exception as e:
+            return False, f"Error fetching news from NewsAPI: {str(e)}"
+
+    async def _fetch_yahoo_finance_news(self, symbol, max_articles=10):
+        url = _yahoo_url(symbol)
+        try:
+            response = await _request_async(
+                "yahoo", symbol, lambda: self.client().get(url, headers=BROWSER_HEADERS)
+            )
+            if response.status_code == 200:
+                return True, await _yahoo_articles_async(
+                    response.content, url, max_articles
+                )
+            return (
+                False,
+                f"Error fetching news from Yahoo Finance: {response.status_code}",
+            )
+        except Exception as e:
+            return False, f"Error fetching news from Yahoo Finance: {str(e)}"
+
+    async def _fetch_finviz_news(self, symbol, max_articles=10):
+        url = _finviz_url(symbol)
+        try:
+            response = await _request_async(
+                "finviz",
+                symbol,
+                lambda: self.client().get(url, headers=BROWSER_HEADERS),
+            )
+            if response.status_code != 200:
+                return False, f"Error fetching news from Finviz: {response.status_code}"
+            return True, await _finviz_articles_async(response.content, max_articles)
         except Exception as e:
             return False, f"Could not scrape from {url}: {str(e)}"
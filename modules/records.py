@@ -0,0 +1,158 @@
+"""Compact records of articles, insider MSPR rows and recommendation trends
+
+The fetchers return plain dicts decoded from JSON, and every dict carries
+its own copy of strings such as the source name, the symbol and the period.
+A batch holding the evidence of hundreds of symbols keeps thousands of them.
+The records here hold the same fields in __slots__ instead of a dict:
+- Sources, symbols, periods and URLs are interned, so each distinct value is
+  stored once.
+- Article bodies are kept as UTF-8 bytes, compressed when long, and decoded
+  only when read. News text with curly quotes is otherwise stored at two
+  bytes per character.
+
+The records are read-only Mappings, so code reading them as dicts with
+record["title"] or record.get("mspr") keeps working. Use dict(record) where
+a real dict is needed, e.g. for json.dumps, and plain() to turn a payload
+back into what the fetcher returned, e.g. before pasting it into a prompt.
+"""
+
+import sys
+import zlib
+from collections.abc import Mapping
+
+# Bodies from this many UTF-8 bytes on are zlib-compressed
+COMPRESS_MIN = 512
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class _Record(Mapping):
+    """
+    Read-only mapping over the slots named in _fields.
+
+    Unset slots are absent keys. Keys outside _fields are kept in _extra.
+    """
+
+    __slots__ = ("_extra",)
+    _fields = ()
+    _interned = frozenset()
+
+    def __init__(self, values):
+        extra = None
+        for key, value in values.items():
+            if key in self._fields:
+                setattr(self, key, _intern(value) if key in self._interned else value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        for key in self._fields:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class Article(_Record):
+    """News article with title, content, url, source and published keys"""
+
+    __slots__ = ("title", "url", "source", "published", "_body", "_compressed")
+    _fields = ("title", "content", "url", "source", "published")
+    _interned = frozenset(("url", "source"))
+
+    def __init__(self, values):
+        values = dict(values)
+        content = values.pop("content", None)
+        super().__init__(values)
+        self._body = None
+        self._compressed = False
+        if content is not None and content != values.get("title"):
+            body = content.encode("utf-8")
+            if len(body) >= COMPRESS_MIN:
+                body = zlib.compress(body, 1)
+                self._compressed = True
+            self._body = body
+
+    @property
+    def content(self):
+        """The body, decoded on each access; the title for headline sources"""
+        if self._body is None:
+            return self.title
+        body = zlib.decompress(self._body) if self._compressed else self._body
+        return body.decode("utf-8")
+
+
+class InsiderRow(_Record):
+    """Monthly insider sentiment row of Finnhub"""
+
+    __slots__ = ("symbol", "year", "month", "change", "mspr")
+    _fields = __slots__
+    _interned = frozenset(("symbol",))
+
+
+class TrendRow(_Record):
+    """Monthly recommendation trend row of Finnhub"""
+
+    __slots__ = ("buy", "hold", "period", "sell", "strongBuy", "strongSell", "symbol")
+    _fields = __slots__
+    _interned = frozenset(("period", "symbol"))
+
+
+def _rows(record_type, rows):
+    return [record_type(row) if type(row) is dict else row for row in rows or []]
+
+
+def articles(payload):
+    """Compact a list of article dicts"""
+    return _rows(Article, payload)
+
+
+def insider_sentiments(payload):
+    """Compact a Finnhub insider sentiment payload, {"data": [...]} or a list"""
+    if isinstance(payload, dict):
+        compact = dict(payload, data=_rows(InsiderRow, payload.get("data")))
+        if "symbol" in compact:
+            compact["symbol"] = _intern(compact["symbol"])
+        return compact
+    return _rows(InsiderRow, payload)
+
+
+def recommendation_trends(payload):
+    """Compact a list of Finnhub recommendation trend dicts"""
+    return _rows(TrendRow, payload)
+
+
+def plain(payload):
+    """
+    Payload with its records turned back into dicts, as the fetchers return
+    them. Keys keep the upstream order, which _fields follows.
+    """
+    if isinstance(payload, list):
+        return [dict(row) if isinstance(row, _Record) else row for row in payload]
+    if isinstance(payload, dict):
+        return {
+            key: plain(value) if isinstance(value, list) else value
+            for key, value in payload.items()
+        }
+    return payload
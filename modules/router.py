@@ -0,0 +1,367 @@
+"""LLM engine spreading requests over several endpoints and models
+
+Router has the send() and stream() interface of DeepSeek and forwards each
+prompt to one of its engines, e.g. DeepSeek engines for DEEPSEEK_CHAT and
+DEEPSEEK_REASONER, or the same model behind another OpenAI-compatible
+endpoint. Engines are ranked by their median latency over a window of recent
+calls, and an engine failing repeatedly is benched for a while.
+
+send() is hedged: when the first engine has not answered after the 95th
+percentile of its latency, the prompt is also sent to the next engine. The
+first valid answer wins and the other requests are cancelled. Requests are
+streamed internally so that a cancelled one closes its HTTP response at its
+next chunk, which stops the provider generating (and billing) the rest.
+"""
+
+import collections
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import modules.logger as logger
+import modules.tracing as tracing
+
+# Calls of an engine before its latency percentiles are trusted
+MIN_SAMPLES = 5
+
+
+def non_empty(text):
+    """Default answer check of a Router: any non-blank text"""
+    return bool(text and text.strip())
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class LatencyStats:
+    """Recent latencies and failures of one engine"""
+
+    def __init__(self, window=200):
+        self._latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.wins = 0
+        self.hedges = 0
+        self.cancelled = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+
+    def success(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.calls += 1
+            self.consecutive_failures = 0
+
+    def failure(self, threshold, cooldown):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= threshold:
+                self.benched_until = time.monotonic() + cooldown
+
+    def quantile(self, q):
+        """Latency quantile in seconds, None until MIN_SAMPLES calls"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def median(self):
+        # statistics imports fractions and decimal, only load it when needed
+        import statistics
+
+        with self._lock:
+            if len(self._latencies) < MIN_SAMPLES:
+                return None
+            return statistics.median(self._latencies)
+
+    @property
+    def benched(self):
+        return time.monotonic() < self.benched_until
+
+
+class Router:
+    """
+    Engine answering each prompt with the fastest of several engines, with
+    hedged duplicate requests to cut the tail latency.
+    """
+
+    def __init__(
+        self,
+        engines,
+        hedge_quantile=0.95,
+        hedge_delay=None,
+        initial_delay=10.0,
+        min_delay=0.5,
+        max_hedges=1,
+        validate=non_empty,
+        failure_threshold=3,
+        cooldown=60.0,
+        window=200,
+        max_workers=32,
+    ):
+        """
+        :param engines: Engines with send() and ideally stream(), like
+            DeepSeek, in order of preference until latencies are known.
+        :param hedge_quantile: Latency quantile of the first engine after
+            which the prompt is also sent to the next one.
+        :param hedge_delay: Fixed hedge delay in seconds instead.
+        :param initial_delay: Hedge delay until an engine has MIN_SAMPLES
+            calls.
+        :param min_delay: Lower bound of the hedge delay.
+        :param max_hedges: Duplicates sent per prompt at most, 0 to disable.
+        :param validate: Function telling whether an answer is usable; an
+            unusable answer is treated like an error.
+        :param failure_threshold: Consecutive failures benching an engine.
+        :param cooldown: Seconds an engine stays benched.
+        :param window: Calls per engine the latency stats are computed on.
+        :param max_workers: Threads running requests for all callers.
+        """
+        if not engines:
+            raise ValueError("Router needs at least one engine")
+        self.engines = list(engines)
+        self.names = [self._name(engine) for engine in self.engines]
+        self.stats = [LatencyStats(window) for _ in self.engines]
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_hedges = max_hedges
+        self.validate = validate
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _name(engine):
+        model = getattr(engine, "deepseek_model", None)
+        model = getattr(model, "value", model) or type(engine).__name__
+        base_url = getattr(engine, "base_url", None)
+        return f"{model}@{base_url}" if base_url else str(model)
+
+    @property
+    def deepseek_model(self):
+        """Sorted engine names, identifying the router e.g. in cache keys"""
+        return sorted(self.names)
+
+    @property
+    def supports_json_mode(self):
+        """True when any engine does; the others ignore json_mode"""
+        return any(getattr(e, "supports_json_mode", False) for e in self.engines)
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="router"
+                )
+            return self._executor
+
+    def ranked(self):
+        """Engine indexes, fastest median first and benched engines last"""
+
+        def key(index):
+            median = self.stats[index].median()
+            return (
+                self.stats[index].benched,
+                float("inf") if median is None else median,
+                index,
+            )
+
+        return sorted(range(len(self.engines)), key=key)
+
+    def delay(self, index):
+        """Seconds to wait for an engine before hedging"""
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        latency = self.stats[index].quantile(self.hedge_quantile)
+        if latency is None:
+            return self.initial_delay
+        return max(self.min_delay, latency)
+
+    def report(self):
+        """Per engine counters and latency percentiles, e.g. for logging"""
+        return {
+            name: {
+                "calls": stats.calls,
+                "wins": stats.wins,
+                "hedges": stats.hedges,
+                "cancelled": stats.cancelled,
+                "failures": stats.failures,
+                "benched": stats.benched,
+                "p50": stats.quantile(0.5),
+                "p95": stats.quantile(0.95),
+            }
+            for name, stats in zip(self.names, self.stats)
+        }
+
+    def _attempt(self, index, cancel, results, prompt, options):
+        engine = self.engines[index]
+        start = time.monotonic()
+        try:
+            if not hasattr(engine, "stream"):
+                text = engine.send(prompt, **options)
+            else:
+                chunks = []
+                stream = engine.stream(prompt, **options)
+                try:
+                    for chunk in stream:
+                        if cancel.is_set():
+                            raise _Cancelled()
+                        chunks.append(chunk)
+                finally:
+                    # Closes the HTTP response of a cancelled request
+                    stream.close()
+                text = "".join(chunks)
+            results.put((index, True, text, time.monotonic() - start))
+        except Exception as e:
+            results.put((index, False, e, time.monotonic() - start))
+
+    def send(self, prompt, temperature=0.3, max_tokens=5000, json_mode=False):
+        """
+        Send a prompt, hedged over the engines, and return the first valid
+        answer.
+
+        Up to max_hedges duplicates are sent to racing engines, while an
+        engine failing is replaced by the next one that is not benched, so
+        every such engine is tried before the call fails.
+
+        :raise: The last engine's error when no engine gave a valid answer.
+        """
+        options = {
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "json_mode": json_mode,
+        }
+        order = self.ranked()
+        # Benched engines are only tried when all of them are
+        order = [i for i in order if not self.stats[i].benched] or order
+        hedges = 0
+        results = queue.Queue()
+        cancels = {}
+
+        def launch(index):
+            cancels[index] = threading.Event()
+            context = contextvars.copy_context()
+            self.executor().submit(
+                context.run,
+                self._attempt,
+                index,
+                cancels[index],
+                results,
+                prompt,
+                options,
+            )
+
+        with tracing.span("llm.route") as span:
+            launch(order[0])
+            started = 1
+            hedge_at = time.monotonic() + self.delay(order[0])
+            error = None
+            while cancels:
+                timeout = None
+                if hedges < self.max_hedges and started < len(order):
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                try:
+                    index, ok, value, elapsed = results.get(timeout=timeout)
+                except queue.Empty:
+                    # Slower than usual, race the next engine
+                    self.stats[order[started]].hedges += 1
+                    launch(order[started])
+                    started += 1
+                    hedges += 1
+                    hedge_at = time.monotonic() + self.delay(order[started - 1])
+                    continue
+
+                del cancels[index]
+                if ok and self.validate(value):
+                    self.stats[index].success(elapsed)
+                    self.stats[index].wins += 1
+                    for other, cancel in cancels.items():
+                        cancel.set()
+                        self.stats[other].cancelled += 1
+                    span.set(engine=self.names[index], requests=started)
+                    return value
+
+                if ok:
+                    error = ValueError(f"Invalid answer from {self.names[index]}")
+                elif not isinstance(value, _Cancelled):
+                    error = value
+                logger.warning(f"LLM engine {self.names[index]} failed: {str(error)}")
+                self.stats[index].failure(self.failure_threshold, self.cooldown)
+                if started < len(order):
+                    # Fail over at once, without waiting for the hedge delay
+                    launch(order[started])
+                    started += 1
+                    hedge_at = time.monotonic() + self.delay(order[started - 1])
+            span.set(requests=started)
+            raise error or RuntimeError("No LLM engine answered")
+
+    def stream(self, prompt, temperature=0.3, max_tokens=5000, json_mode=False):
+        """
+        Stream the answer of the fastest engine.
+
+        Streams are not hedged: their first chunks are shown as they arrive
+        and cannot be taken back.
+        """
+        index = self.ranked()[0]
+        engine = self.engines[index]
+        start = time.monotonic()
+        try:
+            if hasattr(engine, "stream"):
+                yield from engine.stream(
+                    prompt,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    json_mode=json_mode,
+                )
+            else:
+                yield engine.send(
+                    prompt,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    json_mode=json_mode,
+                )
+        except Exception:
+            self.stats[index].failure(self.failure_threshold, self.cooldown)
+            raise
+        self.stats[index].success(time.monotonic() - start)
+
+
+def from_specs(specs, api_key, **options):
+    """
+    Build the engine of a list of "MODEL" or "URL=MODEL" specs.
+
+    MODEL is a DeepSeekModels name or value, URL an OpenAI-compatible
+    endpoint (DeepSeek's by default). One spec gives a plain DeepSeek engine,
+    several a Router over them in the given order.
+
+    :param options: Router options.
+    """
+    from modules.deepseek import DEEPSEEK_BASE_URL, DeepSeek, DeepSeekModels
+
+    engines = []
+    for spec in specs:
+        base_url, _, model = spec.rpartition("=")
+        if model in DeepSeekModels.__members__:
+            model = DeepSeekModels[model]
+        else:
+            model = DeepSeekModels(model)
+        engines.append(
+            DeepSeek(
+                deepseek_api_key=api_key,
+                deepseek_model=model,
+                base_url=base_url or DEEPSEEK_BASE_URL,
+            )
+        )
+    if len(engines) == 1:
+        return engines[0]
+    return Router(engines, **options)
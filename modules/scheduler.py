@@ -0,0 +1,525 @@
+"""Central rate limiting and scheduling of calls to every provider
+
+All NewsAPI, Finviz, Yahoo, Finnhub and DeepSeek calls go through one
+Scheduler. Each provider has a token bucket sized to its published limits, and
+callers waiting for a token are served by priority, so interactive requests go
+ahead of batch sweeps. A 429 drains the provider's bucket and pauses it for the
+Retry-After delay (or an exponential backoff) before the call is retried, so
+one throttled call does not turn into a storm of them. Calls per provider and
+day, throttles and the bucket levels are kept in a SQLite ledger that survives
+restarts.
+"""
+
+import atexit
+import contextlib
+import contextvars
+import datetime
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import modules.logger as logger
+
+INTERACTIVE = 0
+BATCH = 10
+
+# rate: tokens per second, burst: bucket size, daily: calls per UTC day.
+# Finnhub allows 60 calls per minute: a burst of 5 refilled at 55/min never
+# exceeds 60 in any 60 second window. NewsAPI's developer plan allows 100
+# requests per day.
+DEFAULT_RATES = {
+    "newsapi": {"rate": 1.0, "burst": 5, "daily": 100},
+    "finviz": {"rate": 1.0, "burst": 4, "daily": None},
+    "yahoo": {"rate": 1.0, "burst": 4, "daily": None},
+    "finnhub": {"rate": 55 / 60, "burst": 5, "daily": None},
+    "deepseek": {"rate": 10.0, "burst": 20, "daily": None},
+}
+# Providers without an entry
+FALLBACK_RATE = {"rate": 1.0, "burst": 4, "daily": None}
+
+_priority = contextvars.ContextVar("scheduler_priority", default=INTERACTIVE)
+
+
+class RateLimited(Exception):
+    """A provider's daily quota is used up or no token came in time"""
+
+
+@contextlib.contextmanager
+def priority(level):
+    """
+    Run the calls made in this context, and in the Gatherer tasks started
+    from it, at the given priority (lower goes first).
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def run_at(level, function, *args):
+    """
+    Call function(*args) at the given priority without changing the caller's
+    priority. Meant for executor.submit(run_at, level, function, ...).
+    """
+    context = contextvars.copy_context()
+    context.run(_priority.set, level)
+    return context.run(function, *args)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, tokens=None, updated=None):
+        """
+        :param rate: Tokens added per second.
+        :param burst: Maximum tokens held.
+        :param tokens: Saved token level, full when not given.
+        :param updated: time.time() of the saved level.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst if tokens is None else tokens
+        self.updated = time.time() if updated is None else updated
+        self.blocked_until = 0.0
+        self._refill(time.time())
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+    def wait_time(self, now=None):
+        """Seconds until a token is available"""
+        now = time.time() if now is None else now
+        self._refill(now)
+        blocked = max(0.0, self.blocked_until - now)
+        missing = max(0.0, 1 - self.tokens) / self.rate
+        return max(blocked, missing)
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, seconds):
+        """Drain the bucket and hold it empty for `seconds`"""
+        now = time.time()
+        self.tokens = 0.0
+        self.updated = now
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class QuotaLedger:
+    """
+    SQLite record of calls and throttles per provider and UTC day, and of the
+    last token bucket levels.
+
+    Usage is added up in memory and written at most every `flush_interval`
+    seconds, on flush() and on close(), which also runs at interpreter exit,
+    so a call only costs a dict update.
+    """
+
+    def __init__(self, path="cache/quota.sqlite", flush_interval=5.0):
+        """
+        :param path: SQLite database file, or ":memory:".
+        :param flush_interval: Seconds between writes of the recorded usage.
+        """
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS usage (
+                    provider TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    calls INTEGER NOT NULL DEFAULT 0,
+                    throttled INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (provider, day)
+                );
+                CREATE TABLE IF NOT EXISTS buckets (
+                    provider TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                );
+                """
+            )
+            self._conn.commit()
+        # Not yet written: (provider, day) -> [calls, throttled], and
+        # provider -> (tokens, updated)
+        self._usage = {}
+        self._buckets = {}
+        self._flushed = time.monotonic()
+        atexit.register(self.close)
+
+    @staticmethod
+    def today():
+        return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d")
+
+    def usage(self, provider, day=None):
+        """Return (calls, throttled) of a provider on a day, today by default"""
+        key = (provider, day or self.today())
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT calls, throttled FROM usage WHERE provider = ? AND day = ?",
+                key,
+            ).fetchone()
+            calls, throttled = row or (0, 0)
+            pending = self._usage.get(key, (0, 0))
+        return calls + pending[0], throttled + pending[1]
+
+    def bucket(self, provider):
+        """Return the saved (tokens, updated) of a provider, or None"""
+        with self._lock:
+            if provider in self._buckets:
+                return self._buckets[provider]
+            return self._conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE provider = ?",
+                (provider,),
+            ).fetchone()
+
+    def record(self, provider, bucket, calls=0, throttled=0):
+        """Add calls and throttles to today's usage and save the bucket level"""
+        with self._lock:
+            usage = self._usage.setdefault((provider, self.today()), [0, 0])
+            usage[0] += calls
+            usage[1] += throttled
+            self._buckets[provider] = (bucket.tokens, bucket.updated)
+            if time.monotonic() - self._flushed >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        # Caller must hold self._lock
+        self._flushed = time.monotonic()
+        if self._conn is None or not (self._usage or self._buckets):
+            return
+        self._conn.executemany(
+            "INSERT INTO usage (provider, day, calls, throttled) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT (provider, day) DO UPDATE SET "
+            "calls = calls + excluded.calls, "
+            "throttled = throttled + excluded.throttled",
+            [(*key, *usage) for key, usage in self._usage.items()],
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO buckets (provider, tokens, updated) "
+            "VALUES (?, ?, ?)",
+            [(provider, *level) for provider, level in self._buckets.items()],
+        )
+        self._conn.commit()
+        self._usage = {}
+        self._buckets = {}
+
+    def flush(self):
+        """Write the usage recorded since the last write"""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Write the pending usage and close the database"""
+        atexit.unregister(self.close)
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush()
+            self._conn.close()
+            self._conn = None
+
+
+class _Provider:
+    def __init__(self, name, rate, burst, daily, ledger):
+        saved = ledger.bucket(name) if ledger else None
+        self.name = name
+        self.daily = daily
+        self.bucket = TokenBucket(rate, burst, *(saved or ()))
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.calls = ledger.usage(name)[0] if ledger else 0
+        self.day = QuotaLedger.today()
+        self.consecutive_throttles = 0
+
+
+def _status(obj):
+    return getattr(obj, "status_code", None)
+
+
+def _retry_after(obj):
+    response = obj if hasattr(obj, "headers") else getattr(obj, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class Scheduler:
+    def __init__(
+        self, rates=None, ledger=None, max_wait=120.0, retries=3, backoff_max=60.0
+    ):
+        """
+        :param rates: Per-provider {"rate", "burst", "daily"} merged over
+            DEFAULT_RATES.
+        :param ledger: Optional QuotaLedger persisting usage and buckets.
+        :param max_wait: Maximum seconds a call waits for a token.
+        :param retries: Retries of a call answered with 429.
+        :param backoff_max: Upper bound of the pause after a 429 in seconds.
+        """
+        self.rates = {name: dict(rate) for name, rate in DEFAULT_RATES.items()}
+        for name, rate in (rates or {}).items():
+            self.rates.setdefault(name, dict(FALLBACK_RATE)).update(rate)
+        self.ledger = ledger
+        self.max_wait = max_wait
+        self.retries = retries
+        self.backoff_max = backoff_max
+        self._providers = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    def _provider(self, name):
+        with self._lock:
+            provider = self._providers.get(name)
+            if provider is None:
+                rate = self.rates.get(name) or FALLBACK_RATE
+                provider = _Provider(
+                    name, rate["rate"], rate["burst"], rate["daily"], self.ledger
+                )
+                self._providers[name] = provider
+            return provider
+
+    def _ticket(self, provider, level):
+        level = _priority.get() if level is None else level
+        ticket = (level, next(self._sequence))
+        with provider.condition:
+            heapq.heappush(provider.waiting, ticket)
+        return ticket
+
+    def _leave(self, provider, ticket):
+        with provider.condition:
+            provider.waiting.remove(ticket)
+            heapq.heapify(provider.waiting)
+            provider.condition.notify_all()
+
+    def _take(self, provider, ticket):
+        """
+        Take a token for a waiting ticket if it is its turn.
+
+        :return: 0 when the token was taken, otherwise the estimated seconds
+            until the ticket's turn.
+        :raises RateLimited: When the daily quota is used up.
+        """
+        with provider.condition:
+            if provider.day != QuotaLedger.today():
+                provider.day, provider.calls = QuotaLedger.today(), 0
+            if provider.daily is not None and provider.calls >= provider.daily:
+                raise RateLimited(
+                    f"{provider.name} daily quota of {provider.daily} calls used up"
+                )
+            wait = provider.bucket.wait_time()
+            if provider.waiting[0] == ticket and wait <= 0:
+                provider.bucket.take()
+                provider.calls += 1
+                return 0.0
+            ahead = sum(1 for other in provider.waiting if other < ticket)
+            return max(wait, 1e-3) + ahead / provider.bucket.rate
+
+    def _taken(self, provider):
+        if self.ledger is not None:
+            self.ledger.record(provider.name, provider.bucket, calls=1)
+
+    def acquire(self, name, level=None):
+        """
+        Wait for a token of a provider.
+
+        Waiters are served lowest priority value first, then in arrival order.
+
+        :param name: Provider name.
+        :param level: Priority, defaults to the one set with priority().
+        :raises RateLimited: When the daily quota is used up or no token came
+            within max_wait seconds.
+        """
+        provider = self._provider(name)
+        ticket = self._ticket(provider, level)
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while True:
+                wait = self._take(provider, ticket)
+                if not wait:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RateLimited(
+                        f"No {name} call slot within {self.max_wait:.0f}s"
+                    )
+                with provider.condition:
+                    # Woken early when the head of the queue changes
+                    provider.condition.wait(min(wait, remaining))
+        finally:
+            self._leave(provider, ticket)
+        self._taken(provider)
+
+    async def acquire_async(self, name, level=None):
+        """
+        Coroutine version of acquire(), sharing the same queue and buckets.
+
+        Cancelling the waiting task removes it from the queue.
+        """
+        import asyncio
+
+        provider = self._provider(name)
+        ticket = self._ticket(provider, level)
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while True:
+                wait = self._take(provider, ticket)
+                if not wait:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RateLimited(
+                        f"No {name} call slot within {self.max_wait:.0f}s"
+                    )
+                await asyncio.sleep(min(wait, remaining))
+        finally:
+            self._leave(provider, ticket)
+        self._taken(provider)
+
+    def throttled(self, name, retry_after=None):
+        """
+        Pause a provider after a 429 response.
+
+        :param retry_after: Seconds from the Retry-After header, if any.
+        """
+        provider = self._provider(name)
+        with provider.condition:
+            provider.consecutive_throttles += 1
+            pause = retry_after
+            if pause is None:
+                pause = min(self.backoff_max, 2**provider.consecutive_throttles)
+            provider.bucket.block(pause)
+            provider.condition.notify_all()
+        logger.warning(f"{name} rate limited, pausing calls for {pause:.1f}s")
+        if self.ledger is not None:
+            self.ledger.record(name, provider.bucket, throttled=1)
+
+    def call(self, name, function, level=None):
+        """
+        Call function() once a token of the provider is available.
+
+        Responses and exceptions with status_code 429 pause the provider and
+        are retried up to `retries` times; the last one is returned or raised
+        unchanged for the caller's usual error handling.
+
+        :param name: Provider name.
+        :param function: Callable making one request.
+        :param level: Priority, defaults to the one set with priority().
+        """
+        for attempt in range(self.retries + 1):
+            self.acquire(name, level)
+            try:
+                result = function()
+            except Exception as e:
+                if _status(e) != 429:
+                    raise
+                self.throttled(name, _retry_after(e))
+                if attempt == self.retries:
+                    raise
+                continue
+            if _status(result) == 429:
+                self.throttled(name, _retry_after(result))
+                if attempt < self.retries:
+                    continue
+            else:
+                self._provider(name).consecutive_throttles = 0
+            return result
+
+    async def call_async(self, name, function, level=None):
+        """
+        Coroutine version of call(): await function() once a token of the
+        provider is available, with the same 429 handling.
+        """
+        for attempt in range(self.retries + 1):
+            await self.acquire_async(name, level)
+            try:
+                result = await function()
+            except Exception as e:
+                if _status(e) != 429:
+                    raise
+                self.throttled(name, _retry_after(e))
+                if attempt == self.retries:
+                    raise
+                continue
+            if _status(result) == 429:
+                self.throttled(name, _retry_after(result))
+                if attempt < self.retries:
+                    continue
+            else:
+                self._provider(name).consecutive_throttles = 0
+            return result
+
+    def stats(self):
+        """Tokens, waiting callers and today's calls per provider"""
+        stats = {}
+        for name in list(self._providers):
+            provider = self._provider(name)
+            with provider.condition:
+                stats[name] = {
+                    "tokens": round(provider.bucket.tokens, 2),
+                    "waiting": len(provider.waiting),
+                    "calls_today": provider.calls,
+                    "daily": provider.daily,
+                }
+        return stats
+
+
+# Global variables
+_options = {"ledger_path": "cache/quota.sqlite"}
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def configure(ledger_path=None, **options):
+    """
+    Replace the shared scheduler.
+
+    :param ledger_path: SQLite file of the quota ledger, None to keep the
+        current one, "" to not persist.
+    :param options: Passed to Scheduler.
+    """
+    global _scheduler
+
+    with _scheduler_lock:
+        if ledger_path is not None:
+            _options["ledger_path"] = ledger_path
+        _options.update(options)
+        if _scheduler is not None and _scheduler.ledger is not None:
+            _scheduler.ledger.flush()
+        _scheduler = None
+
+
+def scheduler():
+    """Return the shared scheduler"""
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            options = dict(_options)
+            path = options.pop("ledger_path")
+            _scheduler = Scheduler(
+                ledger=QuotaLedger(path) if path else None, **options
+            )
+        return _scheduler
+
+
+def call(name, function, level=None):
+    """Call function() through the shared scheduler, see Scheduler.call"""
+    return scheduler().call(name, function, level)
+
+
+async def call_async(name, function, level=None):
+    """Await function() through the shared scheduler, see Scheduler.call_async"""
+    return await scheduler().call_async(name, function, level)
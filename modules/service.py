@@ -0,0 +1,201 @@
+"""Shared analysis backend for the HTTP API
+
+One AnalysisService keeps the fetchers, caches and AI engine warm for every
+client. Identical requests that arrive while one is in flight are coalesced:
+they wait for the same result instead of repeating the fetches and the LLM
+call.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import modules.logger as logger
+import modules.scheduler as scheduler
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time.
+
+    Callers asking for a key that is already being computed get the Future of
+    the running call instead of starting another one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def submit(self, key, executor, function, *args):
+        """
+        Return (future, coalesced) for a key.
+
+        :param executor: Executor running function(*args) when no call with
+            the same key is in flight.
+        :return: Tuple (Future, whether an in-flight call was joined).
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                return future, True
+            future = executor.submit(function, *args)
+            self._flights[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future, False
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+
+class AnalysisService:
+    """
+    Gather and analyze symbols on a worker pool with request coalescing.
+
+    Requests are keyed by (symbol, days, refresh). Interactive requests run
+    at interactive scheduler priority, batch requests below it.
+    """
+
+    def __init__(self, runner, workers=8, cache=None, timeout=300):
+        """
+        :param runner: BatchRunner providing analyze_symbol().
+        :param workers: Number of analyses running at the same time.
+        :param cache: Optional ResponseCache whose counters are exported.
+        :param timeout: Seconds a request waits for its analysis.
+        """
+        self.runner = runner
+        self.cache = cache
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="service"
+        )
+        self.flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0,
+            "coalesced": 0,
+            "analyses": 0,
+            "errors": 0,
+            "analysis_seconds": 0.0,
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def _analyze(self, symbol, days, refresh, level):
+        start = time.perf_counter()
+        try:
+            record = scheduler.run_at(
+                level, self.runner.analyze_symbol, symbol, days, refresh
+            )
+        except Exception as e:
+            logger.error(f"Analysis of {symbol} failed: {str(e)}")
+            self._count("errors")
+            record = self.runner._error_record(symbol, days, e)
+        else:
+            analysis = record.get("analysis")
+            if not isinstance(analysis, dict) or analysis.get("signal") == "ERROR":
+                self._count("errors")
+        self._count("analyses")
+        self._count("analysis_seconds", time.perf_counter() - start)
+        return record
+
+    def submit(self, symbol, days=7, refresh=False, level=scheduler.INTERACTIVE):
+        """
+        Start or join the analysis of a symbol.
+
+        :return: Future resolving to the record of BatchRunner.analyze_symbol.
+        """
+        symbol = symbol.strip().upper()
+        self._count("requests")
+        future, coalesced = self.flights.submit(
+            (symbol, days, refresh),
+            self.executor,
+            self._analyze,
+            symbol,
+            days,
+            refresh,
+            level,
+        )
+        if coalesced:
+            self._count("coalesced")
+        return future
+
+    def analyze(self, symbol, days=7, refresh=False):
+        """Analyze one symbol at interactive priority and return its record"""
+        return self.submit(symbol, days, refresh).result(timeout=self.timeout)
+
+    def analyze_many(self, symbols, days=7, refresh=False):
+        """
+        Analyze several symbols at batch priority.
+
+        :return: List of records in the order of `symbols`.
+        """
+        futures = [
+            self.submit(symbol, days, refresh, level=scheduler.BATCH)
+            for symbol in symbols
+        ]
+        deadline = time.monotonic() + self.timeout
+        return [
+            future.result(timeout=max(0.0, deadline - time.monotonic()))
+            for future in futures
+        ]
+
+    def metrics(self):
+        """
+        Snapshot of the service counters, cache counters and scheduler state.
+
+        :return: Dict with "service", "cache" and "providers" sections.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        counters["in_flight"] = self.flights.in_flight()
+        return {
+            "service": counters,
+            "cache": self.cache.stats() if self.cache is not None else {},
+            "providers": scheduler.scheduler().stats(),
+        }
+
+    def prometheus(self):
+        """Render metrics() in the Prometheus text exposition format"""
+        metrics = self.metrics()
+        service = metrics["service"]
+        lines = [
+            "# TYPE analyzer_requests_total counter",
+            f"analyzer_requests_total {service['requests']}",
+            "# TYPE analyzer_coalesced_total counter",
+            f"analyzer_coalesced_total {service['coalesced']}",
+            "# TYPE analyzer_analyses_total counter",
+            f"analyzer_analyses_total {service['analyses']}",
+            "# TYPE analyzer_errors_total counter",
+            f"analyzer_errors_total {service['errors']}",
+            "# TYPE analyzer_analysis_seconds_total counter",
+            f"analyzer_analysis_seconds_total {service['analysis_seconds']:.3f}",
+            "# TYPE analyzer_in_flight gauge",
+            f"analyzer_in_flight {service['in_flight']}",
+            "# TYPE analyzer_cache_events_total counter",
+        ]
+        for endpoint, stats in sorted(metrics["cache"].items()):
+            for event, value in sorted(stats.items()):
+                lines.append(
+                    f'analyzer_cache_events_total{{endpoint="{endpoint}",'
+                    f'event="{event}"}} {value}'
+                )
+        lines.append("# TYPE analyzer_provider_calls_today gauge")
+        for provider, stats in sorted(metrics["providers"].items()):
+            lines.append(
+                f'analyzer_provider_calls_today{{provider="{provider}"}} '
+                f"{stats['calls_today']}"
+            )
+        lines.append("# TYPE analyzer_provider_waiting gauge")
+        for provider, stats in sorted(metrics["providers"].items()):
+            lines.append(
+                f'analyzer_provider_waiting{{provider="{provider}"}} {stats["waiting"]}'
+            )
+        return "\n".join(lines) + "\n"
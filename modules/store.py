@@ -0,0 +1,443 @@
+"""Local history of fetched articles and sentiment with incremental sync"""
+
+import datetime
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import modules.logger as logger
+from modules.gatherer import (
+    ANALYST_TRENDS,
+    FINVIZ,
+    INSIDER_SENTIMENT,
+    NEWS_API,
+    Gatherer,
+)
+
+_TREND_COLUMNS = ("strongBuy", "buy", "hold", "sell", "strongSell")
+
+
+class HistoryStore:
+    """
+    SQLite time series of articles, insider MSPR rows and recommendation
+    trends, keyed by symbol and date.
+
+    Rows are upserted, so fetching overlapping windows never duplicates data.
+    The store also remembers, per symbol and source, which window has been
+    synced and when, so callers only need to fetch what is missing.
+    """
+
+    def __init__(self, path="cache/history.sqlite"):
+        """
+        :param path: SQLite database file, or ":memory:".
+        """
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS articles (
+                    symbol TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    published TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (symbol, source, title)
+                );
+                CREATE INDEX IF NOT EXISTS articles_published
+                    ON articles (symbol, source, published);
+                CREATE TABLE IF NOT EXISTS insider_sentiment (
+                    symbol TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    year INTEGER NOT NULL,
+                    month INTEGER NOT NULL,
+                    change REAL,
+                    mspr REAL,
+                    PRIMARY KEY (symbol, period)
+                );
+                CREATE TABLE IF NOT EXISTS recommendation_trends (
+                    symbol TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    strongBuy INTEGER,
+                    buy INTEGER,
+                    hold INTEGER,
+                    sell INTEGER,
+                    strongSell INTEGER,
+                    PRIMARY KEY (symbol, period)
+                );
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    symbol TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    window_start TEXT NOT NULL,
+                    synced_at REAL NOT NULL,
+                    PRIMARY KEY (symbol, source)
+                );
+                """
+            )
+            self._conn.commit()
+
+    def _write(self, sql, rows):
+        with self._lock:
+            self._conn.executemany(sql, rows)
+            self._conn.commit()
+
+    def _read(self, sql, args):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    # Articles
+
+    def add_articles(self, symbol, articles):
+        """
+        Upsert article dicts.
+
+        Articles without a date, like Finviz and Yahoo headlines, get today's
+        the first time they are seen. Re-fetching them keeps that date and
+        only updates the content and url.
+        """
+        now = time.time()
+        today = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        self._write(
+            "INSERT INTO articles "
+            "(symbol, source, title, content, url, published, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (symbol, source, title) DO UPDATE SET "
+            "content = excluded.content, url = excluded.url, "
+            "fetched_at = excluded.fetched_at",
+            [
+                (
+                    symbol,
+                    article["source"],
+                    article["title"],
+                    article.get("content") or article["title"],
+                    article.get("url") or "",
+                    article.get("published") or today,
+                    now,
+                )
+                for article in articles
+            ],
+        )
+
+    def articles(self, symbol, source, since, limit=None):
+        """
+        Stored articles of a source published on or after `since`.
+
+        :return: List of article dicts, newest first.
+        """
+        rows = self._read(
+            "SELECT title, content, url, source, published FROM articles "
+            "WHERE symbol = ? AND source = ? AND published >= ? "
+            "ORDER BY published DESC LIMIT ?",
+            (symbol, source, since, -1 if limit is None else limit),
+        )
+        return [dict(row) for row in rows]
+
+    def latest_article(self, symbol, source):
+        """Publish date of the newest stored article, or None"""
+        row = self._read(
+            "SELECT MAX(published) AS latest FROM articles "
+            "WHERE symbol = ? AND source = ?",
+            (symbol, source),
+        )[0]
+        return row["latest"]
+
+    # Insider sentiment
+
+    def add_insider_sentiment(self, symbol, rows):
+        """Upsert Finnhub monthly MSPR rows"""
+        self._write(
+            "INSERT OR REPLACE INTO insider_sentiment "
+            "(symbol, period, year, month, change, mspr) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    symbol,
+                    f"{row['year']:04d}-{row['month']:02d}",
+                    row["year"],
+                    row["month"],
+                    row.get("change"),
+                    row.get("mspr"),
+                )
+                for row in rows
+            ],
+        )
+
+    def insider_sentiment(self, symbol, from_date, to_date=None):
+        """
+        Stored MSPR rows of the months overlapping [from_date, to_date].
+
+        :return: Dict shaped like the Finnhub response.
+        """
+        to_date = to_date or "9999-12-31"
+        rows = self._read(
+            "SELECT symbol, year, month, change, mspr FROM insider_sentiment "
+            "WHERE symbol = ? AND period >= ? AND period <= ? ORDER BY period",
+            (symbol, from_date[:7], to_date[:7]),
+        )
+        return {"data": [dict(row) for row in rows], "symbol": symbol}
+
+    def latest_insider_period(self, symbol):
+        """Newest stored MSPR month as YYYY-MM, or None"""
+        row = self._read(
+            "SELECT MAX(period) AS latest FROM insider_sentiment WHERE symbol = ?",
+            (symbol,),
+        )[0]
+        return row["latest"]
+
+    # Recommendation trends
+
+    def add_recommendation_trends(self, symbol, rows):
+        """Upsert Finnhub monthly recommendation trend rows"""
+        self._write(
+            "INSERT OR REPLACE INTO recommendation_trends "
+            "(symbol, period, strongBuy, buy, hold, sell, strongSell) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (symbol, row["period"], *(row.get(column) for column in _TREND_COLUMNS))
+                for row in rows
+            ],
+        )
+
+    def recommendation_trends(self, symbol, since=None):
+        """
+        Stored recommendation trends, newest period first.
+
+        :return: List of dicts shaped like the Finnhub response.
+        """
+        rows = self._read(
+            "SELECT symbol, period, strongBuy, buy, hold, sell, strongSell "
+            "FROM recommendation_trends WHERE symbol = ? AND period >= ? "
+            "ORDER BY period DESC",
+            (symbol, since or ""),
+        )
+        return [dict(row) for row in rows]
+
+    # Sync bookkeeping
+
+    def sync_state(self, symbol, source):
+        """Return {"window_start", "synced_at"} of a symbol and source, or None"""
+        rows = self._read(
+            "SELECT window_start, synced_at FROM sync_state "
+            "WHERE symbol = ? AND source = ?",
+            (symbol, source),
+        )
+        return dict(rows[0]) if rows else None
+
+    def mark_synced(self, symbol, source, window_start, refreshed):
+        """
+        Record a sync.
+
+        :param window_start: Oldest date now covered; the stored window only
+            ever grows.
+        :param refreshed: Whether the newest data was fetched, which resets
+            the sync age.
+        """
+        state = self.sync_state(symbol, source)
+        if state is not None:
+            window_start = min(window_start, state["window_start"])
+        synced_at = time.time() if refreshed or state is None else state["synced_at"]
+        self._write(
+            "INSERT OR REPLACE INTO sync_state "
+            "(symbol, source, window_start, synced_at) VALUES (?, ?, ?, ?)",
+            [(symbol, source, window_start, synced_at)],
+        )
+
+
+class HistoryGatherer(Gatherer):
+    """
+    Gatherer that serves every source from a HistoryStore.
+
+    Before reading, each source is synced incrementally: only the part of the
+    window older than what is stored and the part newer than the latest stored
+    item are fetched, and the newer part at most once every `min_interval`
+    seconds. Widening the window from 7 to 30 days therefore costs one small
+    fetch of the missing older range. With offline=True nothing is fetched.
+    """
+
+    def __init__(
+        self,
+        fetcher,
+        finnhub_client,
+        store,
+        offline=False,
+        min_interval=15 * 60,
+        max_stored_articles=None,
+        **kwargs,
+    ):
+        """
+        :param store: HistoryStore to sync into and read from.
+        :param offline: Serve from the store only, without network calls.
+        :param min_interval: Seconds before the newest data is fetched again.
+        :param max_stored_articles: Maximum articles returned per source,
+            the gatherer's max_articles by default.
+        :param kwargs: Passed to Gatherer.
+        """
+        super().__init__(fetcher, finnhub_client, **kwargs)
+        self.store = store
+        self.offline = offline
+        self.min_interval = min_interval
+        if max_stored_articles is None:
+            max_stored_articles = self.max_articles
+        self.max_stored_articles = max_stored_articles
+
+    def _tasks(self, symbol, days):
+        now = datetime.datetime.now()
+        from_date = (now - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
+        to_date = now.strftime("%Y-%m-%d")
+        return {
+            NEWS_API: lambda: self._news_api(symbol, from_date),
+            FINVIZ: lambda: self._finviz(symbol, from_date),
+            INSIDER_SENTIMENT: lambda: self._insider_sentiment(
+                symbol, from_date, to_date
+            ),
+            ANALYST_TRENDS: lambda: self._analyst_trends(symbol),
+        }
+
+    def _plan(self, symbol, source, from_date):
+        """
+        Decide what to fetch for a source.
+
+        :return: Tuple (fetch older range, fetch newer range, sync state).
+        """
+        if self.offline:
+            return False, False, None
+        state = self.store.sync_state(symbol, source)
+        if state is None:
+            return True, False, None
+        older = from_date < state["window_start"]
+        newer = time.time() - state["synced_at"] >= self.min_interval
+        return older, newer, state
+
+    def _sync(self, symbol, source, from_date, fetches, refreshed):
+        """Run fetch callables, store results and record the sync"""
+        for fetch, store in fetches:
+            success, payload = fetch()
+            if not success:
+                return False, payload
+            store(payload)
+        if fetches:
+            self.store.mark_synced(symbol, source, from_date, refreshed)
+        return True, None
+
+    def _serve(self, name, sync_result, stored, empty):
+        success, error = sync_result
+        if not success:
+            if stored != empty:
+                logger.warning(f"Sync of {name} failed, serving stored data: {error}")
+                return True, stored
+            return False, error
+        return True, stored
+
+    def _news_api(self, symbol, from_date):
+        older, newer, state = self._plan(symbol, NEWS_API, from_date)
+        fetches = []
+        store = lambda articles: self.store.add_articles(symbol, articles)  # noqa
+        if older:
+            window_end = state["window_start"] if state else None
+            fetches.append(
+                (
+                    lambda: self.fetcher.fetch_news_api(
+                        symbol,
+                        None,
+                        self.max_articles,
+                        from_date=from_date,
+                        to_date=window_end,
+                    ),
+                    store,
+                )
+            )
+        if newer:
+            latest = self.store.latest_article(symbol, "NewsAPI")
+            fetches.append(
+                (
+                    lambda: self.fetcher.fetch_news_api(
+                        symbol,
+                        None,
+                        self.max_articles,
+                        from_date=latest or state["window_start"],
+                        # A delta sync wants the newest, not the most relevant
+                        sort_by="publishedAt",
+                    ),
+                    store,
+                )
+            )
+        result = self._sync(symbol, NEWS_API, from_date, fetches, newer or not state)
+        stored = self.store.articles(
+            symbol, "NewsAPI", from_date, self.max_stored_articles
+        )
+        return self._serve(NEWS_API, result, stored, [])
+
+    def _finviz(self, symbol, from_date):
+        # Finviz has no date filter, a fetch always returns the latest headlines
+        older, newer, state = self._plan(symbol, FINVIZ, from_date)
+        fetches = []
+        if older or newer:
+            fetches.append(
+                (
+                    lambda: self.fetcher.fetch_finviz_news(symbol, self.max_articles),
+                    lambda articles: self.store.add_articles(symbol, articles),
+                )
+            )
+        result = self._sync(symbol, FINVIZ, from_date, fetches, True)
+        stored = self.store.articles(
+            symbol, "Finviz", from_date, self.max_stored_articles
+        )
+        return self._serve(FINVIZ, result, stored, [])
+
+    def _insider_sentiment(self, symbol, from_date, to_date):
+        older, newer, state = self._plan(symbol, INSIDER_SENTIMENT, from_date)
+        fetches = []
+        store = lambda payload: self.store.add_insider_sentiment(  # noqa
+            symbol, payload.get("data", []) if isinstance(payload, dict) else payload
+        )
+        if older:
+            window_end = state["window_start"] if state else to_date
+            fetches.append(
+                (
+                    lambda: self.finnhub_client.get_stock_insider_sentiment(
+                        symbol, from_date, window_end
+                    ),
+                    store,
+                )
+            )
+        if newer:
+            latest = self.store.latest_insider_period(symbol)
+            start = f"{latest}-01" if latest else state["window_start"]
+            fetches.append(
+                (
+                    lambda: self.finnhub_client.get_stock_insider_sentiment(
+                        symbol, start, to_date
+                    ),
+                    store,
+                )
+            )
+        result = self._sync(
+            symbol, INSIDER_SENTIMENT, from_date, fetches, newer or not state
+        )
+        stored = self.store.insider_sentiment(symbol, from_date, to_date)
+        return self._serve(
+            INSIDER_SENTIMENT, result, stored, {"data": [], "symbol": symbol}
+        )
+
+    def _analyst_trends(self, symbol):
+        # Finnhub returns the whole trend history, there is no range to limit
+        older, newer, _ = self._plan(symbol, ANALYST_TRENDS, "")
+        fetches = []
+        if older or newer:
+            fetches.append(
+                (
+                    lambda: self.finnhub_client.get_stock_recommendations_trends(
+                        symbol
+                    ),
+                    lambda rows: self.store.add_recommendation_trends(symbol, rows),
+                )
+            )
+        result = self._sync(symbol, ANALYST_TRENDS, "", fetches, True)
+        stored = self.store.recommendation_trends(symbol)
+        return self._serve(ANALYST_TRENDS, result, stored, [])
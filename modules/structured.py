@@ -0,0 +1,355 @@
+"""Tolerant parsing and schema validation of the AI's JSON answers
+
+loads() reads the first JSON object (or array) of a response. Well-formed
+JSON takes the json.loads fast path; anything else is repaired in a single
+pass over its tokens, fixing what language models commonly get wrong: code
+fences and preambles, trailing or missing commas, single quotes, unquoted
+keys, Python literals, raw newlines and stray quotes inside strings, comments,
+and output truncated by max_tokens.
+
+Schema validates the parsed fields and coerces near misses ("Strong Buy",
+"8/10"), and reports which fields are still missing or invalid, so only those
+need to be asked for again.
+"""
+
+import json
+import re
+
+SIGNALS = ("STRONG BUY", "BUY", "HOLD", "SELL", "STRONG SELL")
+
+_LITERALS = {
+    "true": "true",
+    "false": "false",
+    "null": "null",
+    "True": "true",
+    "False": "false",
+    "None": "null",
+    "NaN": "null",
+    "Infinity": "null",
+    "-Infinity": "null",
+    "undefined": "null",
+}
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_WORD = re.compile(r"[^\s,:{}\[\]\"']+")
+_ESCAPES = set('"\\/bfnrtu')
+_CONTROL = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CLOSING = {"{": "}", "[": "]"}
+
+
+def _string(text, i, quote):
+    """
+    Read a string starting after its opening quote.
+
+    A quote only closes the string when what follows it can follow a JSON
+    string, is a comment, or is a quote on the next line (a missing comma),
+    otherwise it is taken as an unescaped quote inside the string.
+
+    :return: (JSON string literal, index after the closing quote).
+    """
+    out = ['"']
+    n = len(text)
+    while i < n:
+        char = text[i]
+        if char == "\\" and i + 1 < n:
+            following = text[i + 1]
+            if following in _ESCAPES:
+                out.append(text[i : i + 2])
+            elif following == "'":
+                out.append("'")
+            else:
+                out.append("\\\\")
+                out.append(_CONTROL.get(following, following))
+            i += 2
+            continue
+        if char == quote:
+            j = i + 1
+            while j < n and text[j].isspace():
+                j += 1
+            if (
+                j == n
+                or text[j] in ",:}]"
+                or text.startswith(("//", "/*"), j)
+                or (text[j] in "\"'" and "\n" in text[i + 1 : j])
+            ):
+                out.append('"')
+                return "".join(out), i + 1
+            out.append('\\"')
+        elif char == '"':
+            out.append('\\"')
+        elif char in _CONTROL:
+            out.append(_CONTROL[char])
+        elif char < " ":
+            out.append(f"\\u{ord(char):04x}")
+        else:
+            out.append(char)
+        i += 1
+    # Truncated inside the string
+    out.append('"')
+    return "".join(out), n
+
+
+def _tokens(text, start):
+    """Yield the JSON tokens of text from start: punctuation or a value"""
+    i = start
+    n = len(text)
+    while i < n:
+        char = text[i]
+        if char.isspace():
+            i += 1
+        elif char in "{}[],:":
+            yield char
+            i += 1
+        elif char == '"' or char == "'":
+            token, i = _string(text, i + 1, char)
+            yield token
+        elif text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+        else:
+            match = _WORD.match(text, i)
+            if match is None:
+                # No token starts with this character, skip it
+                i += 1
+                continue
+            word = match.group()
+            i = match.end()
+            if word in _LITERALS:
+                yield _LITERALS[word]
+            elif _NUMBER.fullmatch(word.lstrip("+")):
+                yield word.lstrip("+")
+            else:
+                yield json.dumps(word)
+
+
+def repair(text, start=0):
+    """
+    Rewrite the JSON value starting at text[start] as valid JSON.
+
+    Text after the value is ignored, and a truncated value is closed.
+    """
+    out = []
+    # Per open container: "key", "colon", "value" or "next"
+    stack = []
+    states = []
+    for token in _tokens(text, start):
+        if not stack:
+            if token not in _CLOSING:
+                continue
+            out.append(token)
+            stack.append(token)
+            states.append("key" if token == "{" else "value")
+            continue
+
+        state = states[-1]
+        if token in "}]":
+            if state == "colon":
+                out.append(":null")
+            elif state == "value" and out[-1] == ":":
+                out.append("null")
+            if out[-1] == ",":
+                out.pop()
+            out.append(_CLOSING[stack.pop()])
+            states.pop()
+            if not stack:
+                break
+            states[-1] = "next"
+            continue
+        if token == ",":
+            if state == "next":
+                out.append(",")
+                states[-1] = "key" if stack[-1] == "{" else "value"
+            elif state == "colon" or (state == "value" and out[-1] == ":"):
+                # A key without a value
+                out.append("null," if state == "value" else ":null,")
+                states[-1] = "key"
+            continue
+        if token == ":":
+            if state == "colon":
+                out.append(":")
+                states[-1] = "value"
+            continue
+
+        # A value: string, number, literal or an opening bracket
+        if state == "next":
+            out.append(",")
+            state = "key" if stack[-1] == "{" else "value"
+        if state == "colon":
+            out.append(":")
+            state = "value"
+        if state == "key":
+            if token not in _CLOSING:
+                out.append(token if token.startswith('"') else json.dumps(token))
+                states[-1] = "colon"
+                continue
+            # A container without a key, keep it under an empty one
+            out.append('"":')
+        out.append(token)
+        states[-1] = "next"
+        if token in _CLOSING:
+            stack.append(token)
+            states.append("key" if token == "{" else "value")
+
+    # Close what the truncation left open
+    while stack:
+        state = states.pop()
+        if state == "colon":
+            out.append(":null")
+        elif state == "value" and out[-1] == ":":
+            out.append("null")
+        if out[-1] == ",":
+            out.pop()
+        out.append(_CLOSING[stack.pop()])
+    return "".join(out)
+
+
+def loads(text, container="{"):
+    """
+    Parse the first JSON object, or array with container="[", of a text.
+
+    :return: The parsed value, or None when the text holds none.
+    """
+    start = text.find(container)
+    if start == -1:
+        return None
+    end = text.rfind(_CLOSING[container]) + 1
+    if end > start:
+        try:
+            return json.loads(text[start:end])
+        except ValueError:
+            pass
+    try:
+        return json.loads(repair(text, start))
+    except Exception:
+        # Beyond repair; callers ask again or report the answer as invalid
+        return None
+
+
+def has_json(text):
+    """True when a text holds a JSON object or array, repaired if needed"""
+    return bool(text) and (loads(text) is not None or loads(text, "[") is not None)
+
+
+class Enum:
+    def __init__(self, choices):
+        self.choices = tuple(choices)
+        self._lookup = {choice.replace(" ", ""): choice for choice in choices}
+
+    def coerce(self, value):
+        if not isinstance(value, str):
+            raise ValueError(f"expected one of {', '.join(self.choices)}")
+        key = re.sub(r"[\s_-]+", "", value).upper()
+        if key not in self._lookup:
+            raise ValueError(f"expected one of {', '.join(self.choices)}")
+        return self._lookup[key]
+
+    def describe(self):
+        return "one of " + ", ".join(f'"{choice}"' for choice in self.choices)
+
+
+class Integer:
+    def __init__(self, minimum, maximum):
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def coerce(self, value):
+        if isinstance(value, str):
+            # "7", "7/10", "8 out of 10"
+            match = re.match(r"\s*(\d+(?:\.\d+)?)", value)
+            value = float(match.group(1)) if match else None
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError("expected an integer")
+        value = int(round(value))
+        if not self.minimum <= value <= self.maximum:
+            raise ValueError(f"expected {self.minimum} to {self.maximum}")
+        return value
+
+    def describe(self):
+        return f"integer from {self.minimum} to {self.maximum}"
+
+
+class String:
+    def coerce(self, value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError("expected a non-empty string")
+        return value.strip()
+
+    def describe(self):
+        return "string"
+
+
+class StringList:
+    def __init__(self, min_items=0):
+        self.min_items = min_items
+
+    def coerce(self, value):
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list):
+            raise ValueError("expected a list of strings")
+        items = [str(item).strip() for item in value if item is not None]
+        items = [item for item in items if item]
+        if len(items) < self.min_items:
+            raise ValueError(f"expected at least {self.min_items} strings")
+        return items
+
+    def describe(self):
+        return "list of strings"
+
+
+class Schema:
+    """
+    Validator of a JSON object compiled from {field: type}.
+
+    Fields outside the schema are kept as they are.
+    """
+
+    def __init__(self, fields):
+        self.fields = dict(fields)
+        self._checks = tuple((name, kind.coerce) for name, kind in self.fields.items())
+
+    def validate(self, value):
+        """
+        :return: Tuple (valid fields, names of missing or invalid fields).
+        """
+        if not isinstance(value, dict):
+            return {}, [name for name, _ in self._checks]
+        valid = {k: v for k, v in value.items() if k not in self.fields}
+        missing = []
+        for name, coerce in self._checks:
+            try:
+                valid[name] = coerce(value[name])
+            except (KeyError, ValueError):
+                missing.append(name)
+        return valid, missing
+
+    def describe(self, names=None):
+        """Lines of "name": type, for asking the model for some fields"""
+        return "\n".join(
+            f'"{name}": {self.fields[name].describe()}'
+            for name in (names or self.fields)
+        )
+
+
+ANALYSIS = Schema(
+    {
+        "signal": Enum(SIGNALS),
+        "confidence": Integer(1, 10),
+        "reasons": StringList(min_items=1),
+        "risks": StringList(),
+        "summary": String(),
+    }
+)
+
+
+def parse_analysis(text):
+    """
+    Parse and validate the analysis JSON object of a response.
+
+    :return: Tuple (valid fields, names of missing or invalid fields).
+    """
+    return ANALYSIS.validate(loads(text))
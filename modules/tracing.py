@@ -0,0 +1,328 @@
+"""Lightweight tracing of the analysis pipeline
+
+Each stage (fetch, HTML parse, prompt build, LLM call, JSON parse) runs in a
+span recording its duration, the CPU time of its thread, payload bytes and,
+for LLM calls, the prompt and completion tokens reported by the API. Spans nest through a context variable,
+so the fetches started by a gather are children of its span even when they
+run on the Gatherer's pool.
+
+Finished spans are aggregated into per-stage histograms and kept in a bounded
+buffer. They can be exported as Prometheus text (for a node_exporter textfile
+collector or the API server's /metrics) or as OpenTelemetry OTLP/JSON.
+"""
+
+import bisect
+import collections
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+
+# Upper bounds of the duration histogram buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_ATTRIBUTES = ("prompt_tokens", "completion_tokens")
+
+# Global variables
+_current = contextvars.ContextVar("tracing_span", default=None)
+_lock = threading.Lock()
+_finished = collections.deque(maxlen=10000)
+_stats = {}
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+        "thread_id",
+        "cpu_start_ns",
+    )
+
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.error = None
+        self.thread_id = threading.get_ident()
+        self.cpu_start_ns = time.thread_time_ns()
+
+    @property
+    def duration(self):
+        """Duration in seconds, up to now while the span is open"""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes):
+        """Add attributes, e.g. bytes=len(body) or rows=len(data)"""
+        self.attributes.update(attributes)
+
+    def end(self, error=None):
+        """Finish a span made with start_span()"""
+        if self.end_ns is not None:
+            return
+        if error is not None:
+            self.error = type(error).__name__
+        self.end_ns = time.time_ns()
+        if threading.get_ident() == self.thread_id:
+            # CPU time of the span's own thread, work it hands to other
+            # threads is counted in their spans
+            self.attributes["cpu_seconds"] = (
+                time.thread_time_ns() - self.cpu_start_ns
+            ) / 1e9
+        _finish(self)
+
+    def set_usage(self, usage):
+        """Record the token counts of an OpenAI-compatible usage object"""
+        if usage is None:
+            return
+        for name in TOKEN_ATTRIBUTES:
+            value = getattr(usage, name, None)
+            if value is not None:
+                self.attributes[name] = value
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """
+    Time a block as a span, child of the current span if any.
+
+    :param name: Stage name, e.g. "fetch.newsapi" or "llm.call".
+    :param attributes: Initial attributes of the span.
+    """
+    current = Span(name, _current.get(), attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def configure(buffer_size=10000):
+    """
+    Resize the buffer of finished spans, dropping the buffered ones.
+
+    :param buffer_size: Number of finished spans kept for percentiles() and
+        otel_json(). Aggregated stats are not limited.
+    """
+    global _finished
+
+    with _lock:
+        _finished = collections.deque(maxlen=buffer_size)
+
+
+def start_span(name, **attributes):
+    """
+    Open a span, child of the current span, without making it current.
+
+    For spans spanning the lifetime of a generator, which must not change the
+    context of its consumer between yields. Call span.end() when done.
+    """
+    return Span(name, _current.get(), attributes)
+
+
+def current_span():
+    """Return the open span of this context, or None"""
+    return _current.get()
+
+
+def _finish(finished):
+    with _lock:
+        _finished.append(finished)
+        stats = _stats.get(finished.name)
+        if stats is None:
+            stats = _stats[finished.name] = {
+                "count": 0,
+                "errors": 0,
+                "seconds": 0.0,
+                "cpu_seconds": 0.0,
+                "buckets": [0] * (len(BUCKETS) + 1),
+                "bytes": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+            }
+        duration = finished.duration
+        stats["count"] += 1
+        stats["errors"] += finished.error is not None
+        stats["seconds"] += duration
+        stats["buckets"][bisect.bisect_left(BUCKETS, duration)] += 1
+        for name in ("bytes", "cpu_seconds") + TOKEN_ATTRIBUTES:
+            value = finished.attributes.get(name)
+            if isinstance(value, (int, float)):
+                stats[name] += value
+
+
+def stats():
+    """Copy of the aggregated stats per span name"""
+    with _lock:
+        return {
+            name: dict(values, buckets=list(values["buckets"]))
+            for name, values in _stats.items()
+        }
+
+
+def percentiles(name, quantiles=(0.5, 0.95)):
+    """
+    Duration quantiles in seconds of the buffered spans with a name.
+
+    :return: Dict of quantile to seconds, empty when there are no spans.
+    """
+    with _lock:
+        durations = sorted(s.duration for s in _finished if s.name == name)
+    if not durations:
+        return {}
+    return {
+        quantile: durations[min(len(durations) - 1, int(quantile * len(durations)))]
+        for quantile in quantiles
+    }
+
+
+def reset():
+    """Drop all buffered spans and aggregated stats"""
+    with _lock:
+        _finished.clear()
+        _stats.clear()
+
+
+def prometheus_text():
+    """Render the aggregated stats in the Prometheus text exposition format"""
+    lines = [
+        "# HELP pipeline_stage_seconds Duration of pipeline stages",
+        "# TYPE pipeline_stage_seconds histogram",
+    ]
+    all_stats = stats()
+    for name, values in sorted(all_stats.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), values["buckets"]):
+            cumulative += count
+            lines.append(
+                f'pipeline_stage_seconds_bucket{{stage="{name}",le="{bound}"}} '
+                f"{cumulative}"
+            )
+        lines.append(
+            f'pipeline_stage_seconds_sum{{stage="{name}"}} {values["seconds"]:.6f}'
+        )
+        lines.append(
+            f'pipeline_stage_seconds_count{{stage="{name}"}} {values["count"]}'
+        )
+    lines.append("# TYPE pipeline_stage_cpu_seconds_total counter")
+    for name, values in sorted(all_stats.items()):
+        lines.append(
+            f'pipeline_stage_cpu_seconds_total{{stage="{name}"}} '
+            f'{values["cpu_seconds"]:.6f}'
+        )
+    lines.append("# TYPE pipeline_stage_errors_total counter")
+    for name, values in sorted(all_stats.items()):
+        lines.append(
+            f'pipeline_stage_errors_total{{stage="{name}"}} {values["errors"]}'
+        )
+    lines.append("# TYPE pipeline_stage_bytes_total counter")
+    for name, values in sorted(all_stats.items()):
+        if values["bytes"]:
+            lines.append(
+                f'pipeline_stage_bytes_total{{stage="{name}"}} {values["bytes"]}'
+            )
+    lines.append("# TYPE llm_tokens_total counter")
+    for name, values in sorted(all_stats.items()):
+        for kind in TOKEN_ATTRIBUTES:
+            if values[kind]:
+                lines.append(
+                    f'llm_tokens_total{{stage="{name}",kind="{kind[:-7]}"}} '
+                    f"{values[kind]}"
+                )
+    return "\n".join(lines) + "\n"
+
+
+def _otel_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64 bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otel_json(service_name="stock-sentiment-analyzer", drain=False):
+    """
+    Export the buffered spans as an OTLP/JSON ExportTraceServiceRequest.
+
+    :param drain: Remove the exported spans from the buffer.
+    :return: Dict ready for json.dump or a POST to an OTLP/HTTP collector.
+    """
+    with _lock:
+        spans = list(_finished)
+        if drain:
+            _finished.clear()
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {
+                            "key": "service.name",
+                            "value": {"stringValue": service_name},
+                        }
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "modules.tracing"},
+                        "spans": [
+                            {
+                                "traceId": s.trace_id,
+                                "spanId": s.span_id,
+                                "parentSpanId": s.parent_id or "",
+                                "name": s.name,
+                                "kind": 1,
+                                "startTimeUnixNano": str(s.start_ns),
+                                "endTimeUnixNano": str(s.end_ns),
+                                "attributes": [
+                                    {"key": key, "value": _otel_value(value)}
+                                    for key, value in s.attributes.items()
+                                ],
+                                "status": (
+                                    {"code": 2, "message": s.error}
+                                    if s.error
+                                    else {"code": 1}
+                                ),
+                            }
+                            for s in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def _write(path, text):
+    # Write then rename, so a collector never reads a half written file
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_prometheus(path):
+    """Write prometheus_text() to a file, e.g. for a textfile collector"""
+    _write(path, prometheus_text())
+
+
+def write_otel_json(path, drain=True):
+    """Write the buffered spans to a file as OTLP/JSON"""
+    _write(path, json.dumps(otel_json(drain=drain)))
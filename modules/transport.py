@@ -0,0 +1,243 @@
+"""Shared, pooled HTTP transport for all modules
+
+Every module goes through the same keep-alive connection pools instead of
+opening a new TCP+TLS connection per request. Plain HTTP requests use one
+`requests.Session` with a connection pool per host and retries with jittered
+exponential backoff on 5xx responses. 429 responses are returned to the
+caller and handled by the rate limiting in modules/scheduler.py. OpenAI-compatible clients are
+built once per (api key, base url) on top of a pooled `httpx.Client`, using
+HTTP/2 when the `h2` package is installed. Their SDK retries are disabled, so
+that a 429 reaches the scheduler at once instead of being retried outside its
+token bucket; failed connections are still retried by the httpx transport.
+
+requests, httpx and openai are imported when the first client is built, so
+importing this module costs nothing to entry points that never make a call.
+
+The asyncio counterparts build `httpx.AsyncClient` and `AsyncOpenAI` clients
+with the same pool sizes. Those are bound to the event loop they are used in,
+so they are not shared: each async wrapper owns and closes its own.
+"""
+
+import threading
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Global variables
+_config = {
+    "pool_connections": 32,
+    "pool_maxsize": 16,
+    "timeout": 10.0,
+    "llm_timeout": 600.0,
+    "retries": 3,
+    "backoff_factor": 0.5,
+    "backoff_max": 30.0,
+    "backoff_jitter": 0.5,
+    "http2": True,
+}
+_lock = threading.Lock()
+_session = None
+_openai_clients = {}
+
+
+def configure(**options):
+    """
+    Change transport options. Clients built afterwards use the new values.
+
+    :param pool_connections: Number of per-host pools kept alive.
+    :param pool_maxsize: Maximum keep-alive connections per host.
+    :param timeout: Default request timeout in seconds.
+    :param llm_timeout: Read timeout of OpenAI-compatible clients in seconds.
+    :param retries: Retries on connection errors and 5xx responses.
+    :param backoff_factor: Base of the exponential backoff in seconds.
+    :param backoff_max: Upper bound of a single backoff in seconds.
+    :param backoff_jitter: Maximum random seconds added to each backoff.
+    :param http2: Use HTTP/2 for OpenAI-compatible clients when available.
+    """
+    global _session
+
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise ValueError(f"Unknown transport options: {', '.join(sorted(unknown))}")
+
+    with _lock:
+        _config.update(options)
+        if _session is not None:
+            _session.close()
+        _session = None
+        for client in _openai_clients.values():
+            client.close()
+        _openai_clients.clear()
+
+
+def timeout():
+    """Default request timeout in seconds"""
+    return _config["timeout"]
+
+
+def _retry():
+    from urllib3.util.retry import Retry
+
+    options = dict(
+        total=_config["retries"],
+        backoff_factor=_config["backoff_factor"],
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+        respect_retry_after_header=True,
+        # Return the last response instead of raising, callers check status
+        raise_on_status=False,
+    )
+    try:
+        return Retry(
+            backoff_max=_config["backoff_max"],
+            backoff_jitter=_config["backoff_jitter"],
+            **options,
+        )
+    except TypeError:
+        # urllib3 < 2 has no configurable jitter or maximum backoff
+        return Retry(**options)
+
+
+def adapter():
+    """Build an HTTPAdapter with the configured pool sizes and retries"""
+    from requests.adapters import HTTPAdapter
+
+    return HTTPAdapter(
+        pool_connections=_config["pool_connections"],
+        pool_maxsize=_config["pool_maxsize"],
+        max_retries=_retry(),
+    )
+
+
+def mount(session):
+    """Install the pooled, retrying adapter on an existing session"""
+    pooled = adapter()
+    session.mount("https://", pooled)
+    session.mount("http://", pooled)
+    return session
+
+
+def session():
+    """Return the shared requests session"""
+    global _session
+
+    with _lock:
+        if _session is None:
+            import requests
+
+            _session = mount(requests.Session())
+        return _session
+
+
+def get(url, **kwargs):
+    """GET through the shared session with the default timeout"""
+    kwargs.setdefault("timeout", timeout())
+    return session().get(url, **kwargs)
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _httpx_client():
+    try:
+        import httpx
+    except ImportError:
+        return None
+
+    return httpx.Client(
+        transport=httpx.HTTPTransport(
+            retries=_config["retries"],
+            http2=_config["http2"] and _http2_available(),
+            limits=httpx.Limits(
+                max_connections=_config["pool_connections"] * _config["pool_maxsize"],
+                max_keepalive_connections=_config["pool_maxsize"],
+            ),
+        ),
+        timeout=httpx.Timeout(_config["llm_timeout"], connect=_config["timeout"]),
+    )
+
+
+def openai_client(api_key, base_url):
+    """
+    Return the shared OpenAI-compatible client for an API key and base url.
+
+    The SDK does not retry: modules/scheduler.py retries 429 responses
+    within the provider's rate limit, and only connection failures are
+    retried by the transport.
+    """
+    from openai import OpenAI
+
+    key = (api_key, base_url)
+    with _lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            options = dict(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,
+            )
+            http_client = _httpx_client()
+            if http_client is not None:
+                options["http_client"] = http_client
+            client = OpenAI(**options)
+            _openai_clients[key] = client
+        return client
+
+
+def _async_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=_config["pool_connections"] * _config["pool_maxsize"],
+        max_keepalive_connections=_config["pool_maxsize"],
+    )
+
+
+def async_http_client(timeout=None):
+    """
+    Build a pooled httpx.AsyncClient retrying failed connections.
+
+    :param timeout: Request timeout in seconds, the configured one by default.
+    """
+    import httpx
+
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(
+            retries=_config["retries"],
+            http2=_config["http2"] and _http2_available(),
+            limits=_async_limits(),
+        ),
+        timeout=_config["timeout"] if timeout is None else timeout,
+    )
+
+
+def async_openai_client(api_key, base_url, timeout=None):
+    """
+    Build an AsyncOpenAI client on a pooled httpx.AsyncClient, without SDK
+    retries like openai_client().
+
+    :param timeout: Read timeout in seconds, the configured LLM one by default.
+    """
+    import httpx
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(
+                retries=_config["retries"],
+                http2=_config["http2"] and _http2_available(),
+                limits=_async_limits(),
+            ),
+            timeout=httpx.Timeout(
+                _config["llm_timeout"] if timeout is None else timeout,
+                connect=_config["timeout"],
+            ),
+        ),
+    )
@@ -0,0 +1,269 @@
+"""Local sentiment scoring that decides which symbols are worth an LLM call
+
+Headlines are scored with a financial lexicon: each word of POSITIVE or
+NEGATIVE adds its weight, flipped when one of the three words before it is a
+negation ("not", "fails to", "no"). Together with the insider MSPR and the
+analyst recommendation trend this gives every symbol a score in [-1, 1] and a
+confidence, the agreement between the three scores. The watchlist is ranked
+by the strength of its scores; only the strongest symbols and the ones whose
+evidence disagrees with itself are sent to the LLM. The others get a local
+analysis built from the scores.
+
+Scoring is pure Python on sets and dicts, tens of thousands of headlines per
+second. Large batches are handed to the worker processes.
+"""
+
+import math
+import re
+
+import modules.tracing as tracing
+import modules.workers as workers
+from modules.backtest import MSPR_SCALE, TREND_WEIGHTS, features
+
+POSITIVE = {
+    word: 1.0
+    for word in (
+        "beat beats accelerate accelerates advance advances approval approved "
+        "approves boost boosts bullish buy buyback climb climbs confident "
+        "dividend expand expands expansion gain gains growth grow grows "
+        "higher improve improved improves innovative jump jumps launch "
+        "launches lead leads leading optimistic outperform outperforms "
+        "partnership positive profit profitable profits raise raised raises "
+        "rally rallies rebound rebounds recover recovers recovery rise rises "
+        "rising strong stronger strength success successful surge surges "
+        "top tops upbeat upgrade upgraded upgrades upside win wins won"
+    ).split()
+}
+POSITIVE.update(
+    {
+        word: 2.0
+        for word in (
+            "blowout breakthrough record skyrocket skyrockets soar soared soars "
+            "smashes"
+        ).split()
+    }
+)
+NEGATIVE = {
+    word: -1.0
+    for word in (
+        "bearish concern concerns cut cuts decline declines declining delay "
+        "delayed delays downgrade downgraded downgrades drop drops fall falls "
+        "fell fine fined halt halts investigation lawsuit layoff layoffs lose "
+        "loses losing loss losses lower miss misses missed negative probe "
+        "recall recalls risk risks sell selloff short shortfall slip slips "
+        "slow slowdown slows slump slumps sue sued suit tumble tumbles warn "
+        "warning warns weak weaker weakness worse worst"
+    ).split()
+}
+NEGATIVE.update(
+    {
+        word: -2.0
+        for word in (
+            "bankrupt bankruptcy collapse collapses crash crashes default "
+            "fraud plummet plummets plunge plunged plunges scandal"
+        ).split()
+    }
+)
+NEGATIONS = frozenset(
+    "no not never without neither nor cannot can't won't isn't aren't wasn't "
+    "doesn't didn't don't fail fails failed".split()
+)
+LEXICON = {**POSITIVE, **NEGATIVE}
+
+_WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+# Words a negation reaches
+NEGATION_WINDOW = 3
+# Headline score at which a headline counts as fully positive or negative
+HEADLINE_SCALE = 3.0
+# Neutral headlines added to every symbol, so one headline is not a verdict
+NEWS_PRIOR = 2
+
+DEFAULT_WEIGHTS = {"news": 0.5, "insider": 0.2, "analyst": 0.3}
+DEFAULT_TOP = 10
+# Symbols whose scores agree less than this are always sent to the LLM
+DEFAULT_LOW_CONFIDENCE = 0.5
+# Local score of the lower bound of each signal, strongest first
+SIGNAL_THRESHOLDS = (
+    (0.6, "STRONG BUY"),
+    (0.2, "BUY"),
+    (-0.2, "HOLD"),
+    (-0.6, "SELL"),
+)
+
+
+def score_headline(title):
+    """Lexicon score of a headline in [-1, 1], 0 when no word is known"""
+    total = 0.0
+    negated = -1
+    for i, word in enumerate(_WORD.findall(title.lower())):
+        if word in NEGATIONS:
+            negated = i + NEGATION_WINDOW
+            continue
+        weight = LEXICON.get(word)
+        if weight is not None:
+            total += -weight if i <= negated else weight
+    return max(-1.0, min(1.0, total / HEADLINE_SCALE))
+
+
+def score_headlines(titles):
+    """Scores of a batch of headlines"""
+    return [score_headline(title) for title in titles]
+
+
+def _offsets(batches):
+    offsets = [0]
+    for batch in batches:
+        offsets.append(offsets[-1] + len(batch))
+    return offsets
+
+
+def news_scores(article_lists):
+    """
+    Headline sentiment of several symbols in one batch.
+
+    :param article_lists: One list of article dicts per symbol.
+    :return: List of (score, headlines) per symbol; the score is the mean of
+        the headline scores with NEWS_PRIOR neutral headlines added.
+    """
+    titles = [
+        article.get("title") or "" for articles in article_lists for article in articles
+    ]
+    with tracing.span("triage.headlines", headlines=len(titles)):
+        scores = workers.run(
+            score_headlines, titles, size=sum(len(title) for title in titles)
+        )
+    offsets = _offsets(article_lists)
+    return [
+        (
+            sum(scores[offsets[i] : offsets[i + 1]]) / (len(articles) + NEWS_PRIOR),
+            len(articles),
+        )
+        for i, articles in enumerate(article_lists)
+    ]
+
+
+def evidence_scores(insider_sentiments, analyst_sentiments):
+    """
+    Insider and analyst scores in [-1, 1], None when the source is empty.
+
+    The same definitions as backtest.feature_scores, for one symbol.
+    """
+    row = features(insider_sentiments, analyst_sentiments)
+    mspr = row["mspr_3m"] if row["mspr_3m"] is not None else row["mspr"]
+    insider = math.tanh(mspr / MSPR_SCALE) if mspr is not None else None
+
+    counts = [
+        row[name] or 0 for name in ("strong_buy", "buy", "hold", "sell", "strong_sell")
+    ]
+    total = sum(counts)
+    analyst = None
+    if total:
+        net = sum(count * weight for count, weight in zip(counts, TREND_WEIGHTS))
+        analyst = net / 2.0 / total
+    return insider, analyst
+
+
+class Triage:
+    """
+    Rank gathered symbols by their local scores and pick the ones that go to
+    the LLM.
+    """
+
+    def __init__(
+        self,
+        top=DEFAULT_TOP,
+        low_confidence=DEFAULT_LOW_CONFIDENCE,
+        weights=None,
+    ):
+        """
+        :param top: Number of the strongest symbols sent to the LLM.
+        :param low_confidence: Symbols whose scores agree less than this are
+            sent as well, whatever their rank.
+        :param weights: Weight of the news, insider and analyst scores, see
+            DEFAULT_WEIGHTS.
+        """
+        self.top = top
+        self.low_confidence = low_confidence
+        self.weights = weights or DEFAULT_WEIGHTS
+
+    def score(self, gathered_results):
+        """
+        Score GatherResults, strongest first.
+
+        :return: List of dicts with symbol, score, confidence, the news,
+            insider and analyst scores, headlines, rank and selected.
+        """
+        news = news_scores([gathered.articles for gathered in gathered_results])
+        scored = []
+        for gathered, (news_score, headlines) in zip(gathered_results, news):
+            insider, analyst = evidence_scores(
+                gathered.insider_sentiments, gathered.analyst_sentiments
+            )
+            parts = {"insider": insider, "analyst": analyst}
+            if headlines:
+                parts["news"] = news_score
+            parts = {name: value for name, value in parts.items() if value is not None}
+
+            weight = sum(self.weights[name] for name in parts)
+            score = (
+                sum(self.weights[name] * value for name, value in parts.items())
+                / weight
+                if weight
+                else 0.0
+            )
+            # Agreement of the scores: 1 when equal, 0 when at opposite ends
+            values = list(parts.values())
+            confidence = 1.0 - (max(values) - min(values)) / 2.0 if values else 1.0
+            scored.append(
+                {
+                    "symbol": gathered.symbol,
+                    "score": round(score, 4),
+                    "confidence": round(confidence, 4),
+                    "news": round(news_score, 4) if headlines else None,
+                    "insider": None if insider is None else round(insider, 4),
+                    "analyst": None if analyst is None else round(analyst, 4),
+                    "headlines": headlines,
+                }
+            )
+
+        scored.sort(key=lambda entry: abs(entry["score"]), reverse=True)
+        for rank, entry in enumerate(scored, 1):
+            entry["rank"] = rank
+            entry["selected"] = (
+                rank <= self.top or entry["confidence"] < self.low_confidence
+            )
+        return scored
+
+    @staticmethod
+    def local_analysis(entry, total):
+        """
+        Analysis dict of a symbol that was not sent to the LLM.
+
+        The confidence is capped at 5: a lexicon reads headlines, not
+        filings.
+        """
+        signal = "STRONG SELL"
+        for threshold, name in SIGNAL_THRESHOLDS:
+            if entry["score"] >= threshold:
+                signal = name
+                break
+        reasons = []
+        if entry["news"] is not None:
+            reasons.append(
+                f"Headline sentiment {entry['news']:+.2f} over "
+                f"{entry['headlines']} articles"
+            )
+        if entry["insider"] is not None:
+            reasons.append(f"Insider MSPR score {entry['insider']:+.2f}")
+        if entry["analyst"] is not None:
+            reasons.append(f"Analyst trend score {entry['analyst']:+.2f}")
+        return {
+            "signal": signal,
+            "confidence": max(1, round(5 * entry["confidence"])),
+            "reasons": reasons or ["No news, insider or analyst evidence"],
+            "risks": [],
+            "summary": (
+                f"Local triage only, ranked {entry['rank']} of {total} with "
+                f"score {entry['score']:+.2f}; not sent to the AI."
+            ),
+        }
@@ -0,0 +1,331 @@
+"""Continuous monitoring that re-analyzes a symbol only on material news
+
+Each poll gathers the news sources of a symbol (and the monthly Finnhub
+sources every few rounds), reduces them to a snapshot, and diffs it against
+the snapshot of the last analysis. The change is scored from the new
+headlines, the MSPR moves and the analysts changing their recommendation.
+Only a score over the threshold runs the LLM again; otherwise the last
+analysis is reported with its age.
+"""
+
+import contextlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import modules.logger as logger
+import modules.scheduler as scheduler
+import modules.tracing as tracing
+from modules.gatherer import (
+    ANALYST_TRENDS,
+    FINVIZ,
+    INSIDER_SENTIMENT,
+    NEWS_API,
+    SOURCES,
+    GatherResult,
+)
+
+NEWS_SOURCES = (NEWS_API, FINVIZ)
+_TREND_COLUMNS = ("strongBuy", "buy", "hold", "sell", "strongSell")
+
+# Score of one unit of each kind of change
+DEFAULT_WEIGHTS = {
+    # per headline not seen by the last analysis
+    "new_articles": 1.0,
+    # per point of MSPR (-100 to 100) moved, summed over the months
+    "mspr_change": 0.1,
+    # per analyst moving between recommendation levels
+    "analyst_shift": 0.5,
+}
+DEFAULT_THRESHOLD = 3.0
+
+
+def _article_key(article):
+    import hashlib
+
+    # Same headline from two sources, or re-punctuated, is one article
+    title = " ".join(re.findall(r"\w+", article.get("title", "").lower()))
+    return hashlib.blake2b(title.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def snapshot(gathered, previous=None):
+    """
+    Reduce the evidence of a GatherResult to what materiality() compares.
+
+    Sources that were not polled or failed keep their part of the previous
+    snapshot, so an outage is not mistaken for a change.
+    """
+    previous = previous or {"articles": {}, "mspr": {}, "analysts": None}
+    current = {
+        "articles": dict(previous["articles"]),
+        "mspr": previous["mspr"],
+        "analysts": previous["analysts"],
+    }
+    for name, result in gathered.sources.items():
+        if not result.success:
+            continue
+        payload = result.payload or []
+        if name in NEWS_SOURCES:
+            current["articles"][name] = sorted({_article_key(a) for a in payload})
+        elif name == INSIDER_SENTIMENT:
+            rows = payload.get("data", []) if isinstance(payload, dict) else payload
+            current["mspr"] = {
+                f"{row['year']:04d}-{row['month']:02d}": row.get("mspr") or 0.0
+                for row in rows
+            }
+        elif name == ANALYST_TRENDS and payload:
+            latest = max(payload, key=lambda row: row.get("period", ""))
+            current["analysts"] = {
+                "period": latest.get("period", ""),
+                "counts": [latest.get(column) or 0 for column in _TREND_COLUMNS],
+            }
+    return current
+
+
+def materiality(previous, current, weights=None):
+    """
+    Score how much the evidence changed since the previous snapshot.
+
+    :return: Tuple (score, dict of the changes by kind).
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    seen = set().union(*previous["articles"].values())
+    now = set().union(*current["articles"].values())
+
+    mspr_change = 0.0
+    for period, mspr in current["mspr"].items():
+        # A new month counts from a neutral MSPR of 0
+        mspr_change += abs(mspr - previous["mspr"].get(period, 0.0))
+
+    analyst_shift = 0.0
+    if current["analysts"] and previous["analysts"]:
+        moved = sum(
+            abs(a - b)
+            for a, b in zip(
+                current["analysts"]["counts"], previous["analysts"]["counts"]
+            )
+        )
+        # An analyst moving from buy to hold changes two counts
+        analyst_shift = moved / 2
+
+    changes = {
+        "new_articles": len(now - seen),
+        "mspr_change": round(mspr_change, 4),
+        "analyst_shift": analyst_shift,
+    }
+    score = sum(weights.get(kind, 0.0) * value for kind, value in changes.items())
+    return score, changes
+
+
+class WatchStore:
+    """
+    SQLite table of the last analysis of each symbol and the evidence
+    snapshot it was made from.
+    """
+
+    def __init__(self, path="cache/watch.sqlite"):
+        """
+        :param path: SQLite database file, or ":memory:".
+        """
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS watch (
+                    symbol TEXT PRIMARY KEY,
+                    snapshot TEXT NOT NULL,
+                    analysis TEXT NOT NULL,
+                    analyzed_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+
+    def get(self, symbol):
+        """Return (snapshot, analysis, analyzed_at) of a symbol, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT snapshot, analysis, analyzed_at FROM watch WHERE symbol = ?",
+                (symbol,),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), json.loads(row[1]), row[2]
+
+    def put(self, symbol, snapshot, analysis, analyzed_at):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watch "
+                "(symbol, snapshot, analysis, analyzed_at) VALUES (?, ?, ?, ?)",
+                (symbol, json.dumps(snapshot), json.dumps(analysis), analyzed_at),
+            )
+            self._conn.commit()
+
+
+class Watcher:
+    """
+    Poll a watchlist in rounds and re-analyze only the symbols whose
+    evidence changed materially since their last analysis.
+
+    Uses the gatherer, analyzer, provider limits, workers and priority of a
+    BatchRunner, and yields records shaped like its records with an extra
+    "watch" entry: reanalyzed, score, changes and age (seconds since the
+    reported analysis was made).
+    """
+
+    def __init__(
+        self,
+        runner,
+        store=None,
+        threshold=DEFAULT_THRESHOLD,
+        weights=None,
+        max_age=None,
+        full_every=12,
+    ):
+        """
+        :param runner: BatchRunner providing the gatherer and the analyzer.
+        :param store: WatchStore of the last analyses, in memory by default.
+        :param threshold: Materiality score that triggers a new analysis.
+        :param weights: Score per unit of each change, see DEFAULT_WEIGHTS.
+        :param max_age: Seconds after which a symbol is re-analyzed anyway.
+        :param full_every: Also poll the monthly Finnhub sources every this
+            many rounds; other rounds only poll the news sources.
+        """
+        self.runner = runner
+        self.store = store if store is not None else WatchStore(":memory:")
+        self.threshold = threshold
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.max_age = max_age
+        self.full_every = max(1, full_every)
+
+    def check(self, symbol, days, sources=SOURCES):
+        """
+        Poll one symbol and re-analyze it if its evidence changed enough.
+
+        :param sources: Sources polled; the others are only fetched when the
+            symbol is re-analyzed.
+        :return: Record of the symbol.
+        """
+        start = time.perf_counter()
+        gatherer = self.runner.gatherer
+        with tracing.span("watch.check", symbol=symbol) as span:
+            gathered = gatherer.gather(symbol, days, sources)
+            last = self.store.get(symbol)
+            previous = last[0] if last else None
+            current = snapshot(gathered, previous)
+
+            now = time.time()
+            if last is None:
+                score, changes, reason = None, {}, "first analysis"
+            else:
+                score, changes = materiality(previous, current, self.weights)
+                reason = None
+                if score >= self.threshold:
+                    reason = f"score {score:.1f}"
+                elif self.max_age is not None and now - last[2] >= self.max_age:
+                    reason = "max age"
+            span.set(reanalyzed=reason is not None)
+            if score is not None:
+                span.set(score=round(score, 2))
+
+            if reason is None:
+                record = self.runner._record(gathered, last[1], 0.0, start)
+                record["watch"] = {
+                    "reanalyzed": False,
+                    "score": score,
+                    "changes": changes,
+                    "age": now - last[2],
+                }
+                return record
+
+            logger.info(f"Re-analyzing {symbol}: {reason}")
+            missing = [name for name in SOURCES if name not in gathered.sources]
+            if missing:
+                extra = gatherer.gather(symbol, days, missing)
+                gathered = GatherResult(
+                    symbol,
+                    days,
+                    {**gathered.sources, **extra.sources},
+                    gathered.elapsed + extra.elapsed,
+                )
+                current = snapshot(gathered, previous)
+
+            llm_start = time.perf_counter()
+            with self.runner.limits.get("deepseek") or contextlib.nullcontext():
+                analysis = self.runner.analyzer.analyze(
+                    symbol,
+                    gathered.articles,
+                    gathered.insider_sentiments,
+                    gathered.analyst_sentiments,
+                    bypass_cache=self.runner.refresh,
+                )
+            llm_elapsed = time.perf_counter() - llm_start
+            if self.runner.analyzer.is_cacheable(analysis):
+                self.store.put(symbol, current, analysis, now)
+
+        record = self.runner._record(gathered, analysis, llm_elapsed, start)
+        record["watch"] = {
+            "reanalyzed": True,
+            "score": score,
+            "changes": changes,
+            "age": 0.0,
+        }
+        return record
+
+    def poll(self, symbols, days, sources=SOURCES):
+        """
+        Check every symbol once, yielding each record as soon as it completes.
+        """
+        with ThreadPoolExecutor(
+            max_workers=self.runner.workers, thread_name_prefix="watch"
+        ) as executor:
+            futures = {
+                executor.submit(
+                    scheduler.run_at,
+                    self.runner.priority,
+                    self.check,
+                    symbol,
+                    days,
+                    sources,
+                ): symbol
+                for symbol in symbols
+            }
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    yield future.result()
+                except Exception as e:
+                    logger.error(f"Watch check of {symbol} failed: {str(e)}")
+                    yield self.runner._error_record(symbol, days, e)
+
+    def run(self, symbols, days, interval, rounds=None):
+        """
+        Poll the symbols every `interval` seconds, yielding every record.
+
+        :param rounds: Number of rounds, forever when None.
+        """
+        symbols = list(symbols)
+        round_number = 0
+        while rounds is None or round_number < rounds:
+            started = time.monotonic()
+            sources = SOURCES if round_number % self.full_every == 0 else NEWS_SOURCES
+            reanalyzed = 0
+            for record in self.poll(symbols, days, sources):
+                reanalyzed += record.get("watch", {}).get("reanalyzed", False)
+                yield record
+            round_number += 1
+            logger.info(
+                f"Watch round {round_number}: {len(symbols)} symbols, "
+                f"{reanalyzed} re-analyzed in {time.monotonic() - started:.1f}s"
+            )
+            if rounds is not None and round_number >= rounds:
+                break
+            time.sleep(max(0.0, started + interval - time.monotonic()))
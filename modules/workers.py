@@ -0,0 +1,321 @@
+"""Process pool for the CPU-bound stages of the pipeline
+
+HTML parsing, prompt assembly and response parsing hold the GIL, so at batch
+scale the fetch threads and the event loop end up waiting on each other. With
+configure(processes=N) those stages run in N worker processes while network
+I/O stays on the calling threads or event loop.
+
+Calls are queued and a dispatcher thread sends whatever is waiting, up to
+chunk_size calls, to the pool as one task, so a sweep pays one round trip per
+chunk instead of one per page. Bytes arguments of at least shared_min_bytes,
+raw HTML pages mostly, are handed over in shared memory instead of being
+pickled through the pool's pipe.
+
+Without a configured pool, or for inputs smaller than min_bytes, the function
+simply runs in the calling thread.
+"""
+
+import atexit
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+import modules.logger as logger
+
+# Global variables
+_config = {
+    "processes": 0,
+    "chunk_size": 8,
+    "min_bytes": 16 * 1024,
+    "shared_min_bytes": 64 * 1024,
+}
+_pool = None
+_lock = threading.Lock()
+
+
+class _SharedBytes:
+    """Pickled stand-in for bytes copied into a shared memory block"""
+
+    __slots__ = ("name", "size")
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+    def __getstate__(self):
+        return self.name, self.size
+
+    def __setstate__(self, state):
+        self.name, self.size = state
+
+    def read(self):
+        from multiprocessing import shared_memory
+
+        # The parsers need bytes, so this is the one copy on the worker side
+        block = shared_memory.SharedMemory(name=self.name)
+        try:
+            return bytes(block.buf[: self.size])
+        finally:
+            block.close()
+
+
+def _init_worker(log_settings):
+    if log_settings is not None:
+        logger.init(**log_settings)
+
+
+def _run_chunk(calls):
+    """Run a chunk of calls in a worker, returning (ok, result or error) each"""
+    results = []
+    for function, args in calls:
+        try:
+            args = [a.read() if isinstance(a, _SharedBytes) else a for a in args]
+            results.append((True, function(*args)))
+        except Exception as e:
+            results.append((False, e))
+    return results
+
+
+class _Pool:
+    def __init__(self, processes, chunk_size, shared_min_bytes):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.chunk_size = chunk_size
+        self.shared_min_bytes = shared_min_bytes
+        # spawn: forking would copy the logger and executor threads' locks
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(logger.settings(),),
+        )
+        self.pending = queue.SimpleQueue()
+        self.dispatcher = threading.Thread(
+            target=self._dispatch, name="worker-dispatch", daemon=True
+        )
+        self.dispatcher.start()
+
+    def submit(self, function, args):
+        future = Future()
+        self.pending.put((future, function, args))
+        return future
+
+    def _dispatch(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            chunk = [item]
+            stop = False
+            while len(chunk) < self.chunk_size:
+                try:
+                    item = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                chunk.append(item)
+            self._send(chunk)
+            if stop:
+                return
+
+    def _share(self, args):
+        from multiprocessing import shared_memory
+
+        shared = []
+        blocks = []
+        for arg in args:
+            if isinstance(arg, bytes) and len(arg) >= self.shared_min_bytes:
+                block = shared_memory.SharedMemory(create=True, size=len(arg))
+                block.buf[: len(arg)] = arg
+                blocks.append(block)
+                arg = _SharedBytes(block.name, len(arg))
+            shared.append(arg)
+        return shared, blocks
+
+    def _send(self, chunk):
+        futures = []
+        calls = []
+        blocks = []
+        for future, function, args in chunk:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                args, shared = self._share(args)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            blocks.extend(shared)
+            futures.append(future)
+            calls.append((function, args))
+        if not calls:
+            return
+
+        try:
+            task = self.executor.submit(_run_chunk, calls)
+        except Exception as e:
+            _release(blocks)
+            for future in futures:
+                future.set_exception(e)
+            return
+        task.add_done_callback(lambda task: _deliver(self, task, futures, blocks))
+
+    def shutdown(self):
+        self.pending.put(None)
+        self.dispatcher.join()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _release(blocks):
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+def _deliver(pool, task, futures, blocks):
+    _release(blocks)
+    try:
+        results = task.result()
+    except Exception as e:
+        # A worker died, every call of the chunk fails and the next call
+        # starts a new pool
+        _discard_broken(pool, e)
+        for future in futures:
+            future.set_exception(e)
+        return
+    for future, (ok, value) in zip(futures, results):
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+
+def _discard_broken(pool, error):
+    global _pool
+
+    from concurrent.futures.process import BrokenProcessPool
+
+    if not isinstance(error, BrokenProcessPool):
+        return
+    with _lock:
+        if _pool is not pool:
+            return
+        _pool = None
+    # Called from the pool's own threads, which must not wait on themselves
+    pool.pending.put(None)
+    pool.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def configure(**options):
+    """
+    Change the worker options. A running pool is shut down, the next call
+    starts one with the new values.
+
+    :param processes: Worker processes, 0 runs every call in the calling
+        thread. None uses every available core.
+    :param chunk_size: Maximum calls sent to a worker as one task.
+    :param min_bytes: Inputs smaller than this run in the calling thread,
+        where they cost less than the round trip to a worker.
+    :param shared_min_bytes: Bytes arguments at least this large go through
+        shared memory instead of the pool's pipe.
+    """
+    global _pool
+
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise ValueError(f"Unknown worker options: {', '.join(sorted(unknown))}")
+    if "processes" in options and options["processes"] is None:
+        options["processes"] = available_cores()
+
+    with _lock:
+        _config.update(options)
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def available_cores():
+    """Cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def processes():
+    """Configured number of worker processes, 0 when disabled"""
+    return _config["processes"]
+
+
+def _get_pool():
+    global _pool
+
+    if _pool is None:
+        with _lock:
+            if _pool is None and _config["processes"] > 0:
+                _pool = _Pool(
+                    _config["processes"],
+                    _config["chunk_size"],
+                    _config["shared_min_bytes"],
+                )
+    return _pool
+
+
+def _inline(size):
+    return _config["processes"] <= 0 or (
+        size is not None and size < _config["min_bytes"]
+    )
+
+
+def submit(function, *args, size=None):
+    """
+    Run function(*args) in a worker process.
+
+    function and the arguments must be picklable: module-level functions and
+    plain data.
+
+    :param size: Size of the input in bytes, if known. Small inputs run in
+        the calling thread.
+    :return: concurrent.futures.Future of the result.
+    """
+    pool = None if _inline(size) else _get_pool()
+    if pool is not None:
+        return pool.submit(function, args)
+
+    future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def run(function, *args, size=None):
+    """Run function(*args) in a worker process and return its result"""
+    if _inline(size):
+        return function(*args)
+    return submit(function, *args, size=size).result()
+
+
+async def run_async(function, *args, size=None):
+    """Await function(*args) run in a worker process, without blocking the loop"""
+    import asyncio
+
+    if _inline(size):
+        return function(*args)
+    return await asyncio.wrap_future(submit(function, *args, size=size))
+
+
+def shutdown():
+    """Stop the worker processes"""
+    global _pool
+
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+atexit.register(shutdown)
@@ -0,0 +1,287 @@
+"""Serve the stock analysis over HTTP
+
+Example:
+    python server.py --port 8080
+
+Endpoints:
+    GET  /analyze/{symbol}?days=7&refresh=1   analysis record of one symbol
+    POST /batch  {"symbols": ["AAPL", "MSFT"], "days": 7}
+    GET  /metrics                              Prometheus text metrics
+    GET  /traces?drain=1                       buffered spans as OTLP/JSON
+    GET  /health
+
+Concurrent identical requests share one fetch and one AI call, and every
+client shares the same warm caches, connection pools and rate limits.
+"""
+
+import argparse
+import json
+import re
+import sys
+from concurrent.futures import TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from modules.news_fetcher import NewsFetcher
+from modules.deepseek import DeepSeekModels
+from modules.analyzer import StockAnalyzer
+from modules.compaction import PromptCompactor
+import modules.key as keys
+import modules.logger as logger
+import modules.finnhub as finnhub
+import modules.gatherer as gatherer
+import modules.router as router
+import modules.structured as structured
+import modules.batch as batch
+import modules.tracing as tracing
+import modules.transport as transport
+import modules.workers as workers
+from modules.backtest import AnalysisLog
+from modules.cache import ResponseCache
+from modules.service import AnalysisService
+from modules.store import HistoryGatherer, HistoryStore
+
+MAX_BATCH_SYMBOLS = 100
+# Tickers like AAPL, BRK.B or BF-B; anything else could alter upstream URLs
+SYMBOL_PATTERN = re.compile(r"[A-Z0-9.\-]{1,10}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the stock analysis API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--workers", type=int, default=16, help="Analyses running at the same time"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=30, help="Per-source fetch deadline in seconds"
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=300,
+        help="Seconds a request waits for its analysis",
+    )
+    parser.add_argument(
+        "--analysis-ttl",
+        type=float,
+        default=6 * 60 * 60,
+        help="Seconds a cached AI analysis stays valid",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=6000,
+        help="Maximum tokens of news and sentiment evidence per prompt",
+    )
+    parser.add_argument(
+        "--history",
+        action="store_true",
+        help="Sync sources into the local history store and read from it",
+    )
+    parser.add_argument(
+        "--no-record",
+        action="store_true",
+        help="Do not record analyses in cache/analyses.sqlite for backtesting",
+    )
+    parser.add_argument(
+        "--log-json", action="store_true", help="Write the log file as JSON lines"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        nargs="?",
+        const=workers.available_cores(),
+        default=0,
+        help="Parse pages and build prompts in worker processes, "
+        "one per core without a number",
+    )
+    parser.add_argument(
+        "--model",
+        choices=[model.name for model in DeepSeekModels],
+        default=DeepSeekModels.DEEPSEEK_CHAT.name,
+    )
+    parser.add_argument(
+        "--engine",
+        action="append",
+        metavar="[URL=]MODEL",
+        help="LLM endpoint and model, repeat to route between several with "
+        "hedged requests (default: --model on the DeepSeek API)",
+    )
+    parser.add_argument(
+        "--hedge-after",
+        type=float,
+        metavar="SECONDS",
+        help="Fixed delay before a hedged request (default: the p95 latency)",
+    )
+    for provider, default in batch.DEFAULT_LIMITS.items():
+        parser.add_argument(
+            f"--{provider}",
+            type=int,
+            default=default,
+            help=f"Maximum concurrent {provider} calls (default {default})",
+        )
+    return parser.parse_args(argv)
+
+
+def build_service(args):
+    """Build the AnalysisService shared by all requests"""
+    transport.configure(pool_maxsize=args.workers, timeout=args.timeout)
+    workers.configure(processes=args.processes)
+    limits = batch.provider_limits(
+        **{provider: getattr(args, provider) for provider in batch.DEFAULT_LIMITS}
+    )
+    response_cache = ResponseCache()
+    engine = router.from_specs(
+        args.engine or [args.model],
+        keys.DeepSeekKey(),
+        hedge_delay=args.hedge_after,
+        validate=structured.has_json,
+    )
+    fetcher = NewsFetcher(news_api_key=keys.NewsAPIKey(), cache=response_cache)
+    finnhub_client = finnhub.Finnhub(key=keys.FinnhubAPIKey(), cache=response_cache)
+    gatherer_options = dict(
+        timeout=args.timeout,
+        max_workers=args.workers * len(gatherer.SOURCES),
+        limits=limits,
+    )
+    if args.history:
+        source_gatherer = HistoryGatherer(
+            fetcher, finnhub_client, HistoryStore(), **gatherer_options
+        )
+    else:
+        source_gatherer = gatherer.Gatherer(fetcher, finnhub_client, **gatherer_options)
+    runner = batch.BatchRunner(
+        source_gatherer,
+        StockAnalyzer(
+            ai_engine=engine,
+            cache=response_cache,
+            cache_ttl=args.analysis_ttl,
+            compactor=PromptCompactor(token_budget=args.token_budget),
+            recorder=None if args.no_record else AnalysisLog(),
+        ),
+        limits=limits,
+        workers=args.workers,
+    )
+    return AnalysisService(
+        runner,
+        workers=args.workers,
+        cache=response_cache,
+        timeout=args.request_timeout,
+    )
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Route requests to the AnalysisService set on the server"""
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+    def _send(self, status, body, content_type="application/json"):
+        if content_type == "application/json":
+            body = json.dumps(body, default=str)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, message):
+        self._send(status, {"error": message})
+
+    @staticmethod
+    def _days(value):
+        days = int(value)
+        if not 1 <= days <= 30:
+            raise ValueError("days must be between 1 and 30")
+        return days
+
+    @staticmethod
+    def _symbol(value):
+        symbol = str(value).strip().upper()
+        if not SYMBOL_PATTERN.fullmatch(symbol):
+            raise ValueError(f"Invalid symbol {value!r}")
+        return symbol
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path.startswith("/analyze/"):
+                symbol = unquote(url.path[len("/analyze/") :]).strip()
+                if not symbol:
+                    return self._error(400, "Missing symbol")
+                symbol = self._symbol(symbol)
+                days = self._days(query.get("days", ["7"])[0])
+                refresh = query.get("refresh", ["0"])[0].lower() in ("1", "true")
+                return self._send(200, self.service.analyze(symbol, days, refresh))
+            if url.path == "/metrics":
+                return self._send(
+                    200,
+                    self.service.prometheus() + tracing.prometheus_text(),
+                    "text/plain; version=0.0.4",
+                )
+            if url.path == "/traces":
+                drain = query.get("drain", ["0"])[0].lower() in ("1", "true")
+                return self._send(200, tracing.otel_json(drain=drain))
+            if url.path == "/health":
+                return self._send(200, {"status": "ok"})
+            return self._error(404, f"Unknown endpoint {url.path}")
+        except ValueError as e:
+            return self._error(400, str(e))
+        except TimeoutError:
+            return self._error(504, "Analysis did not finish in time")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/batch":
+            return self._error(404, f"Unknown endpoint {url.path}")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            symbols = request.get("symbols") or []
+            if not isinstance(symbols, list) or not symbols:
+                return self._error(400, "symbols must be a non-empty list")
+            if len(symbols) > MAX_BATCH_SYMBOLS:
+                return self._error(
+                    400, f"At most {MAX_BATCH_SYMBOLS} symbols per request"
+                )
+            days = self._days(request.get("days", 7))
+            results = self.service.analyze_many(
+                [self._symbol(symbol) for symbol in symbols],
+                days,
+                bool(request.get("refresh", False)),
+            )
+            return self._send(200, {"results": results})
+        except (ValueError, AttributeError) as e:
+            return self._error(400, str(e))
+        except TimeoutError:
+            return self._error(504, "Batch did not finish in time")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logger.init("API", json_lines=args.log_json)
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.service = build_service(args)
+    logger.info(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.logger as logger  # noqa: E402
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _logger(tmp_path_factory):
+    logger.init("TEST", console=False, log_dir=tmp_path_factory.mktemp("logs"))
@@ -0,0 +1,70 @@
+import json
+import os
+
+from modules.analyzer import StockAnalyzer
+from modules.gatherer import (
+    ANALYST_TRENDS,
+    FINVIZ,
+    INSIDER_SENTIMENT,
+    NEWS_API,
+    SourceResult,
+    compact,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "bench", "fixtures")
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+def _payloads():
+    news = [
+        {
+            "title": article["title"],
+            "content": article["description"],
+            "url": article.get("url", ""),
+            "source": "NewsAPI",
+            "published": article.get("publishedAt", ""),
+        }
+        for article in _fixture("newsapi_everything.json")["articles"]
+        if article.get("title") and article.get("description")
+    ]
+    headlines = [
+        {
+            "title": "Apple unveils new chip",
+            "content": "Apple unveils new chip",
+            "url": "https://example.com/chip",
+            "source": "Finviz",
+        }
+    ]
+    return {
+        NEWS_API: news,
+        FINVIZ: headlines,
+        INSIDER_SENTIMENT: _fixture("finnhub_insider_sentiment.json"),
+        ANALYST_TRENDS: _fixture("finnhub_recommendation_trends.json"),
+    }
+
+
+def _prompt(payloads):
+    analyzer = StockAnalyzer(ai_engine=None)
+    return analyzer.build_prompt(
+        "AAPL",
+        payloads[NEWS_API] + payloads[FINVIZ],
+        payloads[INSIDER_SENTIMENT],
+        payloads[ANALYST_TRENDS],
+    )
+
+
+def test_prompt_is_unchanged_by_compact_records():
+    payloads = _payloads()
+    compacted = {
+        name: compact(SourceResult(name, True, payload, 0.0)).payload
+        for name, payload in _payloads().items()
+    }
+    assert type(compacted[ANALYST_TRENDS][0]) is not dict
+
+    prompt = _prompt(compacted)
+    assert prompt == _prompt(payloads)
+    assert "TrendRow" not in prompt and "InsiderRow" not in prompt
@@ -0,0 +1,25 @@
+from modules.cache import ResponseCache
+
+
+def test_hits_do_not_write():
+    cache = ResponseCache(":memory:", access_resolution=0)
+    cache.put("newsapi", ["AAPL"], [{"title": "a"}])
+    writes = cache._conn.total_changes
+    for _ in range(10):
+        assert cache.get("newsapi", ["AAPL"])[0] == [{"title": "a"}]
+    assert cache._conn.total_changes == writes
+
+
+def test_evicts_least_recently_used_without_counting_the_table():
+    cache = ResponseCache(":memory:", max_entries=2, access_resolution=0)
+    cache.put("newsapi", ["A"], "a")
+    cache.put("newsapi", ["B"], "b")
+    # Replacing an entry does not grow the count
+    cache.put("newsapi", ["B"], "bb")
+    assert cache.get("newsapi", ["A"])[0] == "a"
+    cache.put("newsapi", ["C"], "c")
+
+    assert cache.get("newsapi", ["B"]) == (None, None)
+    assert cache.get("newsapi", ["A"])[0] == "a"
+    assert cache.stats()["newsapi"]["evictions"] == 1
+    assert (cache._entries, cache._bytes) == tuple(cache._totals())
@@ -0,0 +1,27 @@
+import modules.compaction as compaction
+from modules.compaction import PromptCompactor
+
+
+def _articles(n):
+    return [
+        {
+            "title": f"Headline {i} about chip supply {i * 7}",
+            "content": f"Body of story {i} " + "with more detail " * 20,
+            "source": "NewsAPI" if i % 2 else "Finviz",
+        }
+        for i in range(n)
+    ]
+
+
+def test_compact_counts_tokens_linearly(monkeypatch):
+    calls = []
+    count_tokens = compaction.count_tokens
+    monkeypatch.setattr(
+        compaction, "count_tokens", lambda text: calls.append(1) or count_tokens(text)
+    )
+    result = PromptCompactor(token_budget=300).compact(_articles(200), [], [])
+
+    assert result["stats"]["tokens"] <= 300
+    assert 0 < result["stats"]["kept_articles"] < 200
+    # Two counts per article, plus a few full encodings
+    assert len(calls) < 2 * 200 + 20
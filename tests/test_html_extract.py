@@ -0,0 +1,36 @@
+import pytest
+
+import modules.html_extract as html_extract
+
+BACKENDS = html_extract.available_backends()
+
+FINVIZ = (
+    '<table><tr><td><a class="tab-link-news" href="https://example.com/a">'
+    "Apple beats quarterly estimates</a></td></tr></table>"
+)
+YAHOO = '<ul><li><h3 class="Mb(5px) headline">Apple beats quarterly estimates</h3></li></ul>'
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("html", [b"", "", b"  \n", "<html></html>"])
+def test_empty_page_has_no_rows(backend, html):
+    assert html_extract.extract_finviz_news(html, backend=backend) == []
+    assert html_extract.extract_yahoo_headlines(html, backend=backend) == []
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backends_agree(backend):
+    assert html_extract.extract_finviz_news(FINVIZ, backend=backend) == [
+        ("Apple beats quarterly estimates", "https://example.com/a")
+    ]
+    assert html_extract.extract_yahoo_headlines(YAHOO, backend=backend) == [
+        "Apple beats quarterly estimates"
+    ]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_str_page_with_encoding_declaration(backend):
+    page = '<?xml version="1.0" encoding="utf-8"?>' + YAHOO
+    assert html_extract.extract_yahoo_headlines(page, backend=backend) == [
+        "Apple beats quarterly estimates"
+    ]
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+from modules.analyzer import StockAnalyzer
+from modules.jobs import JobRegistry
+
+
+class _Gatherer:
+    def gather(self, symbol, days, progress=None):
+        return SimpleNamespace(
+            articles=[], insider_sentiments={}, analyst_sentiments=[]
+        )
+
+
+class _Analyzer:
+    is_cacheable = staticmethod(StockAnalyzer.is_cacheable)
+
+    def __init__(self, analyses):
+        self.analyses = list(analyses)
+
+    def analyze_stream(self, symbol, *evidence, bypass_cache=False):
+        yield "analysis", self.analyses.pop(0)
+
+
+def _finished(registry, symbol):
+    job = registry.start(symbol, 7)
+    registry.executor.shutdown(wait=True)
+    registry.executor = type(registry.executor)(max_workers=1)
+    return job
+
+
+def test_failed_job_is_retried_and_successful_one_reused():
+    analyses = [{"signal": "ERROR"}, {"signal": "BUY"}]
+    registry = JobRegistry(_Gatherer(), _Analyzer(analyses), workers=1)
+    failed = _finished(registry, "AAPL")
+    assert failed.analysis == {"signal": "ERROR"}
+
+    retried = _finished(registry, "AAPL")
+    assert retried is not failed
+    assert retried.analysis == {"signal": "BUY"}
+    assert registry.start("AAPL", 7) is retried
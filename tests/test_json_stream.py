@@ -0,0 +1,21 @@
+from modules.json_stream import JSONFieldStream
+
+RESPONSE = (
+    '```json\n{"signal": "BUY", "reasons": ["up, \\"strong\\"", "}"], '
+    '"detail": {"a": [1, 2]}, "confidence": 7}\n```'
+)
+
+
+def test_fields_are_emitted_across_any_chunking():
+    for size in (1, 2, 5, len(RESPONSE)):
+        parser = JSONFieldStream()
+        fields = []
+        for i in range(0, len(RESPONSE), size):
+            fields.extend(parser.feed(RESPONSE[i : i + size]))
+        assert parser.done
+        assert fields == [
+            ("signal", "BUY"),
+            ("reasons", ['up, "strong"', "}"]),
+            ("detail", {"a": [1, 2]}),
+            ("confidence", 7),
+        ]
@@ -0,0 +1,58 @@
+import pytest
+
+from modules.router import Router
+
+
+class _Engine:
+    """Engine answering with a fixed text, or raising an error"""
+
+    def __init__(self, name, answer=None, error=None):
+        self.deepseek_model = name
+        self.answer = answer
+        self.error = error
+        self.calls = 0
+
+    def send(self, prompt, **options):
+        self.calls += 1
+        if self.error:
+            raise RuntimeError(self.error)
+        return self.answer
+
+
+def test_send_fails_over_through_every_engine():
+    engines = [
+        _Engine("a", error="boom a"),
+        _Engine("b", error="boom b"),
+        _Engine("c", answer="ok"),
+    ]
+    router = Router(engines, initial_delay=10.0, max_hedges=1)
+    assert router.send("prompt") == "ok"
+    assert [engine.calls for engine in engines] == [1, 1, 1]
+
+
+def test_send_skips_benched_engines_and_raises_last_error():
+    engines = [_Engine("a", error="boom a"), _Engine("b", error="boom b")]
+    router = Router(engines, max_hedges=0, failure_threshold=1)
+    with pytest.raises(RuntimeError, match="boom b"):
+        router.send("prompt")
+    engines.append(_Engine("c", answer="ok"))
+    router = Router(engines, failure_threshold=1)
+    router.stats[0].failure(1, 60)
+    assert router.send("prompt") == "ok"
+    assert engines[0].calls == 1
+
+
+def test_cache_key_depends_on_the_router_engines():
+    from modules.analyzer import StockAnalyzer
+
+    def key(engine):
+        return StockAnalyzer(engine).cache_key("AAPL", [], [], [])
+
+    chat, reasoner = _Engine("deepseek-chat"), _Engine("deepseek-reasoner")
+    keys = {
+        key(chat),
+        key(Router([chat, chat])),
+        key(Router([chat, reasoner])),
+    }
+    assert len(keys) == 3
+    assert key(Router([chat, reasoner])) == key(Router([reasoner, chat]))
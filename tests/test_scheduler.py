@@ -0,0 +1,22 @@
+from types import SimpleNamespace
+
+from modules.scheduler import QuotaLedger
+
+
+def test_ledger_writes_usage_in_batches(tmp_path):
+    path = str(tmp_path / "quota.sqlite")
+    ledger = QuotaLedger(path, flush_interval=3600)
+    writes = ledger._conn.total_changes
+    for i in range(100):
+        ledger.record("finnhub", SimpleNamespace(tokens=4.0, updated=i), calls=1)
+    ledger.record("finnhub", SimpleNamespace(tokens=0.0, updated=100), throttled=1)
+
+    assert ledger._conn.total_changes == writes
+    assert ledger.usage("finnhub") == (100, 1)
+    assert ledger.bucket("finnhub") == (0.0, 100)
+
+    ledger.close()
+    reopened = QuotaLedger(path)
+    assert reopened.usage("finnhub") == (100, 1)
+    assert reopened.bucket("finnhub") == (0.0, 100)
+    reopened.close()
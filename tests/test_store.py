@@ -0,0 +1,72 @@
+import datetime
+from unittest import mock
+
+from modules.store import HistoryGatherer, HistoryStore
+
+
+class _Later(datetime.datetime):
+    """datetime whose now() is a fixed later day"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2030, 1, 2, 9, 30, 0)
+
+
+def _finviz(content):
+    return {
+        "title": "Apple unveils new chip",
+        "content": content,
+        "url": "https://example.com/chip",
+        "source": "Finviz",
+    }
+
+
+def test_resynced_finviz_article_keeps_first_seen_date():
+    store = HistoryStore(":memory:")
+    store.add_articles("AAPL", [_finviz("Apple unveils new chip")])
+    (first,) = store.articles("AAPL", "Finviz", "")
+
+    with mock.patch("modules.store.datetime.datetime", _Later):
+        store.add_articles("AAPL", [_finviz("Apple unveils its new chip")])
+    (article,) = store.articles("AAPL", "Finviz", "")
+
+    assert article["published"] == first["published"]
+    assert article["published"] < "2030-01-02"
+    assert article["content"] == "Apple unveils its new chip"
+    # The headline leaves a window starting after the day it was first seen
+    assert store.articles("AAPL", "Finviz", "2030-01-01") == []
+
+
+class _Fetcher:
+    """NewsAPI stand-in returning `count` dated articles per call"""
+
+    def __init__(self, count):
+        self.count = count
+        self.calls = []
+
+    def fetch_news_api(self, symbol, days, max_articles, **options):
+        self.calls.append(options)
+        articles = [
+            {
+                "title": f"{symbol} story {len(self.calls)}-{i}",
+                "content": "body",
+                "url": "",
+                "source": "NewsAPI",
+                "published": f"2030-01-{i % 28 + 1:02d}T00:00:00Z",
+            }
+            for i in range(self.count)
+        ]
+        return True, articles
+
+
+def test_news_delta_sync_asks_for_newest_and_serves_max_articles():
+    fetcher = _Fetcher(count=30)
+    gatherer = HistoryGatherer(
+        fetcher, None, HistoryStore(":memory:"), min_interval=0, max_articles=10
+    )
+    gatherer._news_api("AAPL", "2030-01-01")
+    success, served = gatherer._news_api("AAPL", "2030-01-01")
+
+    assert success and len(served) == 10
+    assert fetcher.calls[0].get("sort_by", "relevancy") == "relevancy"
+    assert fetcher.calls[-1]["sort_by"] == "publishedAt"
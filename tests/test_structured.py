@@ -0,0 +1,31 @@
+import pytest
+
+import modules.structured as structured
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"signal": "BUY",\xa0"confidence": 7',
+        '{"signal": "BUY",\f"confidence": 7}',
+        '{"signal":\v"BUY", "confidence": 7}',
+    ],
+)
+def test_loads_skips_any_unicode_whitespace(text):
+    assert structured.loads(text) == {"signal": "BUY", "confidence": 7}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"signal": "BUY" // strong quarter\n, "confidence": 7}',
+        '{"signal": "BUY" /* strong quarter */, "confidence": 7}',
+    ],
+)
+def test_loads_closes_a_string_before_a_comment(text):
+    assert structured.loads(text) == {"signal": "BUY", "confidence": 7}
+
+
+def test_loads_never_raises():
+    assert structured.loads("no json here") is None
+    assert structured.loads("{\xa0\f}") == {}